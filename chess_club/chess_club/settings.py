@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'ratings.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'ratings.middleware.PasscodeMiddleware',
@@ -120,6 +121,48 @@ STATIC_URL = '/static/'
 
 # Simple site-wide passcode (change for production via env or directly)
 PASSCODE = 'KNUSTchess@knustplayer'
+# Seconds a passcode grant lasts. The grant is a cookie signed with SECRET_KEY and
+# checked without the session, so page views don't touch the database for it.
+# Logging out only deletes the cookie from the browser; a copied cookie stays valid
+# until it expires, and rotating SECRET_KEY is the only way to end every grant early.
+PASSCODE_MAX_AGE = 60 * 60
+
+# Matches older than 30 days are purged at most once per interval (seconds) from
+# write requests. Set to None and schedule `manage.py purge_expired_matches`
+# with cron to keep all purging out of the web process.
+MATCH_PURGE_INTERVAL = 60 * 60
+MATCH_PURGE_BATCH_SIZE = 500
+
+# Seconds between rating checkpoints, the starting points from which the ranking
+# page rebuilds a past ranking (`?as_of=YYYY-MM-DD`). Taken from write requests
+# like the purge above; set to None and schedule `manage.py create_rating_checkpoint`.
+RATING_CHECKPOINT_INTERVAL = 24 * 60 * 60
+
+# Rendered ranking rows are cached per ranking version. The local-memory cache is
+# per process; point this at a shared backend (e.g. Redis) when running several workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+RANKING_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Player search suggestions come from an in-process name index, rebuilt after this
+# many seconds so names and ratings changed by other workers are picked up.
+PLAYER_INDEX_MAX_AGE = 5 * 60
+
+# Rating system used for recorded matches, imports and tournaments. The default is
+# the club's FIDE-style Elo; 'ratings.rating_systems.Glicko2RatingSystem' switches to
+# Glicko-2, which also keeps a rating deviation and volatility per player.
+RATING_SYSTEM = 'ratings.rating_systems.EloRatingSystem'
+# Glicko-2 system constant: how much volatility may change per rating period (0.3-1.2).
+GLICKO2_TAU = 0.5
+
+# `/metrics` serves per-view request counts, latency histograms and SQL totals in the
+# Prometheus text format. When set, scrapers skip the passcode but must send
+# `Authorization: Bearer <token>` (`bearer_token` in the Prometheus scrape config);
+# when unset, the endpoint needs the passcode like every other page.
+METRICS_TOKEN = None
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -0,0 +1,180 @@
+import time
+import zlib
+from datetime import timedelta
+from types import SimpleNamespace
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Match, Pairing, Player, RatingCheckpoint, SiteState
+from .ranking_cache import get_ranking_version
+
+
+CHECKPOINT_STATE_KEY = 'rating_checkpoint_taken'
+
+# monotonic time of this process's last look at the shared checkpoint record
+_last_checkpoint_check = None
+
+
+def create_checkpoint(force=False):
+    """Snapshot every player's rating, peak and games played; returns the checkpoint or None.
+
+    Unless `force` is set, nothing is written when the ranking version has
+    not moved since the latest checkpoint, because it would repeat the same state.
+    """
+    with transaction.atomic():
+        version = get_ranking_version()[0]
+        latest = RatingCheckpoint.objects.order_by('-taken_at').only('ranking_version').first()
+        if not force and latest is not None and latest.ranking_version == version:
+            return None
+        taken_at = timezone.now()
+        rows = np.array(
+            list(Player.objects.order_by('pk').values_list('pk', 'rating', 'peak_rating', 'games_played')),
+            dtype='<i4',
+        ).reshape(-1, 4)
+        return RatingCheckpoint.objects.create(
+            taken_at=taken_at,
+            ranking_version=version,
+            player_count=len(rows),
+            data=zlib.compress(rows.tobytes()),
+        )
+
+
+def create_checkpoint_if_due():
+    """Run `create_checkpoint` at most once per RATING_CHECKPOINT_INTERVAL seconds across all workers.
+
+    Meant to be called from write requests, like `purge_expired_matches_if_due`.
+    A falsy interval leaves checkpoints to the `create_rating_checkpoint` command.
+    """
+    global _last_checkpoint_check
+
+    interval = getattr(settings, 'RATING_CHECKPOINT_INTERVAL', 24 * 60 * 60)
+    if not interval:
+        return None
+
+    now = time.monotonic()
+    if _last_checkpoint_check is not None and now - _last_checkpoint_check < interval:
+        return None
+    _last_checkpoint_check = now
+
+    # Claim the run with a conditional update so concurrent workers don't both write one.
+    _, first_run = SiteState.objects.get_or_create(key=CHECKPOINT_STATE_KEY)
+    if not first_run:
+        due_before = timezone.now() - timedelta(seconds=interval)
+        claimed = SiteState.objects.filter(key=CHECKPOINT_STATE_KEY, updated_at__lte=due_before).update(updated_at=timezone.now())
+        if not claimed:
+            return None
+    return create_checkpoint()
+
+
+def _unpack(checkpoint):
+    rows = np.frombuffer(zlib.decompress(bytes(checkpoint.data)), dtype='<i4').reshape(-1, 4)
+    return {int(pk): (int(rating), int(peak), int(games)) for pk, rating, peak, games in rows}
+
+
+def ratings_as_of(when):
+    """Return {player_id: (rating, peak_rating, games_played)} as it stood just before `when`.
+
+    Starts from the newest checkpoint taken before `when` and replays what
+    happened between the two: recorded matches set both players to their
+    "after" snapshot, reverts restore the "before" snapshot, and tournament
+    results set the rating and count a game. Only players created before
+    `when` are returned. Matches purged after the retention window can no
+    longer be replayed, so older dates are exact only to the checkpoint
+    interval. Returns None when no checkpoint is that old.
+    """
+    checkpoint = RatingCheckpoint.objects.filter(taken_at__lt=when).order_by('-taken_at').first()
+    if checkpoint is None:
+        return None
+    state = _unpack(checkpoint)
+    since = checkpoint.taken_at
+
+    events = []
+    snapshot_fields = (
+        'pk', 'created_at', 'reverted_at', 'player_white_id', 'player_black_id',
+        'white_rating_before', 'white_peak_before', 'white_games_before',
+        'black_rating_before', 'black_peak_before', 'black_games_before',
+        'white_rating_after', 'white_peak_after', 'white_games_after',
+        'black_rating_after', 'black_peak_after', 'black_games_after',
+    )
+    changed = Match.objects.filter(
+        Q(created_at__gte=since, created_at__lt=when) | Q(reverted_at__gte=since, reverted_at__lt=when)
+    ).values_list(*snapshot_fields)
+    for row in changed:
+        match = dict(zip(snapshot_fields, row))
+        if since <= match['created_at'] < when:
+            events.append((match['created_at'], 0, match['pk'], 'after', match))
+        if match['reverted_at'] is not None and since <= match['reverted_at'] < when:
+            # a chain of reverts shares one timestamp and runs newest match first
+            events.append((match['reverted_at'], 1, -match['pk'], 'before', match))
+    for row in Pairing.objects.filter(recorded_at__gte=since, recorded_at__lt=when).exclude(result='P').values_list(
+        'pk', 'recorded_at', 'player_white_id', 'player_black_id', 'white_rating_after', 'black_rating_after',
+    ):
+        pk, recorded_at, white_id, black_id, white_rating, black_rating = row
+        events.append((recorded_at, 2, pk, 'pairing', {
+            'player_white_id': white_id, 'player_black_id': black_id,
+            'white_rating_after': white_rating, 'black_rating_after': black_rating,
+        }))
+
+    events.sort(key=lambda event: event[:3])
+    for _, _, _, kind, event in events:
+        for color in ('white', 'black'):
+            player_id = event[f'player_{color}_id']
+            if kind == 'pairing':
+                _, peak, games = state.get(player_id, (0, 0, 0))
+                rating = event[f'{color}_rating_after']
+                state[player_id] = (rating, max(peak, rating), games + 1)
+            else:
+                state[player_id] = (
+                    event[f'{color}_rating_{kind}'], event[f'{color}_peak_{kind}'], event[f'{color}_games_{kind}'],
+                )
+
+    # players added since the checkpoint without a replayed game: their first later game
+    # records where they started, otherwise nothing has changed for them yet
+    existing = {
+        pk: (rating, peak, games)
+        for pk, rating, peak, games in Player.objects.filter(created_at__lt=when)
+        .values_list('pk', 'rating', 'peak_rating', 'games_played')
+    }
+    missing = existing.keys() - state.keys()
+    if missing:
+        later = (
+            Match.objects.filter(created_at__gte=when)
+            .filter(Q(player_white_id__in=sorted(missing)) | Q(player_black_id__in=sorted(missing)))
+            .order_by('-created_at', '-pk')
+            .values_list(*snapshot_fields)
+        )
+        for row in later:
+            match = dict(zip(snapshot_fields, row))
+            for color in ('white', 'black'):
+                if match[f'player_{color}_id'] in missing:
+                    existing[match[f'player_{color}_id']] = (
+                        match[f'{color}_rating_before'], match[f'{color}_peak_before'], match[f'{color}_games_before'],
+                    )
+        state.update((pk, existing[pk]) for pk in missing)
+
+    return {pk: values for pk, values in state.items() if pk in existing}
+
+
+def ranking_as_of(when):
+    """The ranking as it stood just before `when`: rows ordered like the ranking page, each with a `rank`.
+
+    Rows carry `pk`, `name`, `rating`, `peak_rating`, `games_played` and
+    `rank`. Returns None when no checkpoint is old enough; see `ratings_as_of`.
+    """
+    state = ratings_as_of(when)
+    if state is None:
+        return None
+    names = dict(Player.objects.filter(created_at__lt=when).values_list('pk', 'name'))
+    rows = [
+        SimpleNamespace(pk=pk, id=pk, name=names[pk], rating=rating, peak_rating=peak, games_played=games)
+        for pk, (rating, peak, games) in state.items()
+        if pk in names
+    ]
+    rows.sort(key=lambda row: (-row.rating, row.name, row.pk))
+    for rank, row in enumerate(rows, start=1):
+        row.rank = rank
+    return rows
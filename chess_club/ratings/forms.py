@@ -1,5 +1,5 @@
 from django import forms
-from .models import Player, Match
+from .models import Player, Match, Tournament
 
 class PlayerForm(forms.ModelForm):
     class Meta:
@@ -15,43 +15,86 @@ class PlayerForm(forms.ModelForm):
 
 
 class MatchForm(forms.ModelForm):
-    player_white = forms.ModelChoiceField(
-        queryset=Player.objects.all(),
-        widget=forms.Select(attrs={'class': 'form-control'})
-    )
-
-    player_black = forms.ModelChoiceField(
-        queryset=Player.objects.all(),
-        widget=forms.Select(attrs={'class': 'form-control'})
-    )
+    # Players are picked with an autocomplete (see match_form.html) that fills
+    # in their ids, so the page never renders the roster as <option>s.
+    player_white = forms.IntegerField(widget=forms.HiddenInput(attrs={'class': 'player-picker'}))
+    player_black = forms.IntegerField(widget=forms.HiddenInput(attrs={'class': 'player-picker'}))
 
     class Meta:
         model = Match
-        fields = ['player_white', 'player_black', 'result']
+        # the players are set on the instance in clean(), which also skips
+        # the model's per-foreign-key existence queries
+        fields = ['result']
         widgets = {
             'result': forms.RadioSelect,
         }
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-        # If the form is bound, exclude the selected white player from black choices
-        try:
-            if self.data.get('player_white'):
-                pw = int(self.data.get('player_white'))
-                self.fields['player_black'].queryset = Player.objects.exclude(pk=pw)
-            elif self.initial.get('player_white'):
-                init_pw = self.initial.get('player_white')
-                if hasattr(init_pw, 'pk'):
-                    self.fields['player_black'].queryset = Player.objects.exclude(pk=init_pw.pk)
-        except Exception:
-            # fallback: leave full queryset
-            pass
+    field_order = ['player_white', 'player_black', 'result']
 
     def clean(self):
         cleaned = super().clean()
         pw = cleaned.get('player_white')
         pb = cleaned.get('player_black')
-        if pw and pb and pw == pb:
+        if pw is None or pb is None:
+            return cleaned
+        if pw == pb:
             raise forms.ValidationError('A player cannot play themselves')
-        return cleaned
\ No newline at end of file
+
+        # one primary-key query validates both players
+        players = Player.objects.in_bulk([pw, pb])
+        for field, pk in (('player_white', pw), ('player_black', pb)):
+            if pk in players:
+                cleaned[field] = players[pk]
+                setattr(self.instance, field, players[pk])
+            else:
+                self.add_error(field, 'Select a valid player.')
+        return cleaned
+
+
+class TournamentForm(forms.ModelForm):
+    players = forms.ModelMultipleChoiceField(
+        queryset=Player.objects.order_by('name'),
+        widget=forms.CheckboxSelectMultiple,
+    )
+
+    class Meta:
+        model = Tournament
+        fields = ['name', 'description', 'tournament_type', 'num_rounds', 'players']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control'}),
+            'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+            'tournament_type': forms.Select(attrs={'class': 'form-control'}),
+            'num_rounds': forms.NumberInput(attrs={'class': 'form-control'}),
+        }
+
+    def clean_players(self):
+        players = self.cleaned_data['players']
+        if len(players) < 2:
+            raise forms.ValidationError('Select at least two players')
+        return players
+
+
+class MatchImportForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('', 'Detect from file name'),
+        ('csv', 'CSV (white, black, result columns)'),
+        ('pgn', 'PGN (White, Black, Result tags)'),
+    ]
+
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control'}))
+    format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+
+    def clean(self):
+        cleaned = super().clean()
+        upload = cleaned.get('file')
+        if upload and not cleaned.get('format'):
+            extension = upload.name.rsplit('.', 1)[-1].lower() if '.' in upload.name else ''
+            if extension not in ('csv', 'pgn'):
+                raise forms.ValidationError('Choose a format or upload a .csv or .pgn file')
+            cleaned['format'] = extension
+        return cleaned
+
@@ -0,0 +1,119 @@
+from django.db.models import Q
+
+from .bulk import bulk_update_fields
+from .models import HeadToHead, Match
+
+
+HEAD_TO_HEAD_FIELDS = ['low_wins', 'draws', 'high_wins', 'low_rating_change', 'high_rating_change']
+
+# games listed under the lifetime record on the head-to-head page
+RECENT_GAMES = 10
+
+
+def player_pair(a_id, b_id):
+    """The (player_low, player_high) key of a pair of player ids."""
+    return (a_id, b_id) if a_id < b_id else (b_id, a_id)
+
+
+def tally(games, sign=1):
+    """Sum (white_id, black_id, result, white_change, black_change) games per pair.
+
+    Returns {(low_id, high_id): [low_wins, draws, high_wins, low_rating_change,
+    high_rating_change]}, every value multiplied by `sign`.
+    """
+    totals = {}
+    for white_id, black_id, result, white_change, black_change in games:
+        pair = player_pair(white_id, black_id)
+        row = totals.setdefault(pair, [0, 0, 0, 0, 0])
+        white_is_low = white_id == pair[0]
+        if result == 'D':
+            row[1] += sign
+        elif (result == 'W') == white_is_low:
+            row[0] += sign
+        else:
+            row[2] += sign
+        low_change, high_change = (white_change, black_change) if white_is_low else (black_change, white_change)
+        row[3] += sign * low_change
+        row[4] += sign * high_change
+    return totals
+
+
+def _games(matches):
+    return [
+        (match.player_white_id, match.player_black_id, match.result, match.white_rating_change, match.black_rating_change)
+        for match in matches
+    ]
+
+
+def _apply(totals):
+    # missing pairs are inserted empty first, then every row is locked and written back at once
+    HeadToHead.objects.bulk_create(
+        [HeadToHead(player_low_id=low, player_high_id=high) for low, high in totals],
+        ignore_conflicts=True,
+    )
+    lows = sorted({low for low, _ in totals})
+    highs = sorted({high for _, high in totals})
+    rows = [
+        row
+        for row in HeadToHead.objects.select_for_update()
+        .filter(player_low_id__in=lows, player_high_id__in=highs)
+        .order_by('pk')
+        if (row.player_low_id, row.player_high_id) in totals
+    ]
+    for row in rows:
+        for field, delta in zip(HEAD_TO_HEAD_FIELDS, totals[(row.player_low_id, row.player_high_id)]):
+            setattr(row, field, getattr(row, field) + delta)
+    bulk_update_fields(rows, HEAD_TO_HEAD_FIELDS)
+
+
+def record_head_to_head(matches):
+    """Add newly recorded matches to their pairs' records; call inside the recording transaction."""
+    if matches:
+        _apply(tally(_games(matches)))
+
+
+def revert_head_to_head(matches):
+    """Take reverted matches back out of their pairs' records; call inside the reverting transaction."""
+    if matches:
+        _apply(tally(_games(matches), sign=-1))
+
+
+def restate_head_to_head(old_games, new_games):
+    """Replace re-rated games' old rating changes with new ones, both as `tally` tuples."""
+    totals = tally(new_games)
+    for pair, deltas in tally(old_games, sign=-1).items():
+        row = totals.setdefault(pair, [0, 0, 0, 0, 0])
+        for idx, delta in enumerate(deltas):
+            row[idx] += delta
+    if totals:
+        _apply(totals)
+
+
+def get_head_to_head(a, b, recent=RECENT_GAMES):
+    """Return (record, recent_matches) for two players, from `a`'s side.
+
+    `record` is a dict of wins, draws, losses and rating_change for `a`
+    against `b`, read from the pair's HeadToHead row. `recent_matches` are
+    their latest non-reverted games still within the retention window.
+    """
+    low_id, high_id = player_pair(a.pk, b.pk)
+    row = HeadToHead.objects.filter(player_low_id=low_id, player_high_id=high_id).first()
+    if row is None:
+        row = HeadToHead(player_low_id=low_id, player_high_id=high_id)
+    if a.pk == low_id:
+        record = {'wins': row.low_wins, 'draws': row.draws, 'losses': row.high_wins,
+                  'rating_change': row.low_rating_change, 'opponent_rating_change': row.high_rating_change}
+    else:
+        record = {'wins': row.high_wins, 'draws': row.draws, 'losses': row.low_wins,
+                  'rating_change': row.high_rating_change, 'opponent_rating_change': row.low_rating_change}
+    record['games'] = row.games
+
+    recent_matches = list(
+        Match.objects.select_related('player_white', 'player_black')
+        .filter(
+            Q(player_white=a, player_black=b) | Q(player_white=b, player_black=a),
+            is_reverted=False,
+        )
+        .order_by('-created_at', '-id')[:recent]
+    )
+    return record, recent_matches
@@ -0,0 +1,215 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Player, Match, PlayerMatch, Pairing
+from .head_to_head import record_head_to_head, revert_head_to_head
+from .player_stats import record_player_stats, revert_player_stats
+from .rating_systems import RATING_STATE_FIELDS, get_rating_system
+from .player_index import player_index
+from .ranking_cache import bump_ranking_version
+
+
+PLAYER_STATE_FIELDS = RATING_STATE_FIELDS + ['latest_match']
+
+
+class MatchRevertError(Exception):
+    """Raised when a match cannot be reverted in the current state."""
+
+
+def record_match(match):
+    """Rate and save an unsaved Match (players and result set), updating both players.
+
+    Snapshots each player's state before and after the game so the match can
+    be reverted exactly, and moves both players' `latest_match` pointers to it.
+    """
+    with transaction.atomic():
+        # lock in primary-key order so concurrent recordings can't deadlock
+        locked = {
+            player.pk: player
+            for player in Player.objects.select_for_update()
+            .filter(pk__in=[match.player_white_id, match.player_black_id])
+            .order_by('pk')
+        }
+        white = locked[match.player_white_id]
+        black = locked[match.player_black_id]
+
+        match.player_white = white
+        match.player_black = black
+        match.white_previous_match_id = white.latest_match_id
+        match.black_previous_match_id = black.latest_match_id
+
+        # rate the game and snapshot both players' state before and after it
+        rating_system = get_rating_system()
+        batch = rating_system.process_matches([white, black], [(white.pk, black.pk, match.result)])
+        for field, value in batch.snapshot(0).items():
+            setattr(match, field, value)
+        rating_system.update_players([white, black], batch)
+
+        match.save()
+        white.latest_match = match
+        black.latest_match = match
+        white.save(update_fields=PLAYER_STATE_FIELDS)
+        black.save(update_fields=PLAYER_STATE_FIELDS)
+        timeline = PlayerMatch.for_match(match)
+        record_player_stats([match], timeline)
+        PlayerMatch.objects.bulk_create(timeline)
+        record_head_to_head([match])
+        bump_ranking_version()
+    player_index.set_ratings([white, black])
+
+    return match
+
+
+def revert_match(match):
+    """Revert a single match, which must be the latest active match of both players.
+
+    `match` should be fetched with select_related players inside the caller's
+    transaction. Raises MatchRevertError when either player has a newer match
+    or a newer rated tournament game.
+    """
+    if not match.is_latest_for_both:
+        raise MatchRevertError(
+            'Cannot revert this match because one of the players has newer recorded matches. '
+            'Revert the newest matches first.'
+        )
+    _check_no_newer_tournament_games([match])
+    with transaction.atomic():
+        white = match.player_white
+        black = match.player_black
+        _undo(match, white, black, timezone.now())
+        _save_reverts([match], [white, black])
+    return [match]
+
+
+def revert_matches_back_to(target):
+    """Revert `target` and every newer active match that depends on it, newest first.
+
+    A match depends on the target when it shares a player with the target,
+    or with another dependent match, and was played after it. Each affected
+    player gets a floor (their earliest dependent match); the newest
+    `latest_match` at or above its player's floor is undone next, unless its
+    other player has newer games, in which case that player gets a floor too
+    and their games go first. Everything is written in one transaction, and
+    nothing is if a player has rated tournament games newer than their
+    earliest reverted match. Returns the reverted matches, newest first.
+    """
+    if target.is_reverted:
+        raise MatchRevertError('This match has already been reverted.')
+
+    players = {}
+    matches = {target.pk: target}
+    floors = {target.player_white_id: _match_order(target), target.player_black_id: _match_order(target)}
+    reverted = []
+    now = timezone.now()
+
+    with transaction.atomic():
+        while True:
+            missing = sorted(floors.keys() - players.keys())
+            if missing:
+                players.update(
+                    (player.pk, player)
+                    for player in Player.objects.select_for_update().filter(pk__in=missing).order_by('pk')
+                )
+
+            pointers = {players[pk].latest_match_id for pk in floors} - {None}
+            unknown = pointers - matches.keys()
+            if unknown:
+                matches.update(Match.objects.select_for_update().in_bulk(unknown))
+
+            pending = [
+                matches[players[pk].latest_match_id]
+                for pk, floor in floors.items()
+                if players[pk].latest_match_id is not None
+                and _match_order(matches[players[pk].latest_match_id]) >= floor
+            ]
+            if not pending:
+                break
+
+            newest = max(pending, key=_match_order)
+            for pk in (newest.player_white_id, newest.player_black_id):
+                floors[pk] = min(floors.get(pk, _match_order(newest)), _match_order(newest))
+
+            white = players.get(newest.player_white_id)
+            black = players.get(newest.player_black_id)
+            if white is None or black is None or white.latest_match_id != newest.pk or black.latest_match_id != newest.pk:
+                continue
+
+            _undo(newest, white, black, now)
+            reverted.append(newest)
+
+        if not target.is_reverted:
+            raise MatchRevertError('This match is not part of the players\' active match history.')
+        _check_no_newer_tournament_games(reverted)
+        _save_reverts(reverted, [players[pk] for pk in sorted(floors)])
+
+    return reverted
+
+
+def _check_no_newer_tournament_games(matches):
+    """Raise MatchRevertError if a player of `matches` has a rated tournament game after their earliest one.
+
+    Tournament results are not part of the match chain: restoring the
+    snapshot taken before the match would silently drop them.
+    """
+    since = {}
+    for match in matches:
+        for pk in (match.player_white_id, match.player_black_id):
+            since[pk] = min(since.get(pk, match.created_at), match.created_at)
+    if not since:
+        return
+    rated = (
+        Pairing.objects.exclude(result='P')
+        .filter(Q(player_white__in=list(since)) | Q(player_black__in=list(since)))
+        # results entered before recorded_at was kept fall back to when the board was paired
+        .annotate(played_at=Coalesce('recorded_at', 'created_at'))
+        .filter(played_at__gt=min(since.values()))
+        .values_list('player_white_id', 'player_black_id', 'played_at')
+    )
+    blocked = {
+        pk for white, black, played_at in rated for pk in (white, black) if pk in since and played_at > since[pk]
+    }
+    if blocked:
+        names = ', '.join(Player.objects.filter(pk__in=blocked).order_by('name').values_list('name', flat=True))
+        raise MatchRevertError(
+            f'Cannot revert: {names} played rated tournament games after this match, '
+            'and tournament results cannot be reverted.'
+        )
+
+
+def _match_order(match):
+    # bulk imports share one created_at, so the id breaks ties
+    return (match.created_at, match.pk)
+
+
+def _undo(match, white, black, now):
+    """Restore both players to the snapshots taken before `match` (in memory only)."""
+    white.rating = match.white_rating_before
+    white.peak_rating = match.white_peak_before
+    white.games_played = max(match.white_games_before, 0)
+    white.latest_match_id = match.white_previous_match_id
+    if match.white_deviation_before is not None:
+        white.rating_deviation = match.white_deviation_before
+        white.volatility = match.white_volatility_before
+
+    black.rating = match.black_rating_before
+    black.peak_rating = match.black_peak_before
+    black.games_played = max(match.black_games_before, 0)
+    black.latest_match_id = match.black_previous_match_id
+    if match.black_deviation_before is not None:
+        black.rating_deviation = match.black_deviation_before
+        black.volatility = match.black_volatility_before
+
+    match.is_reverted = True
+    match.reverted_at = now
+
+
+def _save_reverts(matches, players):
+    Player.objects.bulk_update(players, PLAYER_STATE_FIELDS)
+    Match.objects.bulk_update(matches, ['is_reverted', 'reverted_at'])
+    PlayerMatch.objects.filter(match__in=matches).update(is_reverted=True)
+    revert_head_to_head(matches)
+    revert_player_stats(matches)
+    bump_ranking_version()
+    player_index.set_ratings(players)
@@ -0,0 +1,52 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Match, SiteState
+
+
+PURGE_STATE_KEY = 'expired_matches_purged'
+
+# monotonic time of this process's last look at the shared purge record
+_last_purge_check = None
+
+
+def purge_expired_matches(batch_size=500):
+    """Delete matches older than the retention window and record when it ran.
+
+    The `expired_matches_purged` SiteState row holds the number of matches
+    deleted by the last run; its `updated_at` is the last run time.
+    """
+    deleted = Match.cleanup_expired_records(batch_size=batch_size)
+    SiteState.objects.update_or_create(key=PURGE_STATE_KEY, defaults={'value': deleted})
+    return deleted
+
+
+def purge_expired_matches_if_due():
+    """Run `purge_expired_matches` at most once per MATCH_PURGE_INTERVAL seconds across all workers.
+
+    Meant to be called from write requests. Returns the number of deleted
+    matches, or None when no purge was due. A falsy interval disables the
+    in-process purge so only the `purge_expired_matches` command runs it.
+    """
+    global _last_purge_check
+
+    interval = getattr(settings, 'MATCH_PURGE_INTERVAL', 60 * 60)
+    if not interval:
+        return None
+
+    now = time.monotonic()
+    if _last_purge_check is not None and now - _last_purge_check < interval:
+        return None
+    _last_purge_check = now
+
+    # Claim the run with a conditional update so concurrent workers don't purge twice.
+    _, first_run = SiteState.objects.get_or_create(key=PURGE_STATE_KEY)
+    if not first_run:
+        due_before = timezone.now() - timedelta(seconds=interval)
+        claimed = SiteState.objects.filter(key=PURGE_STATE_KEY, updated_at__lte=due_before).update(updated_at=timezone.now())
+        if not claimed:
+            return None
+    return purge_expired_matches(batch_size=getattr(settings, 'MATCH_PURGE_BATCH_SIZE', 500))
@@ -0,0 +1,335 @@
+import json
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from ratings.bulk import bulk_update_fields
+from ratings.checkpoints import create_checkpoint
+from ratings.head_to_head import tally
+from ratings.models import HeadToHead, Match, Player, PlayerMatch, PlayerStats, Round, Tournament
+from ratings.passcode import PASSCODE_COOKIE, grant_token
+from ratings.player_stats import STATS_FIELDS, stats_from_timeline
+from ratings.ranking_cache import bump_ranking_version
+from ratings.rating_calculator import BatchResult, RatingCalculator
+from ratings.rating_systems import get_rating_system
+
+
+INSERT_CHUNK = 20000
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database with synthetic players and matches, drive every page through the '
+        'test client and report p50/p95 latency, SQL queries and peak memory per view as JSON. '
+        'With --baseline, fail when a view got slower, runs more queries or allocates more.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=1000, help='Players to seed (default: 1000).')
+        parser.add_argument('--matches', type=int, default=100_000, help='Matches to seed (default: 100000).')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per view (default: 20).')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--db-file', help='Build the throwaway SQLite database in this file instead of memory.')
+        parser.add_argument('--output', help='Also write the JSON report to this file (e.g. to use as a baseline).')
+        parser.add_argument('--baseline', help='JSON report of an earlier run to compare against.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative growth of p95 latency and peak memory over the baseline (default: 0.25).')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if options['db_file']:
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = options['db_file']
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        setup_test_environment()
+        try:
+            started = time.perf_counter()
+            self._seed(rng, options['players'], options['matches'])
+            self.stderr.write(
+                f'Seeded {options["players"]} players and {options["matches"]} matches '
+                f'in {time.perf_counter() - started:.1f}s'
+            )
+            report = {
+                'players': options['players'],
+                'matches': options['matches'],
+                'repeat': options['repeat'],
+                'views': self._run_views(rng, options['repeat']),
+            }
+        finally:
+            teardown_test_environment()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+        if options['baseline']:
+            self._compare(report, options['baseline'], options['tolerance'])
+
+    # seeding
+
+    def _seed(self, rng, player_count, match_count):
+        today = date.today()
+        with transaction.atomic():
+            players = Player.objects.bulk_create(
+                [
+                    Player(
+                        name=f'Bench Player {number:06d}',
+                        birth_date=today - timedelta(days=rng.randint(10 * 365, 60 * 365)) if rng.random() < 0.5 else None,
+                    )
+                    for number in range(1, player_count + 1)
+                ],
+                batch_size=1000,
+            )
+            player_ids = np.array([player.pk for player in players], dtype=np.int64)
+            white_idx = np.array([rng.randrange(player_count) for _ in range(match_count)], dtype=np.int64)
+            black_idx = (white_idx + np.array(
+                [rng.randrange(1, player_count) for _ in range(match_count)], dtype=np.int64,
+            )) % player_count
+            results = [rng.choice('WBD') for _ in range(match_count)]
+
+            # rate everything in one pass, as an import of the whole history would
+            batch = get_rating_system().process_batch(
+                [player.rating for player in players],
+                [player.peak_rating for player in players],
+                [0] * player_count,
+                RatingCalculator.junior_flags([player.birth_date for player in players], today),
+                white_idx, black_idx, results,
+            )
+
+            # games spread evenly over the retention window, oldest first
+            start = timezone.now() - timedelta(days=29)
+            step = timedelta(days=29) / max(match_count, 1)
+            created = [
+                connection.ops.adapt_datetimefield_value(start + step * pos) for pos in range(match_count)
+            ]
+            white_ids = player_ids[white_idx].tolist()
+            black_ids = player_ids[black_idx].tolist()
+
+            latest = {}
+            white_previous, black_previous = [], []
+            for match_id, (white, black) in enumerate(zip(white_ids, black_ids), start=1):
+                white_previous.append(latest.get(white))
+                black_previous.append(latest.get(black))
+                latest[white] = latest[black] = match_id
+
+            snapshot_fields = BatchResult.SNAPSHOT_FIELDS + BatchResult.STATE_SNAPSHOT_FIELDS
+            snapshots = [getattr(batch, field).tolist() for field in snapshot_fields]
+            self._insert(
+                Match,
+                ['id', 'player_white_id', 'player_black_id', 'result'] + snapshot_fields
+                + ['white_previous_match_id', 'black_previous_match_id', 'is_reverted', 'created_at'],
+                (
+                    (pos + 1, white_ids[pos], black_ids[pos], results[pos], *(column[pos] for column in snapshots),
+                     white_previous[pos], black_previous[pos], False, created[pos])
+                    for pos in range(match_count)
+                ),
+            )
+
+            player_results = {'W': ('W', 'L'), 'B': ('L', 'W'), 'D': ('D', 'D')}
+            timeline = []
+            for pos in range(match_count):
+                white_result, black_result = player_results[results[pos]]
+                timeline.append((2 * pos + 1, white_ids[pos], 'W', white_result, pos + 1))
+                timeline.append((2 * pos + 2, black_ids[pos], 'B', black_result, pos + 1))
+            white_before = batch.white_rating_before.tolist()
+            black_before = batch.black_rating_before.tolist()
+            totals, streaks_before = stats_from_timeline(
+                (pk, player_id, color, result, white_before[match_id - 1], black_before[match_id - 1])
+                for pk, player_id, color, result, match_id in timeline
+            )
+            self._insert(
+                PlayerMatch,
+                ['id', 'player_id', 'match_id', 'color', 'result', 'created_at', 'is_reverted', 'streak_before'],
+                (
+                    (pk, player_id, match_id, color, result, created[match_id - 1], False, streaks_before[pk])
+                    for pk, player_id, color, result, match_id in timeline
+                ),
+            )
+            del timeline
+
+            self._insert(
+                PlayerStats,
+                ['player_id'] + STATS_FIELDS + ['purged_games'],
+                ((player_id, *(values[field] for field in STATS_FIELDS), 0) for player_id, values in totals.items()),
+            )
+            white_changes = batch.white_change.tolist()
+            black_changes = batch.black_change.tolist()
+            self._insert(
+                HeadToHead,
+                ['player_low_id', 'player_high_id', 'low_wins', 'draws', 'high_wins',
+                 'low_rating_change', 'high_rating_change'],
+                (
+                    pair + tuple(values)
+                    for pair, values in tally(
+                        (white_ids[pos], black_ids[pos], results[pos], white_changes[pos], black_changes[pos])
+                        for pos in range(match_count)
+                    ).items()
+                ),
+            )
+
+            get_rating_system().update_players(players, batch)
+            for player in players:
+                player.latest_match_id = latest.get(player.pk)
+            bulk_update_fields(
+                players,
+                ['rating', 'peak_rating', 'games_played', 'rating_deviation', 'volatility', 'latest_match'],
+            )
+            bump_ranking_version()
+
+        create_checkpoint(force=True)
+        self._seed_tournament(players[:64])
+
+    @staticmethod
+    def _insert(model, fields, rows):
+        """INSERT `rows` (tuples in `fields` order) with executemany; the ORM is too slow for millions of rows."""
+        opts = model._meta
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(opts.get_field(name).column) for name in fields)
+        sql = (
+            f'INSERT INTO {quote(opts.db_table)} ({columns}) '
+            f'VALUES ({", ".join(["%s"] * len(fields))})'
+        )
+        with connection.cursor() as cursor:
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == INSERT_CHUNK:
+                    cursor.executemany(sql, chunk)
+                    chunk = []
+            if chunk:
+                cursor.executemany(sql, chunk)
+
+    def _seed_tournament(self, players):
+        client = self._client()
+        client.post('/tournaments/add/', {
+            'name': 'Bench Open', 'description': '', 'tournament_type': 'SWISS', 'num_rounds': 5,
+            'players': [player.pk for player in players],
+        })
+        tournament = Tournament.objects.get(name='Bench Open')
+        client.post(f'/tournaments/{tournament.pk}/rounds/generate/')
+
+    # measuring
+
+    @staticmethod
+    def _client():
+        client = Client()
+        client.cookies[PASSCODE_COOKIE] = grant_token()
+        return client
+
+    def _views(self, rng):
+        """(name, method, path factory, data factory) for each page; factories run before every request."""
+        player_ids = list(Player.objects.values_list('pk', flat=True))
+        tournament = Tournament.objects.get(name='Bench Open')
+        round_obj = Round.objects.filter(tournament=tournament).first()
+
+        def player():
+            return rng.choice(player_ids)
+
+        def pair():
+            white, black = rng.sample(player_ids, 2)
+            return {'player_white': white, 'player_black': black, 'result': rng.choice('WBD')}
+
+        def latest_match():
+            # the newest active match is always the latest one of both its players
+            newest = Match.objects.filter(is_reverted=False).order_by('-created_at', '-id').values_list('pk', flat=True)[0]
+            return f'/matches/{newest}/revert/'
+
+        return [
+            ('player_list', 'get', lambda: '/players/', None),
+            ('player_list_search', 'get', lambda: f'/players/?q=Player {rng.randrange(100):02d}', None),
+            ('player_search_suggestions', 'get', lambda: f'/players/suggestions/?q=Player {rng.randrange(1000):03d}', None),
+            ('player_lookup', 'get', lambda: f'/players/lookup/?ids={player()},{player()}', None),
+            ('player_detail', 'get', lambda: f'/players/{player()}/', None),
+            ('player_rating_history', 'get', lambda: f'/players/{player()}/rating-history/', None),
+            ('head_to_head', 'get', lambda: '/players/{}/vs/{}/'.format(*rng.sample(player_ids, 2)), None),
+            ('player_create_form', 'get', lambda: '/players/add/', None),
+            ('player_update_form', 'get', lambda: f'/players/{player()}/edit/', None),
+            ('player_ranking', 'get', lambda: '/players/ranking/', None),
+            ('player_ranking_as_of', 'get', lambda: f'/players/ranking/?as_of={date.today().isoformat()}', None),
+            ('player_ranking_pdf', 'get', lambda: '/players/ranking/pdf/', None),
+            ('match_create_form', 'get', lambda: '/matches/add/', None),
+            ('match_create', 'post', lambda: '/matches/add/', pair),
+            ('match_revert', 'post', latest_match, dict),
+            ('match_history', 'get', lambda: '/matches/history/', None),
+            ('match_history_player', 'get', lambda: f'/matches/history/?player={player()}', None),
+            ('match_import_form', 'get', lambda: '/matches/import/', None),
+            ('tournament_list', 'get', lambda: '/tournaments/', None),
+            ('tournament_detail', 'get', lambda: f'/tournaments/{tournament.pk}/', None),
+            ('tournament_standings', 'get', lambda: f'/tournaments/{tournament.pk}/standings/', None),
+            ('round_detail', 'get', lambda: f'/tournaments/{tournament.pk}/rounds/{round_obj.pk}/', None),
+        ]
+
+    def _run_views(self, rng, repeat):
+        client = self._client()
+        report = {}
+        for name, method, path, data in self._views(rng):
+            send = getattr(client, method)
+            # one untimed request warms caches and indexes, as on a running site
+            send(path(), data() if data else None)
+
+            timings, queries, statuses = [], [], set()
+            for _ in range(repeat):
+                url, payload = path(), data() if data else None
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = send(url, payload)
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(captured))
+                statuses.add(response.status_code)
+
+            # tracemalloc slows everything down, so memory gets its own request
+            url, payload = path(), data() if data else None
+            tracemalloc.start()
+            send(url, payload)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            report[name] = {
+                'p50_ms': round(float(np.percentile(timings, 50)), 2),
+                'p95_ms': round(float(np.percentile(timings, 95)), 2),
+                'queries': max(queries),
+                'peak_kib': round(peak / 1024, 1),
+                'status': sorted(statuses),
+            }
+            self.stderr.write(
+                f'{name:<28} p50 {report[name]["p50_ms"]:>9.2f} ms  p95 {report[name]["p95_ms"]:>9.2f} ms  '
+                f'{report[name]["queries"]:>3} queries  {report[name]["peak_kib"]:>10.1f} KiB'
+            )
+        return report
+
+    def _compare(self, report, baseline_path, tolerance):
+        with open(baseline_path) as handle:
+            baseline = json.load(handle)
+        if (baseline.get('players'), baseline.get('matches')) != (report['players'], report['matches']):
+            self.stderr.write(self.style.WARNING(
+                f'Baseline was seeded with {baseline.get("players")} players and {baseline.get("matches")} '
+                f'matches; comparing anyway.'
+            ))
+
+        regressions = []
+        for name, current in report['views'].items():
+            previous = baseline.get('views', {}).get(name)
+            if previous is None:
+                continue
+            if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                regressions.append(f'{name}: p95 {previous["p95_ms"]} -> {current["p95_ms"]} ms')
+            if current['queries'] > previous['queries']:
+                regressions.append(f'{name}: queries {previous["queries"]} -> {current["queries"]}')
+            if current['peak_kib'] > previous['peak_kib'] * (1 + tolerance):
+                regressions.append(f'{name}: peak memory {previous["peak_kib"]} -> {current["peak_kib"]} KiB')
+            if current['status'] != previous['status']:
+                regressions.append(f'{name}: status {previous["status"]} -> {current["status"]}')
+
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+        self.stderr.write(self.style.SUCCESS(f'No regressions against {baseline_path}.'))
@@ -0,0 +1,82 @@
+import random
+import statistics
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from ratings.models import Player
+from ratings.player_index import PlayerNameIndex
+
+
+FIRST_NAMES = ['Kwame', 'Ama', 'Kofi', 'Akosua', 'Yaw', 'Abena', 'Kwabena', 'Efua', 'Kojo', 'Esi', 'Kwaku', 'Adwoa']
+LAST_NAMES = ['Mensah', 'Owusu', 'Boateng', 'Asante', 'Osei', 'Appiah', 'Agyeman', 'Darko', 'Ofori', 'Amoah']
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare player search suggestions from the in-memory name index against the '
+        'name__icontains query on synthetic rosters, built in a throwaway database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Roster sizes to benchmark (default: 1000 10000 100000).')
+        parser.add_argument('--queries', type=int, default=200, help='Queries timed per size.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f'{"players":>8} {"backend":>8} {"mean us":>10} {"p95 us":>10} {"build ms":>9}')
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            for size in options['sizes']:
+                self._run_size(rng, size, options['queries'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run_size(self, rng, size, query_count):
+        # each roster is rolled back so the next size starts from an empty table
+        with transaction.atomic():
+            Player.objects.bulk_create(
+                [Player(name=self._name(rng, i), rating=rng.randint(800, 2600)) for i in range(size)],
+                batch_size=2000,
+            )
+            names = list(Player.objects.values_list('name', flat=True)[:1000])
+            queries = [self._query(rng, rng.choice(names)) for _ in range(query_count)]
+
+            like = self._time(queries, lambda q: list(
+                Player.objects.filter(name__icontains=q).order_by('name').values('id', 'name', 'rating')[:8]
+            ))
+
+            index = PlayerNameIndex()
+            started = time.perf_counter()
+            index.search('a')  # forces the lazy build
+            build_ms = (time.perf_counter() - started) * 1000
+            trie = self._time(queries, lambda q: index.search(q, limit=8))
+
+            self.stdout.write(f'{size:>8} {"like":>8} {like[0]:>10.1f} {like[1]:>10.1f} {"":>9}')
+            self.stdout.write(f'{size:>8} {"index":>8} {trie[0]:>10.1f} {trie[1]:>10.1f} {build_ms:>9.1f}')
+            transaction.set_rollback(True)
+
+    def _name(self, rng, i):
+        suffix = ''.join(rng.choices(string.ascii_lowercase, k=3))
+        return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {suffix}{i}'
+
+    def _query(self, rng, name):
+        # what a user has typed so far: a prefix, or a fragment from inside the name
+        length = rng.randint(1, 6)
+        start = 0 if rng.random() < 0.5 else rng.randint(0, max(len(name) - length, 0))
+        return name[start:start + length]
+
+    def _time(self, queries, run):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        timings.sort()
+        return statistics.mean(timings), timings[int(len(timings) * 0.95) - 1]
@@ -0,0 +1,113 @@
+import random
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from ratings.rating_calculator import EXPECTED_SCORE_LIMIT, RESULT_WHITE_SCORES, RatingCalculator
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the Elo rating kernel (expected-score table, K tiers resolved once per batch) against '
+        'the per-game formulas on synthetic games, and check the results are identical. Touches no data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=1_000_000, help='Synthetic games to rate (default: 1000000).')
+        parser.add_argument('--players', type=int, default=2000, help='Players the games are drawn from.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        mismatched = self._check_table()
+        self.stdout.write(
+            f'Expected-score table ({2 * EXPECTED_SCORE_LIMIT + 1} entries): '
+            f'{mismatched} of every difference in +/-4000 x K tier x score round differently from the formula.'
+        )
+
+        rng = random.Random(options['seed'])
+        today = date.today()
+        players = [
+            SimpleNamespace(
+                rating=rng.randint(1000, 2700),
+                games_played=rng.choice([0, 10, 29, 50, 200]),
+                birth_date=today - timedelta(days=rng.randint(10 * 365, 60 * 365)) if rng.random() < 0.7 else None,
+            )
+            for _ in range(options['players'])
+        ]
+        games = []
+        for _ in range(options['games']):
+            white, black = rng.sample(range(len(players)), 2)
+            games.append((white, black, rng.choice('WBD')))
+        self.stdout.write(f'{len(games)} games between {len(players)} players\n')
+        self.stdout.write(f'{"path":<38} {"seconds":>9} {"games/s":>12}')
+
+        started = time.perf_counter()
+        reference = self._replay(players, games, self._formula_change)
+        self._report('per game, formula + date.today() per K', started, len(games))
+
+        started = time.perf_counter()
+        scalar = self._replay(players, games, self._table_change)
+        self._report('per game, table + one today', started, len(games))
+
+        started = time.perf_counter()
+        batch = RatingCalculator.process_batch(
+            [player.rating for player in players],
+            [player.rating for player in players],
+            [player.games_played for player in players],
+            RatingCalculator.junior_flags([player.birth_date for player in players], today),
+            [white for white, _, _ in games],
+            [black for _, black, _ in games],
+            [result for _, _, result in games],
+        )
+        self._report('batch kernel (process_batch)', started, len(games))
+
+        kernel = np.stack([batch.white_change, batch.black_change], axis=1)
+        identical = np.array_equal(reference, scalar) and np.array_equal(reference, kernel)
+        style = self.style.SUCCESS if identical else self.style.ERROR
+        self.stdout.write(style(f'\nRating changes identical on every game: {"yes" if identical else "NO"}'))
+
+    def _report(self, label, started, count):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label:<38} {elapsed:>9.2f} {count / elapsed:>12,.0f}')
+
+    @staticmethod
+    def _replay(players, games, change):
+        """Rate `games` one after another on copies of `players`; returns an (n, 2) array of changes."""
+        state = [SimpleNamespace(**vars(player)) for player in players]
+        today = date.today()
+        changes = np.empty((len(games), 2), dtype=np.int64)
+        for pos, (white_idx, black_idx, result) in enumerate(games):
+            white, black = state[white_idx], state[black_idx]
+            white_score = RESULT_WHITE_SCORES[result]
+            white_change = change(white, black.rating, white_score, today)
+            black_change = change(black, white.rating, 1.0 - white_score, today)
+            white.rating += white_change
+            black.rating += black_change
+            white.games_played += 1
+            black.games_played += 1
+            changes[pos] = white_change, black_change
+        return changes
+
+    @staticmethod
+    def _formula_change(player, opponent_rating, score, today):
+        # the per-game path as it was: the Elo formula, and the age worked out again for every K
+        k_factor = RatingCalculator.get_k_factor(player)
+        return round(k_factor * (score - RatingCalculator.calculate_expected_score(player.rating, opponent_rating)))
+
+    @staticmethod
+    def _table_change(player, opponent_rating, score, today):
+        return RatingCalculator.calculate_rating_change(player, opponent_rating, score, today)
+
+    @staticmethod
+    def _check_table():
+        diffs = np.arange(-4000, 4001)
+        mismatched = 0
+        for k_factor in (10, 20, 40):
+            for score in (0.0, 0.5, 1.0):
+                formula = [round(k_factor * (score - 1 / (1 + 10 ** (int(diff) / 400)))) for diff in diffs]
+                table = np.round(k_factor * (score - RatingCalculator.batch_expected_scores(np.zeros_like(diffs), diffs)))
+                mismatched += int(np.count_nonzero(np.array(formula) != table))
+        return mismatched
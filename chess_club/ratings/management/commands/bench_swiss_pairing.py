@@ -0,0 +1,76 @@
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from ratings.swiss_pairing import BYE_SCORE, PairingError, SwissPairing, SwissPlayer
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the weighted Swiss pairing engine on synthetic in-memory tournaments and '
+        'check every round for rematches and unpaired players. Touches no data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 250, 500, 1000, 2000],
+                            help='Field sizes to benchmark (default: 50 100 250 500 1000 2000).')
+        parser.add_argument('--rounds', type=int, default=9, help='Rounds played per tournament.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(
+            f'{"players":>8} {"rounds":>7} {"mean ms":>9} {"max ms":>9} {"rematches":>10} {"unpaired":>9}'
+        )
+
+        for size in options['sizes']:
+            players = [
+                SwissPlayer(SimpleNamespace(id=pk, name=f'Player {pk}', rating=rng.randint(1000, 2600)))
+                for pk in range(1, size + 1)
+            ]
+            timings, rematches, unpaired = [], 0, 0
+            for _ in range(options['rounds']):
+                started = time.perf_counter()
+                try:
+                    pairs, bye = SwissPairing.pair_players(players)
+                except PairingError:
+                    # nobody can be paired without a rematch; count the whole field and stop
+                    unpaired += size
+                    break
+                timings.append((time.perf_counter() - started) * 1000)
+
+                unpaired += size - 2 * len(pairs) - (1 if bye is not None else 0)
+                for white, black in pairs:
+                    rematches += black.id in white.opponents
+                    self._play(rng, white, black)
+                if bye is not None:
+                    bye.byes += 1
+                    bye.score += BYE_SCORE
+
+            self.stdout.write(
+                f'{size:>8} {options["rounds"]:>7} {statistics.mean(timings):>9.1f} '
+                f'{max(timings):>9.1f} {rematches:>10} {unpaired:>9}'
+            )
+
+    def _play(self, rng, white, black):
+        """Record a game between two SwissPlayers, drawing the result from their rating gap."""
+        difference = white.score - black.score
+        white.floats.append('D' if difference > 0 else 'U' if difference < 0 else '')
+        black.floats.append('U' if difference > 0 else 'D' if difference < 0 else '')
+        white.opponents.add(black.id)
+        black.opponents.add(white.id)
+        white.colours.append('W')
+        black.colours.append('B')
+
+        expected = 1 / (1 + 10 ** ((black.rating - white.rating) / 400))
+        roll = rng.random()
+        if roll < expected - 0.1:
+            white.score += 1
+        elif roll < expected + 0.1:
+            white.score += 0.5
+            black.score += 0.5
+        else:
+            black.score += 1
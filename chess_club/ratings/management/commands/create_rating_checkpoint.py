@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from ratings.checkpoints import create_checkpoint
+
+
+class Command(BaseCommand):
+    help = 'Snapshot every player\'s rating for the ranking page\'s as_of view (run from cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Take a checkpoint even if no rating has changed since the last one.')
+
+    def handle(self, *args, **options):
+        checkpoint = create_checkpoint(force=options['force'])
+        if checkpoint is None:
+            self.stdout.write('No rating has changed since the last checkpoint; nothing written.')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored a checkpoint of {checkpoint.player_count} players at {checkpoint.taken_at:%Y-%m-%d %H:%M}.'
+        ))
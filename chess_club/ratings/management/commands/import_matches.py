@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ratings.match_import import MatchImportError, import_matches, parse_matches
+
+
+class Command(BaseCommand):
+    help = 'Import finished games from a CSV (white,black,result columns) or PGN file in one transaction.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or PGN file to import.')
+        parser.add_argument('--format', choices=['csv', 'pgn'],
+                            help='File format; inferred from the file extension when omitted.')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        fmt = options['format'] or path.suffix.lstrip('.').lower()
+        try:
+            text = path.read_text(encoding='utf-8-sig')
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+
+        try:
+            matches = import_matches(parse_matches(text, fmt))
+        except MatchImportError as exc:
+            raise CommandError('\n'.join(exc.errors))
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(matches)} matches from {path}.'))
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ratings.maintenance import purge_expired_matches
+
+
+class Command(BaseCommand):
+    help = 'Delete matches older than the 30-day retention window in bounded batches (run from cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'MATCH_PURGE_BATCH_SIZE', 500),
+                            help='Matches deleted per statement.')
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_matches(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired matches.'))
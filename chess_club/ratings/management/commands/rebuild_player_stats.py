@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ratings.bulk import bulk_update_fields
+from ratings.models import PlayerMatch, PlayerStats
+from ratings.player_stats import STATS_FIELDS, TIMELINE_COLUMNS, stats_from_timeline
+
+
+GAME_COUNTERS = [field for field in STATS_FIELDS if field.startswith(('white_', 'black_'))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute every player\'s stats from their non-reverted matches and rewrite the rows that '
+        'disagree, or only report them with --verify.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Report mismatching players without writing; exits with an error if there are any.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk update statement (default: 1000).')
+
+    def handle(self, *args, **options):
+        verify = options['verify']
+
+        with transaction.atomic():
+            timeline = PlayerMatch.objects.filter(is_reverted=False).order_by('created_at', 'match_id')
+            totals, streaks_before = stats_from_timeline(timeline.values_list(*TIMELINE_COLUMNS).iterator())
+            stored = {stats.player_id: stats for stats in PlayerStats.objects.select_for_update()}
+
+            # Players with purged games keep totals that no surviving match can confirm,
+            # so for them only the number of games is checked.
+            mismatched = []
+            unconfirmed = set()
+            for player_id in stored.keys() | totals.keys():
+                stats = stored.get(player_id) or PlayerStats(player_id=player_id)
+                expected = totals.get(player_id) or dict.fromkeys(STATS_FIELDS, 0)
+                if stats.purged_games:
+                    if stats.games - stats.purged_games == sum(expected[field] for field in GAME_COUNTERS):
+                        unconfirmed.add(player_id)
+                        continue
+                    stats.purged_games = 0
+                elif all(getattr(stats, field) == value for field, value in expected.items()):
+                    continue
+                for field, value in expected.items():
+                    setattr(stats, field, value)
+                mismatched.append(stats)
+
+            # their streaks ran on from purged games too, so the replay can't check those either
+            stale_streaks = [
+                PlayerMatch(pk=pk, streak_before=streaks_before[pk])
+                for pk, player_id, streak in timeline.values_list('pk', 'player_id', 'streak_before').iterator()
+                if player_id not in unconfirmed and streak != streaks_before[pk]
+            ]
+
+            if not verify:
+                PlayerStats.objects.bulk_create(
+                    [stats for stats in mismatched if stats.player_id not in stored], batch_size=options['batch_size'],
+                )
+                bulk_update_fields(
+                    [stats for stats in mismatched if stats.player_id in stored],
+                    STATS_FIELDS + ['purged_games'],
+                    batch_size=options['batch_size'],
+                )
+                bulk_update_fields(stale_streaks, ['streak_before'], batch_size=options['batch_size'])
+
+        summary = (
+            f'{len(mismatched)} players and {len(stale_streaks)} timeline streaks '
+            f'{"differ" if verify else "rewritten"}; {len(unconfirmed)} players have purged games '
+            f'and were checked by game count only.'
+        )
+        if verify and (mismatched or stale_streaks):
+            raise CommandError(f'Player stats are out of date: {summary}')
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,292 @@
+import heapq
+from itertools import groupby, islice
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ratings.bulk import bulk_update_fields
+from ratings.head_to_head import restate_head_to_head
+from ratings.models import Player, Match, Pairing, TournamentStanding
+from ratings.player_stats import adjust_opponent_ratings
+from ratings.rating_calculator import RatingCalculator, BatchResult
+from ratings.rating_systems import DEFAULT_DEVIATION, DEFAULT_VOLATILITY, RATING_STATE_FIELDS, get_rating_system
+from ratings.player_index import player_index
+from ratings.ranking_cache import bump_ranking_version
+
+
+# games recorded before Glicko-2 state was kept store None, which stands for the defaults
+STATE_DEFAULTS = {
+    field: DEFAULT_DEVIATION if field.endswith('deviation_before') else DEFAULT_VOLATILITY
+    for field in BatchResult.STATE_SNAPSHOT_FIELDS
+}
+
+PAIRING_FIELDS = ['white_rating_after', 'black_rating_after', 'white_rating_change', 'black_rating_change']
+PAIRING_SNAPSHOT_FIELDS = PAIRING_FIELDS + BatchResult.STATE_SNAPSHOT_FIELDS
+
+
+def stored_snapshot(stored, fields):
+    """A match's or pairing's stored values for `fields`, with missing Glicko-2 state read as the defaults."""
+    return [
+        STATE_DEFAULTS[field] if stored[field] is None and field in STATE_DEFAULTS else stored[field]
+        for field in fields
+    ]
+
+
+def snapshot_is_complete(stored, color):
+    """Whether a match holds real peak and games snapshots for `color`.
+
+    Matches recorded before those were kept still carry the column defaults,
+    0 games both before and after the game.
+    """
+    return stored[f'{color}_games_after'] == stored[f'{color}_games_before'] + 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay every non-reverted match and rated tournament game in the order they were played with the '
+        'configured rating system and rewrite player ratings, peaks, games played, Glicko-2 state, the '
+        'per-match snapshots and the tournament games\' rating changes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Number of games read and rated per step (default: 2000).')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk_update statement (default: 1000).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Compute everything and report the differences without writing.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        # Per-player state lives in flat arrays indexed by position; games are streamed.
+        rating_system = get_rating_system()
+        player_rows = list(Player.objects.order_by('pk').values_list(
+            'pk', 'rating', 'peak_rating', 'games_played', 'birth_date', 'rating_deviation', 'volatility',
+        ))
+        positions = {row[0]: idx for idx, row in enumerate(player_rows)}
+        player_ids = np.array([row[0] for row in player_rows], dtype=np.int64)
+        original = {
+            'rating': np.array([row[1] for row in player_rows], dtype=np.int64),
+            'peak_rating': np.array([row[2] for row in player_rows], dtype=np.int64),
+            'games_played': np.array([row[3] or 0 for row in player_rows], dtype=np.int64),
+            'rating_deviation': np.array([row[5] for row in player_rows], dtype=np.float64),
+            'volatility': np.array([row[6] for row in player_rows], dtype=np.float64),
+        }
+        ratings = original['rating'].copy()
+        peaks = original['peak_rating'].copy()
+        games = original['games_played'].copy()
+        deviations = original['rating_deviation'].copy()
+        volatilities = original['volatility'].copy()
+        birth_dates = [row[4] for row in player_rows]
+        juniors_on = {}
+        seeded = np.zeros(len(player_rows), dtype=bool)
+        window_games, window_highest = self._replayed_games(positions)
+
+        snapshot_fields = BatchResult.SNAPSHOT_FIELDS + BatchResult.STATE_SNAPSHOT_FIELDS
+        match_columns = ['pk', 'player_white_id', 'player_black_id', 'result'] + snapshot_fields
+        pairing_columns = (
+            ['pk', 'player_white_id', 'player_black_id', 'result'] + PAIRING_SNAPSHOT_FIELDS + ['round__tournament_id']
+        )
+        matches = (
+            ('match', row[0], dict(zip(match_columns, row[1:])))
+            for row in Match.objects.filter(is_reverted=False)
+            .order_by('created_at', 'pk')
+            .values_list('created_at', *match_columns)
+            .iterator(chunk_size=chunk_size)
+        )
+        # tournament games count from when their result was entered; older results only know when they were paired
+        pairings = (
+            ('pairing', row[0], dict(zip(pairing_columns, row[1:])))
+            for row in Pairing.objects.exclude(result='P')
+            .annotate(played_at=Coalesce('recorded_at', 'created_at'))
+            .order_by('played_at', 'pk')
+            .values_list('played_at', *pairing_columns)
+            .iterator(chunk_size=chunk_size)
+        )
+        stream = heapq.merge(matches, pairings, key=lambda event: event[1])
+
+        replayed = {'match': 0, 'pairing': 0}
+        changed_matches = 0
+        changed_pairings = 0
+        changed_tournaments = set()
+
+        with transaction.atomic():
+            while True:
+                chunk = list(islice(stream, chunk_size))
+                if not chunk:
+                    break
+
+                white_idx = np.array([positions[stored['player_white_id']] for _, _, stored in chunk], dtype=np.int64)
+                black_idx = np.array([positions[stored['player_black_id']] for _, _, stored in chunk], dtype=np.int64)
+
+                # Older matches may have been purged, so each player starts from the
+                # "before" snapshot of their earliest surviving game. Where that game
+                # doesn't carry a full snapshot, the games and peak before it are
+                # worked out from the player row instead.
+                for (kind, _, stored), white, black in zip(chunk, white_idx.tolist(), black_idx.tolist()):
+                    for color, idx in (('white', white), ('black', black)):
+                        if seeded[idx]:
+                            continue
+                        seeded[idx] = True
+                        if kind == 'match' and snapshot_is_complete(stored, color):
+                            ratings[idx] = stored[f'{color}_rating_before']
+                            peaks[idx] = stored[f'{color}_peak_before']
+                            games[idx] = stored[f'{color}_games_before']
+                        else:
+                            if kind == 'match':
+                                ratings[idx] = stored[f'{color}_rating_before']
+                            else:
+                                ratings[idx] = stored[f'{color}_rating_after'] - stored[f'{color}_rating_change']
+                            games[idx] = max(original['games_played'][idx] - window_games[idx], 0)
+                            # a stored peak above every replayed rating was reached before the replay starts
+                            if original['peak_rating'][idx] > window_highest[idx]:
+                                peaks[idx] = max(original['peak_rating'][idx], ratings[idx])
+                            else:
+                                peaks[idx] = ratings[idx]
+                        deviations[idx], volatilities[idx] = stored_snapshot(
+                            stored, [f'{color}_deviation_before', f'{color}_volatility_before'],
+                        )
+
+                match_updates = []
+                pairing_updates = []
+                old_games = []
+                new_games = []
+                opponent_deltas = {}
+                # games were rated with the players' ages on the day they were played, so each day is rated separately
+                days = groupby(range(len(chunk)), key=lambda pos: timezone.localdate(chunk[pos][1]))
+                rated = []
+                for day, positions_on_day in days:
+                    run = list(positions_on_day)
+                    if day not in juniors_on:
+                        juniors_on[day] = RatingCalculator.junior_flags(birth_dates, today=day)
+                    batch = rating_system.process_batch(
+                        ratings, peaks, games, juniors_on[day], white_idx[run], black_idx[run],
+                        [chunk[pos][2]['result'] for pos in run],
+                        deviations=deviations, volatilities=volatilities,
+                    )
+                    ratings, peaks, games = batch.ratings, batch.peaks, batch.games
+                    deviations, volatilities = batch.deviations, batch.volatilities
+                    rated += [(chunk[pos], batch.snapshot(offset)) for offset, pos in enumerate(run)]
+
+                for (kind, _, stored), snapshot in rated:
+                    replayed[kind] += 1
+                    white_id, black_id, result = stored['player_white_id'], stored['player_black_id'], stored['result']
+                    if kind == 'pairing':
+                        if stored_snapshot(stored, PAIRING_SNAPSHOT_FIELDS) != [snapshot[field] for field in PAIRING_SNAPSHOT_FIELDS]:
+                            pairing_updates.append(
+                                Pairing(pk=stored['pk'], **{field: snapshot[field] for field in PAIRING_SNAPSHOT_FIELDS}),
+                            )
+                            changed_tournaments.add(stored['round__tournament_id'])
+                        continue
+
+                    # incomplete legacy snapshots are only compared on what they do record
+                    compared = [
+                        field for field in snapshot_fields
+                        if '_peak_' not in field and '_games_' not in field
+                        or snapshot_is_complete(stored, field.split('_', 1)[0])
+                    ]
+                    if stored_snapshot(stored, compared) == [snapshot[field] for field in compared]:
+                        continue
+                    match_updates.append(Match(pk=stored['pk'], **snapshot))
+                    old_games.append((white_id, black_id, result, stored['white_rating_change'], stored['black_rating_change']))
+                    new_games.append((white_id, black_id, result, snapshot['white_rating_change'], snapshot['black_rating_change']))
+                    # each player's stats sum their opponents' "before" ratings
+                    opponent_deltas[white_id] = opponent_deltas.get(white_id, 0) + (
+                        snapshot['black_rating_before'] - stored['black_rating_before']
+                    )
+                    opponent_deltas[black_id] = opponent_deltas.get(black_id, 0) + (
+                        snapshot['white_rating_before'] - stored['white_rating_before']
+                    )
+
+                changed_matches += len(match_updates)
+                changed_pairings += len(pairing_updates)
+                if dry_run:
+                    continue
+                if match_updates:
+                    Match.objects.bulk_update(match_updates, snapshot_fields, batch_size=batch_size)
+                    # head-to-head records and player stats sum the values that were just rewritten
+                    restate_head_to_head(old_games, new_games)
+                    adjust_opponent_ratings(opponent_deltas)
+                if pairing_updates:
+                    bulk_update_fields(pairing_updates, PAIRING_SNAPSHOT_FIELDS, batch_size=batch_size)
+
+            if changed_tournaments and not dry_run:
+                self._restate_standings(changed_tournaments, batch_size)
+
+            changed = np.flatnonzero(
+                (ratings != original['rating'])
+                | (peaks != original['peak_rating'])
+                | (games != original['games_played'])
+                | (deviations != original['rating_deviation'])
+                | (volatilities != original['volatility'])
+            )
+            if len(changed) and not dry_run:
+                Player.objects.bulk_update(
+                    [
+                        Player(pk=int(player_ids[idx]), rating=int(ratings[idx]),
+                               peak_rating=int(peaks[idx]), games_played=int(games[idx]),
+                               rating_deviation=float(deviations[idx]), volatility=float(volatilities[idx]))
+                        for idx in changed
+                    ],
+                    RATING_STATE_FIELDS,
+                    batch_size=batch_size,
+                )
+            if (len(changed) or changed_pairings) and not dry_run:
+                bump_ranking_version()
+                player_index.invalidate()
+
+        prefix = 'Dry run: ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}replayed {replayed["match"]} matches and {replayed["pairing"]} tournament games; '
+            f'{changed_matches} match snapshots, {changed_pairings} tournament games and {len(changed)} players '
+            f'{"would change" if dry_run else "updated"}.'
+        ))
+
+    @staticmethod
+    def _replayed_games(positions):
+        """Per player position: how many games the replay covers, and the highest rating they recorded."""
+        counts = np.zeros(len(positions), dtype=np.int64)
+        highest = np.full(len(positions), np.iinfo(np.int64).min, dtype=np.int64)
+        for queryset in (Match.objects.filter(is_reverted=False), Pairing.objects.exclude(result='P')):
+            for color in ('white', 'black'):
+                grouped = (
+                    queryset.order_by().values(f'player_{color}')
+                    .annotate(games=Count('pk'), highest=Max(f'{color}_rating_after'))
+                    .values_list(f'player_{color}', 'games', 'highest')
+                )
+                for player_id, count, rating in grouped:
+                    idx = positions[player_id]
+                    counts[idx] += count
+                    highest[idx] = max(highest[idx], rating)
+        return counts, highest
+
+    @staticmethod
+    def _restate_standings(tournament_ids, batch_size):
+        """Recompute the rating change and final rating of every standing in `tournament_ids` from its games."""
+        totals = {}
+        rated = (
+            Pairing.objects.filter(round__tournament_id__in=tournament_ids).exclude(result='P')
+            .order_by('round__round_number', 'board_number')
+            .values_list('round__tournament_id', 'player_white_id', 'player_black_id', *PAIRING_FIELDS)
+        )
+        for tournament_id, white_id, black_id, white_after, black_after, white_change, black_change in rated:
+            for player_id, rating, change in ((white_id, white_after, white_change), (black_id, black_after, black_change)):
+                total = totals.setdefault((tournament_id, player_id), [0, None])
+                total[0] += change
+                total[1] = rating
+
+        standings = []
+        for standing in TournamentStanding.objects.filter(tournament_id__in=tournament_ids):
+            change, rating = totals.get((standing.tournament_id, standing.player_id), (0, None))
+            rating = standing.initial_rating if rating is None else rating
+            if (standing.rating_change, standing.final_rating) != (change, rating):
+                standing.rating_change, standing.final_rating = change, rating
+                standings.append(standing)
+        bulk_update_fields(standings, ['rating_change', 'final_rating'], batch_size=batch_size)
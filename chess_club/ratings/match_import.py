@@ -0,0 +1,170 @@
+import csv
+import io
+import re
+
+from django.db import transaction
+
+from .models import Player, Match, PlayerMatch
+from .head_to_head import record_head_to_head
+from .player_stats import record_player_stats
+from .rating_systems import get_rating_system
+from .ledger import PLAYER_STATE_FIELDS
+from .player_index import player_index
+from .ranking_cache import bump_ranking_version
+
+
+RESULT_ALIASES = {
+    'W': 'W', '1-0': 'W', '1': 'W',
+    'B': 'B', '0-1': 'B', '0': 'B',
+    'D': 'D', '1/2-1/2': 'D', '½-½': 'D', '0.5-0.5': 'D', '=': 'D',
+}
+
+PGN_TAG_RE = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]\s*$')
+
+
+class MatchImportError(ValueError):
+    """Raised when an import file cannot be applied; `errors` lists every problem found."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('; '.join(self.errors))
+
+
+def normalize_result(raw):
+    return RESULT_ALIASES.get((raw or '').strip().upper())
+
+
+def parse_csv(text):
+    """Parse CSV with `white`, `black` and `result` header columns into (white, black, result) rows."""
+    reader = csv.DictReader(io.StringIO(text))
+    fieldnames = {(name or '').strip().lower(): name for name in reader.fieldnames or []}
+    missing = [column for column in ('white', 'black', 'result') if column not in fieldnames]
+    if missing:
+        raise MatchImportError([f'CSV is missing column(s): {", ".join(missing)}'])
+
+    rows, errors = [], []
+    for line_number, record in enumerate(reader, start=2):
+        white = (record[fieldnames['white']] or '').strip()
+        black = (record[fieldnames['black']] or '').strip()
+        raw_result = record[fieldnames['result']]
+        if not (white or black or (raw_result or '').strip()):
+            continue
+        result = normalize_result(raw_result)
+        if not white or not black or result is None:
+            errors.append(f'Line {line_number}: expected white, black and a result (1-0, 0-1, 1/2-1/2, W, B or D)')
+            continue
+        rows.append((white, black, result))
+
+    if errors:
+        raise MatchImportError(errors)
+    return rows
+
+
+def parse_pgn(text):
+    """Parse the White/Black/Result tag pairs of every game in a PGN file; movetext is ignored."""
+    games, tags = [], {}
+    in_movetext = False
+    for line in text.splitlines():
+        line = line.strip()
+        tag = PGN_TAG_RE.match(line)
+        if tag:
+            # a tag after movetext, or a repeated tag, starts the next game
+            if tags and (in_movetext or tag.group(1) in tags):
+                games.append(tags)
+                tags = {}
+            in_movetext = False
+            tags[tag.group(1)] = tag.group(2).replace('\\"', '"')
+        elif line:
+            in_movetext = True
+    if tags:
+        games.append(tags)
+
+    rows, errors = [], []
+    for game_number, tags in enumerate(games, start=1):
+        white = tags.get('White', '').strip()
+        black = tags.get('Black', '').strip()
+        result = normalize_result(tags.get('Result'))
+        if not white or not black or result is None:
+            errors.append(f'Game {game_number}: needs White, Black and a finished Result tag')
+            continue
+        rows.append((white, black, result))
+
+    if errors:
+        raise MatchImportError(errors)
+    return rows
+
+
+def parse_matches(text, fmt):
+    if fmt == 'csv':
+        return parse_csv(text)
+    if fmt == 'pgn':
+        return parse_pgn(text)
+    raise MatchImportError([f'Unsupported format: {fmt}'])
+
+
+def import_matches(rows):
+    """Record (white_name, black_name, result) rows in order, in a single transaction.
+
+    Names are resolved with one query, ratings are computed in memory by the
+    configured rating system's `process_matches`, then every Match is written with one
+    `bulk_create` (plus one `bulk_update` linking each game to the players'
+    previous matches) and every affected player with one `bulk_update`; the
+    pairs' head-to-head records and the players' stats are updated in the
+    same transaction.
+    Returns the list of created matches.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    names = {name for white, black, _ in rows for name in (white, black)}
+    ids_by_name = {}
+    for pk, name in Player.objects.filter(name__in=names).values_list('pk', 'name'):
+        ids_by_name.setdefault(name, []).append(pk)
+
+    errors = []
+    for name in sorted(names):
+        if name not in ids_by_name:
+            errors.append(f'Unknown player: {name}')
+        elif len(ids_by_name[name]) > 1:
+            errors.append(f'Ambiguous player name (more than one player is called "{name}")')
+    for index, (white, black, _) in enumerate(rows, start=1):
+        if white == black:
+            errors.append(f'Row {index}: a player cannot play themselves ({white})')
+    if errors:
+        raise MatchImportError(errors)
+
+    games = [(ids_by_name[white][0], ids_by_name[black][0], result) for white, black, result in rows]
+    player_ids = sorted({pk for white, black, _ in games for pk in (white, black)})
+
+    with transaction.atomic():
+        players = list(Player.objects.select_for_update().filter(pk__in=player_ids).order_by('pk'))
+        rating_system = get_rating_system()
+        batch = rating_system.process_matches(players, games)
+
+        matches = [
+            Match(player_white_id=white, player_black_id=black, result=result, **batch.snapshot(pos))
+            for pos, (white, black, result) in enumerate(games)
+        ]
+        Match.objects.bulk_create(matches)
+        timeline = [row for match in matches for row in PlayerMatch.for_match(match)]
+        record_player_stats(matches, timeline)
+        PlayerMatch.objects.bulk_create(timeline)
+        record_head_to_head(matches)
+
+        # chain each game to the player's previous one; pks only exist after the insert
+        latest = {player.pk: player.latest_match_id for player in players}
+        for match in matches:
+            match.white_previous_match_id = latest[match.player_white_id]
+            match.black_previous_match_id = latest[match.player_black_id]
+            latest[match.player_white_id] = latest[match.player_black_id] = match.pk
+        Match.objects.bulk_update(matches, ['white_previous_match', 'black_previous_match'])
+
+        rating_system.update_players(players, batch)
+        for player in players:
+            player.latest_match_id = latest[player.pk]
+        Player.objects.bulk_update(players, PLAYER_STATE_FIELDS)
+        bump_ranking_version()
+    player_index.set_ratings(players)
+
+    return matches
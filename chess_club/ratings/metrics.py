@@ -0,0 +1,104 @@
+import threading
+from bisect import bisect_left
+
+
+# Upper bounds, in seconds, of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_PREFIX = 'chess_club'
+
+# label for requests that matched no URL pattern
+UNMATCHED_VIEW = 'unmatched'
+
+
+class ViewMetrics:
+    __slots__ = ('buckets', 'latency_sum', 'statuses', 'queries', 'query_seconds')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # the last one is +Inf
+        self.latency_sum = 0.0
+        self.statuses = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+class MetricsRegistry:
+    """Per-view request and SQL totals for this process, rendered in the Prometheus text format.
+
+    Every worker process keeps its own totals; Prometheus adds them up
+    across scrape targets. Updates take one lock per request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, status, seconds, queries, query_seconds):
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        status_class = f'{status // 100}xx'
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics()
+            metrics.buckets[bucket] += 1
+            metrics.latency_sum += seconds
+            metrics.statuses[status_class] = metrics.statuses.get(status_class, 0) + 1
+            metrics.queries += queries
+            metrics.query_seconds += query_seconds
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def render(self):
+        """The current totals as Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            views = {
+                view: (list(metrics.buckets), metrics.latency_sum, dict(metrics.statuses),
+                       metrics.queries, metrics.query_seconds)
+                for view, metrics in self._views.items()
+            }
+
+        requests = f'{METRIC_PREFIX}_requests_total'
+        latency = f'{METRIC_PREFIX}_request_duration_seconds'
+        queries = f'{METRIC_PREFIX}_db_queries_total'
+        query_time = f'{METRIC_PREFIX}_db_query_duration_seconds_total'
+        lines = [
+            f'# HELP {requests} Requests handled, by URL name and status class.',
+            f'# TYPE {requests} counter',
+        ]
+        for view, (_, _, statuses, _, _) in sorted(views.items()):
+            for status_class, count in sorted(statuses.items()):
+                lines.append(f'{requests}{{view="{_escape(view)}",status="{status_class}"}} {count}')
+
+        lines += [
+            f'# HELP {latency} Time to produce the response, by URL name.',
+            f'# TYPE {latency} histogram',
+        ]
+        for view, (buckets, latency_sum, _, _, _) in sorted(views.items()):
+            label = _escape(view)
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                cumulative += count
+                lines.append(f'{latency}_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{latency}_sum{{view="{label}"}} {latency_sum!r}')
+            lines.append(f'{latency}_count{{view="{label}"}} {cumulative}')
+
+        lines += [
+            f'# HELP {queries} SQL statements run while handling requests, by URL name.',
+            f'# TYPE {queries} counter',
+        ]
+        lines += [f'{queries}{{view="{_escape(view)}"}} {values[3]}' for view, values in sorted(views.items())]
+        lines += [
+            f'# HELP {query_time} Time spent in SQL statements while handling requests, by URL name.',
+            f'# TYPE {query_time} counter',
+        ]
+        lines += [f'{query_time}{{view="{_escape(view)}"}} {values[4]!r}' for view, values in sorted(views.items())]
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
@@ -1,60 +1,101 @@
+from django.db import connection
 from django.shortcuts import redirect
-from django.urls import reverse
+from django.urls import Resolver404, resolve, reverse
 from django.conf import settings
+import re
 import time
 
+from .metrics import UNMATCHED_VIEW, registry
+from .passcode import PASSCODE_COOKIE, has_access, revoke_access
+
+
+class _QueryTimer:
+    """`connection.execute_wrapper` hook counting the statements run for one request and their time."""
+
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def _view_name(request):
+    match = request.resolver_match
+    if match is None:
+        # answered before URL resolution (e.g. a passcode redirect), or a 404
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return UNMATCHED_VIEW
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """Records each request's latency, status and SQL work under its URL name for `/metrics`.
+
+    Listed first in MIDDLEWARE so the time spent in the other middleware,
+    including passcode redirects, is counted too. The totals are per process
+    and cost a couple of clock reads per query and one lock per request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = _QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        registry.observe(_view_name(request), response.status_code, elapsed, queries.count, queries.seconds)
+        return response
+
 
 class PasscodeMiddleware:
-    """Simple middleware that requires a session flag to access the site.
+    """Simple middleware that requires a passcode grant to access the site.
 
-    If the session key 'access_granted' is not present and the request path
-    isn't the passcode page or static/admin paths, the user is redirected to
-    the passcode entry view.
+    The grant is a signed, expiring cookie (see `ratings/passcode.py`) checked
+    in memory, so gated requests never load the session. Without a valid grant,
+    requests outside the passcode page and static/admin paths are redirected to
+    the passcode entry view. `/metrics` skips the passcode only when
+    METRICS_TOKEN is set, since the view then checks the bearer token. `request.passcode_granted` tells templates whether
+    the grant is present.
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
         # allowed paths that don't require passcode
-        self.allowed_prefixes = [
+        allowed_prefixes = [
             settings.STATIC_URL,
             '/admin/',
             '/passcode/',
             '/favicon.ico',
         ]
+        self.is_allowed_path = re.compile('|'.join(re.escape(prefix) for prefix in allowed_prefixes)).match
+        # scraped by Prometheus, which authenticates with METRICS_TOKEN instead of the passcode
+        self.is_metrics_path = re.compile(r'^/metrics/?$').match
 
     def __call__(self, request):
-        # if sessions aren't available yet, allow request through (SessionMiddleware should be before this middleware)
-        if not hasattr(request, 'session'):
+        request.passcode_granted = has_access(request)
+        if request.passcode_granted or self.is_allowed_path(request.path):
             return self.get_response(request)
-
-        # if already granted, check expiry
-        if request.session.get('access_granted'):
-            granted_at = request.session.get('access_granted_at')
-            if granted_at:
-                try:
-                    # granted_at stored as epoch seconds (float)
-                    if (time.time() - float(granted_at)) > 60 * 60:
-                        # expired - remove keys and force passcode again
-                        request.session.pop('access_granted', None)
-                        request.session.pop('access_granted_at', None)
-                        return redirect(reverse('passcode'))
-                except Exception:
-                    # if anything odd, remove keys and require passcode
-                    request.session.pop('access_granted', None)
-                    request.session.pop('access_granted_at', None)
-                    return redirect(reverse('passcode'))
-            # still valid
+        if getattr(settings, 'METRICS_TOKEN', None) and self.is_metrics_path(request.path):
             return self.get_response(request)
 
-        path = request.path
-        # allow allowed prefixes
-        for p in self.allowed_prefixes:
-            if path.startswith(p):
-                return self.get_response(request)
-
         # allow AJAX to pass through (optional)
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
             return self.get_response(request)
 
-        # otherwise redirect to passcode entry
-        return redirect(reverse('passcode'))
+        # otherwise redirect to passcode entry, dropping an expired or tampered grant
+        response = redirect(reverse('passcode'))
+        if PASSCODE_COOKIE in request.COOKIES:
+            revoke_access(response)
+        return response
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ratings', '0010_match_revert_tracking'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='match',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+    ]
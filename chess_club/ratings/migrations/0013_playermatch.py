@@ -0,0 +1,53 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+RESULTS_FOR_WHITE = {'W': 'W', 'B': 'L', 'D': 'D'}
+RESULTS_FOR_BLACK = {'W': 'L', 'B': 'W', 'D': 'D'}
+
+
+def backfill_timeline(apps, schema_editor):
+    Match = apps.get_model('ratings', 'Match')
+    PlayerMatch = apps.get_model('ratings', 'PlayerMatch')
+
+    rows = []
+    matches = Match.objects.order_by().values_list(
+        'pk', 'player_white_id', 'player_black_id', 'result', 'created_at', 'is_reverted',
+    )
+    for pk, white, black, result, created_at, is_reverted in matches.iterator(chunk_size=2000):
+        rows.append(PlayerMatch(player_id=white, match_id=pk, color='W', result=RESULTS_FOR_WHITE[result],
+                                created_at=created_at, is_reverted=is_reverted))
+        rows.append(PlayerMatch(player_id=black, match_id=pk, color='B', result=RESULTS_FOR_BLACK[result],
+                                created_at=created_at, is_reverted=is_reverted))
+        if len(rows) >= 2000:
+            PlayerMatch.objects.bulk_create(rows)
+            rows = []
+    PlayerMatch.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ratings', '0012_sitestate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('color', models.CharField(choices=[('W', 'White'), ('B', 'Black')], max_length=1)),
+                ('result', models.CharField(choices=[('W', 'Win'), ('D', 'Draw'), ('L', 'Loss')], max_length=1)),
+                ('created_at', models.DateTimeField()),
+                ('is_reverted', models.BooleanField(default=False)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to='ratings.match')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to='ratings.player')),
+            ],
+            options={
+                'ordering': ['-created_at', '-match'],
+                'indexes': [models.Index(fields=['player', 'created_at', 'match'], name='playermatch_player_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('player', 'match'), name='unique_player_match')],
+            },
+        ),
+        migrations.RunPython(backfill_timeline, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_pointers(apps, schema_editor):
+    Player = apps.get_model('ratings', 'Player')
+    Match = apps.get_model('ratings', 'Match')
+
+    latest = {}
+    updates = []
+    active = (
+        Match.objects.filter(is_reverted=False)
+        .order_by('created_at', 'pk')
+        .values_list('pk', 'player_white_id', 'player_black_id')
+    )
+    for pk, white, black in active.iterator(chunk_size=2000):
+        updates.append(Match(pk=pk, white_previous_match_id=latest.get(white), black_previous_match_id=latest.get(black)))
+        latest[white] = latest[black] = pk
+        if len(updates) >= 2000:
+            Match.objects.bulk_update(updates, ['white_previous_match', 'black_previous_match'])
+            updates = []
+    Match.objects.bulk_update(updates, ['white_previous_match', 'black_previous_match'])
+
+    Player.objects.bulk_update(
+        [Player(pk=player_id, latest_match_id=match_id) for player_id, match_id in latest.items()],
+        ['latest_match'],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ratings', '0013_playermatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='latest_match',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ratings.match'),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='white_previous_match',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ratings.match'),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='black_previous_match',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ratings.match'),
+        ),
+        migrations.RunPython(backfill_pointers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+from django.db import migrations, models
+
+from ratings.tiebreaks import compute_tiebreaks, sort_key
+
+
+RESULT_WHITE_SCORES = {'W': 1.0, 'D': 0.5, 'B': 0.0}
+
+
+def backfill_tiebreaks(apps, schema_editor):
+    Tournament = apps.get_model('ratings', 'Tournament')
+    Pairing = apps.get_model('ratings', 'Pairing')
+    TournamentStanding = apps.get_model('ratings', 'TournamentStanding')
+
+    for tournament_id in Tournament.objects.values_list('pk', flat=True).iterator():
+        standings = {standing.player_id: standing for standing in TournamentStanding.objects.filter(tournament_id=tournament_id)}
+        games = {player_id: [] for player_id in standings}
+        finished = (
+            Pairing.objects.filter(round__tournament_id=tournament_id)
+            .exclude(result='P')
+            .values_list('round__round_number', 'player_white_id', 'player_black_id', 'result')
+        )
+        for round_number, white_id, black_id, result in finished:
+            if white_id in games and black_id in games:
+                games[white_id].append((round_number, black_id, RESULT_WHITE_SCORES[result]))
+                games[black_id].append((round_number, white_id, 1.0 - RESULT_WHITE_SCORES[result]))
+
+        scores = {player_id: standing.total_score for player_id, standing in standings.items()}
+        for player_id, values in compute_tiebreaks(games, scores).items():
+            standing = standings[player_id]
+            for name, value in values.items():
+                setattr(standing, name, value)
+            standing.sort_key = sort_key(standing.total_score, standing.wins, values)
+        TournamentStanding.objects.bulk_update(
+            standings.values(),
+            ['buchholz', 'median_buchholz', 'sonneborn_berger', 'progressive_score', 'direct_encounter', 'sort_key'],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ratings', '0016_match_history_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='tournamentstanding',
+            options={'ordering': ['-sort_key', 'id']},
+        ),
+        migrations.AddField(
+            model_name='tournamentstanding',
+            name='buchholz',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='tournamentstanding',
+            name='median_buchholz',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='tournamentstanding',
+            name='sonneborn_berger',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='tournamentstanding',
+            name='progressive_score',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='tournamentstanding',
+            name='direct_encounter',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='tournamentstanding',
+            name='sort_key',
+            field=models.CharField(default='', editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='tournamentstanding',
+            index=models.Index(fields=['tournament', '-sort_key', 'id'], name='standing_sort_idx'),
+        ),
+        migrations.RunPython(backfill_tiebreaks, migrations.RunPython.noop),
+    ]
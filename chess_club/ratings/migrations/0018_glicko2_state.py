@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ratings', '0017_tournamentstanding_tiebreaks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='rating_deviation',
+            field=models.FloatField(default=350.0),
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='volatility',
+            field=models.FloatField(default=0.06),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='white_deviation_before',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='black_deviation_before',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='white_volatility_before',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='black_volatility_before',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
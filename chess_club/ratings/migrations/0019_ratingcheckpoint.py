@@ -0,0 +1,47 @@
+import zlib
+
+import numpy as np
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def initial_checkpoint(apps, schema_editor):
+    # history starts here: "ranking as of" needs a checkpoint at or before the requested time
+    Player = apps.get_model('ratings', 'Player')
+    RatingCheckpoint = apps.get_model('ratings', 'RatingCheckpoint')
+    rows = np.array(
+        list(Player.objects.order_by('pk').values_list('pk', 'rating', 'peak_rating', 'games_played')),
+        dtype='<i4',
+    ).reshape(-1, 4)
+    RatingCheckpoint.objects.create(
+        taken_at=timezone.now(), player_count=len(rows), data=zlib.compress(rows.tobytes()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ratings', '0018_glicko2_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(db_index=True)),
+                ('ranking_version', models.BigIntegerField(default=0)),
+                ('player_count', models.IntegerField(default=0)),
+                ('data', models.BinaryField()),
+            ],
+            options={
+                'ordering': ['-taken_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='pairing',
+            name='recorded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(initial_checkpoint, migrations.RunPython.noop),
+    ]
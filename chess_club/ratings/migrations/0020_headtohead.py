@@ -0,0 +1,77 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def tally(games):
+    """Frozen copy of `ratings.head_to_head.tally` as of this migration.
+
+    Returns {(low_id, high_id): [low_wins, draws, high_wins, low_rating_change, high_rating_change]}.
+    """
+    totals = {}
+    for white_id, black_id, result, white_change, black_change in games:
+        pair = (white_id, black_id) if white_id < black_id else (black_id, white_id)
+        row = totals.setdefault(pair, [0, 0, 0, 0, 0])
+        white_is_low = white_id == pair[0]
+        if result == 'D':
+            row[1] += 1
+        elif (result == 'W') == white_is_low:
+            row[0] += 1
+        else:
+            row[2] += 1
+        low_change, high_change = (white_change, black_change) if white_is_low else (black_change, white_change)
+        row[3] += low_change
+        row[4] += high_change
+    return totals
+
+
+def backfill_head_to_head(apps, schema_editor):
+    # only matches inside the retention window survive, so older games can't be counted
+    Match = apps.get_model('ratings', 'Match')
+    HeadToHead = apps.get_model('ratings', 'HeadToHead')
+    games = Match.objects.filter(is_reverted=False).values_list(
+        'player_white_id', 'player_black_id', 'result', 'white_rating_change', 'black_rating_change',
+    )
+    HeadToHead.objects.bulk_create(
+        [
+            HeadToHead(
+                player_low_id=low, player_high_id=high, low_wins=low_wins, draws=draws, high_wins=high_wins,
+                low_rating_change=low_change, high_rating_change=high_change,
+            )
+            for (low, high), (low_wins, draws, high_wins, low_change, high_change) in tally(games.iterator()).items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ratings', '0019_ratingcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeadToHead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('low_wins', models.IntegerField(default=0)),
+                ('draws', models.IntegerField(default=0)),
+                ('high_wins', models.IntegerField(default=0)),
+                ('low_rating_change', models.IntegerField(default=0)),
+                ('high_rating_change', models.IntegerField(default=0)),
+                ('player_high', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ratings.player')),
+                ('player_low', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ratings.player')),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('player_low', 'player_high'), name='unique_head_to_head'),
+                    models.CheckConstraint(condition=models.Q(('player_low__lt', models.F('player_high'))), name='head_to_head_ordered'),
+                ],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['player_white', 'player_black', '-created_at'], name='match_pair_idx'),
+        ),
+        migrations.RunPython(backfill_head_to_head, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of the `ratings.player_stats` helpers as of this migration.
+STATS_FIELDS = [
+    'white_wins', 'white_draws', 'white_losses', 'black_wins', 'black_draws', 'black_losses',
+    'opponent_rating_total', 'streak',
+]
+
+RESULT_COUNTERS = {'W': 'wins', 'D': 'draws', 'L': 'losses'}
+
+# (pk, player_id, color, result, white_rating_before, black_rating_before) per timeline row
+TIMELINE_COLUMNS = ['pk', 'player_id', 'color', 'result', 'match__white_rating_before', 'match__black_rating_before']
+
+
+def next_streak(streak, result):
+    if result == 'W':
+        return streak + 1 if streak > 0 else 1
+    if result == 'L':
+        return streak - 1 if streak < 0 else -1
+    return 0
+
+
+def stats_from_timeline(rows):
+    """Replay timeline rows in play order; returns ({player_id: {field: value}}, {timeline pk: streak before})."""
+    totals = {}
+    streaks_before = {}
+    for pk, player_id, color, result, white_before, black_before in rows:
+        stats = totals.setdefault(player_id, dict.fromkeys(STATS_FIELDS, 0))
+        streaks_before[pk] = stats['streak']
+        stats[f"{'white' if color == 'W' else 'black'}_{RESULT_COUNTERS[result]}"] += 1
+        stats['opponent_rating_total'] += black_before if color == 'W' else white_before
+        stats['streak'] = next_streak(stats['streak'], result)
+    return totals, streaks_before
+
+
+def backfill_player_stats(apps, schema_editor):
+    # only matches inside the retention window survive, so the totals start from those
+    PlayerMatch = apps.get_model('ratings', 'PlayerMatch')
+    PlayerStats = apps.get_model('ratings', 'PlayerStats')
+    timeline = PlayerMatch.objects.filter(is_reverted=False).order_by('created_at', 'match_id')
+    totals, streaks_before = stats_from_timeline(timeline.values_list(*TIMELINE_COLUMNS).iterator())
+    PlayerStats.objects.bulk_create(
+        [PlayerStats(player_id=player_id, **values) for player_id, values in totals.items()],
+        batch_size=500,
+    )
+    PlayerMatch.objects.bulk_update(
+        [PlayerMatch(pk=pk, streak_before=streak) for pk, streak in streaks_before.items() if streak],
+        ['streak_before'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ratings', '0020_headtohead'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='ratings.player')),
+                ('white_wins', models.IntegerField(default=0)),
+                ('white_draws', models.IntegerField(default=0)),
+                ('white_losses', models.IntegerField(default=0)),
+                ('black_wins', models.IntegerField(default=0)),
+                ('black_draws', models.IntegerField(default=0)),
+                ('black_losses', models.IntegerField(default=0)),
+                ('opponent_rating_total', models.BigIntegerField(default=0)),
+                ('streak', models.IntegerField(default=0)),
+                ('purged_games', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='playermatch',
+            name='streak_before',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_player_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ratings', '0021_playerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pairing',
+            name='white_deviation_before',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pairing',
+            name='black_deviation_before',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pairing',
+            name='white_volatility_before',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pairing',
+            name='black_volatility_before',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
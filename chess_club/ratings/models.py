@@ -10,13 +10,22 @@ class Player(models.Model):
     birth_date = models.DateField(null=True, blank=True)
     peak_rating = models.IntegerField(default=1500)
     games_played = models.IntegerField(default=0)
+    # Glicko-2 state; unused (and left unchanged) by the Elo rating system
+    rating_deviation = models.FloatField(default=350.0)
+    volatility = models.FloatField(default=0.06)
     created_at = models.DateTimeField(auto_now_add=True)
+    # newest non-reverted match; only this one can be reverted directly
+    latest_match = models.ForeignKey('Match', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
 
     def __str__(self):
         return f"{self.name} ({self.rating})"
 
     class Meta:
         ordering = ['-rating']
+        indexes = [
+            # keyset pagination order of the player list and ranking pages
+            models.Index(fields=['-rating', 'name', 'id'], name='player_ranking_idx'),
+        ]
 
 
 class Match(models.Model):
@@ -48,6 +57,16 @@ class Match(models.Model):
     white_games_after = models.IntegerField(default=0)
     black_games_after = models.IntegerField(default=0)
 
+    # Glicko-2 state before the match, restored when it is reverted; null for matches recorded before it was kept
+    white_deviation_before = models.FloatField(null=True, blank=True)
+    black_deviation_before = models.FloatField(null=True, blank=True)
+    white_volatility_before = models.FloatField(null=True, blank=True)
+    black_volatility_before = models.FloatField(null=True, blank=True)
+
+    # each player's latest_match before this one, restored when it is reverted
+    white_previous_match = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    black_previous_match = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+
     is_reverted = models.BooleanField(default=False)
     reverted_at = models.DateTimeField(null=True, blank=True)
 
@@ -56,15 +75,360 @@ class Match(models.Model):
     def __str__(self):
         return f"{self.player_white.name} vs {self.player_black.name} ({self.get_result_display()})"
 
+    @staticmethod
+    def retention_cutoff():
+        return timezone.now() - timedelta(days=30)
+
     @classmethod
-    def cleanup_expired_records(cls):
-        cutoff = timezone.now() - timedelta(days=30)
-        cls.objects.filter(created_at__lt=cutoff).delete()
+    def cleanup_expired_records(cls, batch_size=500):
+        """Delete matches older than the retention window, `batch_size` rows per statement.
+
+        Returns the number of matches deleted.
+        """
+        cutoff = cls.retention_cutoff()
+        deleted = 0
+        while True:
+            pks = list(cls.objects.filter(created_at__lt=cutoff).order_by().values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return deleted
+            PlayerStats.count_purged(pks)
+            cls.objects.filter(pk__in=pks).delete()
+            deleted += len(pks)
 
     @property
     def is_expired(self):
-        cutoff = timezone.now() - timedelta(days=30)
-        return self.created_at < cutoff
+        return self.created_at < self.retention_cutoff()
+
+    @property
+    def is_latest_for_both(self):
+        """True when this is the newest active match of both players, so it can be reverted on its own."""
+        return (
+            not self.is_reverted
+            and self.player_white.latest_match_id == self.pk
+            and self.player_black.latest_match_id == self.pk
+        )
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # keyset pagination and date-range filters of the match history
+            models.Index(fields=['-created_at', '-id'], name='match_history_idx'),
+            # the latest games between two players, one range per colour
+            models.Index(fields=['player_white', 'player_black', '-created_at'], name='match_pair_idx'),
+        ]
+
+
+class PlayerMatch(models.Model):
+    """Denormalized timeline row: one per (player, match), from that player's side.
+
+    Lets "matches involving player X" be a single indexed range on
+    (player, created_at) instead of an OR over the white and black columns.
+    """
+    COLOR_CHOICES = [
+        ('W', 'White'),
+        ('B', 'Black'),
+    ]
+    RESULT_CHOICES = [
+        ('W', 'Win'),
+        ('D', 'Draw'),
+        ('L', 'Loss'),
+    ]
+
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='timeline')
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='timeline')
+    color = models.CharField(max_length=1, choices=COLOR_CHOICES)
+    result = models.CharField(max_length=1, choices=RESULT_CHOICES)
+    created_at = models.DateTimeField()
+    is_reverted = models.BooleanField(default=False)
+    # the player's PlayerStats.streak before this game, restored when it is reverted
+    streak_before = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.player_id} {self.get_color_display()} {self.get_result_display()} (match {self.match_id})"
+
+    @classmethod
+    def for_match(cls, match):
+        """Build (unsaved) timeline rows for both players of a saved match."""
+        white_result = {'W': 'W', 'B': 'L', 'D': 'D'}[match.result]
+        black_result = {'W': 'L', 'B': 'W', 'D': 'D'}[match.result]
+        return [
+            cls(player_id=match.player_white_id, match_id=match.pk, color='W', result=white_result,
+                created_at=match.created_at, is_reverted=match.is_reverted),
+            cls(player_id=match.player_black_id, match_id=match.pk, color='B', result=black_result,
+                created_at=match.created_at, is_reverted=match.is_reverted),
+        ]
+
+    class Meta:
+        ordering = ['-created_at', '-match']
+        constraints = [
+            models.UniqueConstraint(fields=['player', 'match'], name='unique_player_match'),
+        ]
+        indexes = [
+            models.Index(fields=['player', 'created_at', 'match'], name='playermatch_player_time_idx'),
+        ]
+
+
+class PlayerStats(models.Model):
+    """Running totals of a player's recorded matches, one row per player.
+
+    Maintained by the ledger and match imports in the same transaction as the
+    games (see `ratings.player_stats`), so the player pages show these without
+    aggregating matches. Tournament games are not included. Purging expired
+    matches leaves the totals alone and counts the purged games instead.
+    """
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    white_wins = models.IntegerField(default=0)
+    white_draws = models.IntegerField(default=0)
+    white_losses = models.IntegerField(default=0)
+    black_wins = models.IntegerField(default=0)
+    black_draws = models.IntegerField(default=0)
+    black_losses = models.IntegerField(default=0)
+    # sum of each opponent's rating going into the game
+    opponent_rating_total = models.BigIntegerField(default=0)
+    # +n after n straight wins, -n after n straight losses, 0 after a draw
+    streak = models.IntegerField(default=0)
+    purged_games = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.player_id}: +{self.wins} ={self.draws} -{self.losses}"
+
+    @classmethod
+    def count_purged(cls, match_pks):
+        """Add the active games among matches about to be purged to their players' `purged_games`."""
+        counts = {}
+        for player_id in PlayerMatch.objects.filter(match_id__in=match_pks, is_reverted=False).values_list('player_id', flat=True):
+            counts[player_id] = counts.get(player_id, 0) + 1
+        by_count = {}
+        for player_id, count in counts.items():
+            by_count.setdefault(count, []).append(player_id)
+        for count, player_ids in by_count.items():
+            cls.objects.filter(player_id__in=player_ids).update(purged_games=models.F('purged_games') + count)
+
+    @property
+    def wins(self):
+        return self.white_wins + self.black_wins
+
+    @property
+    def draws(self):
+        return self.white_draws + self.black_draws
+
+    @property
+    def losses(self):
+        return self.white_losses + self.black_losses
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    @property
+    def white_games(self):
+        return self.white_wins + self.white_draws + self.white_losses
+
+    @property
+    def black_games(self):
+        return self.black_wins + self.black_draws + self.black_losses
+
+    @property
+    def white_score(self):
+        return self.white_wins + self.white_draws / 2
+
+    @property
+    def black_score(self):
+        return self.black_wins + self.black_draws / 2
+
+    @property
+    def average_opponent_rating(self):
+        return round(self.opponent_rating_total / self.games) if self.games else None
+
+    @property
+    def performance_rating(self):
+        """Average opponent rating plus 400 per net win per game (the linear FIDE approximation)."""
+        if not self.games:
+            return None
+        return round((self.opponent_rating_total + 400 * (self.wins - self.losses)) / self.games)
+
+
+class HeadToHead(models.Model):
+    """Lifetime record between two players: one row per pair, lower player id first.
+
+    Kept up to date by the ledger and match imports in the same transaction as
+    the games, so two players' record is a single unique-index read. Counts
+    outlive the 30-day match retention window.
+    """
+    player_low = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='+')
+    player_high = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='+')
+    low_wins = models.IntegerField(default=0)
+    draws = models.IntegerField(default=0)
+    high_wins = models.IntegerField(default=0)
+    # net rating points each side has taken from these games
+    low_rating_change = models.IntegerField(default=0)
+    high_rating_change = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.player_low_id} vs {self.player_high_id} (+{self.low_wins} ={self.draws} -{self.high_wins})"
+
+    @property
+    def games(self):
+        return self.low_wins + self.draws + self.high_wins
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['player_low', 'player_high'], name='unique_head_to_head'),
+            models.CheckConstraint(condition=models.Q(player_low__lt=models.F('player_high')), name='head_to_head_ordered'),
+        ]
+
+
+class SiteState(models.Model):
+    """A named integer shared by every worker, with the time it last changed.
+
+    Used for bookkeeping such as when expired matches were last purged.
+    """
+    key = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key}={self.value}"
+
+
+class RatingCheckpoint(models.Model):
+    """Every player's rating, peak rating and games played at `taken_at`, packed into one row.
+
+    `data` holds zlib-compressed little-endian int32 rows of (player id,
+    rating, peak rating, games played); see ratings.checkpoints.
+    """
+    taken_at = models.DateTimeField(db_index=True)
+    ranking_version = models.BigIntegerField(default=0)
+    player_count = models.IntegerField(default=0)
+    data = models.BinaryField()
+
+    def __str__(self):
+        return f"Checkpoint at {self.taken_at:%Y-%m-%d %H:%M} ({self.player_count} players)"
+
+    class Meta:
+        ordering = ['-taken_at']
+
+
+class Tournament(models.Model):
+    TOURNAMENT_TYPES = [
+        ('SWISS', 'Swiss Tournament'),
+        ('GROUP', 'Group Tournament'),
+        ('MATCHUP', 'Matchups'),
+    ]
+
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    tournament_type = models.CharField(max_length=10, choices=TOURNAMENT_TYPES, default='SWISS')
+    num_rounds = models.IntegerField(default=5, validators=[MinValueValidator(1)])
+    current_round = models.IntegerField(default=0)
+    is_finished = models.BooleanField(default=False)
+    num_groups = models.IntegerField(null=True, blank=True, validators=[MinValueValidator(1)])
+    players_per_group = models.IntegerField(null=True, blank=True, validators=[MinValueValidator(1)])
+    players = models.ManyToManyField(Player, related_name='tournaments')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
 
     class Meta:
         ordering = ['-created_at']
+
+
+class Group(models.Model):
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='groups')
+    name = models.CharField(max_length=50)
+    group_number = models.IntegerField()
+    players = models.ManyToManyField(Player, blank=True, related_name='tournament_groups')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.tournament.name} - {self.name}"
+
+    class Meta:
+        ordering = ['group_number']
+        unique_together = ('tournament', 'group_number')
+
+
+class Round(models.Model):
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='rounds')
+    round_number = models.IntegerField()
+    is_completed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.tournament.name} - Round {self.round_number}"
+
+    class Meta:
+        ordering = ['round_number']
+        unique_together = ('tournament', 'round_number')
+
+
+class Pairing(models.Model):
+    RESULT_CHOICES = [
+        ('W', 'White Win'),
+        ('B', 'Black Win'),
+        ('D', 'Draw'),
+        ('P', 'Pending'),
+    ]
+
+    round = models.ForeignKey(Round, on_delete=models.CASCADE, related_name='pairings')
+    player_white = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='pairings_as_white')
+    player_black = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='pairings_as_black')
+    result = models.CharField(max_length=1, choices=RESULT_CHOICES, default='P')
+
+    white_rating_before = models.IntegerField()
+    black_rating_before = models.IntegerField()
+    white_rating_after = models.IntegerField(null=True, blank=True)
+    black_rating_after = models.IntegerField(null=True, blank=True)
+    white_rating_change = models.IntegerField(default=0)
+    black_rating_change = models.IntegerField(default=0)
+
+    # Glicko-2 state before the game, for rebuild_ratings; null until rated and for results entered before it was kept
+    white_deviation_before = models.FloatField(null=True, blank=True)
+    black_deviation_before = models.FloatField(null=True, blank=True)
+    white_volatility_before = models.FloatField(null=True, blank=True)
+    black_volatility_before = models.FloatField(null=True, blank=True)
+
+    board_number = models.IntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # when the result was entered; rating checkpoints replay tournament games from it
+    recorded_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Board {self.board_number}: {self.player_white.name} vs {self.player_black.name}"
+
+    class Meta:
+        ordering = ['board_number']
+        unique_together = ('round', 'player_white', 'player_black')
+
+
+class TournamentStanding(models.Model):
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='standings')
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='tournament_standings')
+    total_score = models.FloatField(default=0.0)
+    wins = models.IntegerField(default=0)
+    draws = models.IntegerField(default=0)
+    losses = models.IntegerField(default=0)
+    initial_rating = models.IntegerField()
+    final_rating = models.IntegerField()
+    rating_change = models.IntegerField(default=0)
+
+    # tiebreaks, kept current by ratings.tiebreaks.refresh_tiebreaks as results come in
+    buchholz = models.FloatField(default=0.0)
+    median_buchholz = models.FloatField(default=0.0)
+    sonneborn_berger = models.FloatField(default=0.0)
+    progressive_score = models.FloatField(default=0.0)
+    direct_encounter = models.FloatField(default=0.0)
+    sort_key = models.CharField(max_length=64, default='', editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.player.name} - {self.total_score} pts"
+
+    class Meta:
+        ordering = ['-sort_key', 'id']
+        unique_together = ('tournament', 'player')
+        indexes = [
+            models.Index(fields=['tournament', '-sort_key', 'id'], name='standing_sort_idx'),
+        ]
@@ -0,0 +1,172 @@
+import datetime
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q, Value, Window
+from django.db.models.functions import RowNumber
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # keep microseconds; DjangoJSONEncoder rounds datetimes to milliseconds
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorSerializer(signing.JSONSerializer):
+    def dumps(self, obj):
+        return CursorEncoder(separators=(',', ':')).encode(obj).encode('latin-1')
+
+
+class KeysetPage:
+    """One page of keyset-paginated rows, shaped like the parts of Django's Page the templates use."""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginationMixin:
+    """Cursor (keyset) pagination for ListViews, replacing LIMIT/OFFSET.
+
+    `keyset_ordering` must be a unique ordering, e.g. ('-rating', 'name', 'id').
+    Pages are fetched with `WHERE (ordering) > (cursor) LIMIT n`, so any page
+    costs the same as the first one. The `after`/`before` query parameters carry
+    a signed cursor holding the boundary row's ordering values.
+
+    With `keyset_rank` set, every row is annotated with its 1-based `rank` in
+    the full ordering. The database numbers the rows of the page and the cursor
+    carries the boundary row's rank; the rank is recounted only when
+    `get_keyset_version()` says the data changed since the cursor was issued.
+    """
+
+    keyset_ordering = ('id',)
+    keyset_rank = False
+    cursor_salt = 'ratings.pagination'
+
+    def get_keyset_version(self):
+        return None
+
+    def paginate_queryset(self, queryset, page_size):
+        queryset = queryset.order_by(*self._ordering())
+        fields = [name.lstrip('-') for name in self.keyset_ordering]
+
+        direction, cursor = 'after', self._read_cursor('after', queryset)
+        if cursor is None:
+            direction, cursor = 'before', self._read_cursor('before', queryset)
+
+        if cursor is None:
+            rows = self._fetch(queryset, page_size, rank_from=0)
+            has_previous, has_next = False, len(rows) > page_size
+            rows = rows[:page_size]
+        elif direction == 'after':
+            values, rank = cursor
+            if rank is not None:
+                rank_from = rank
+            elif self.keyset_rank:
+                rank_from = queryset.filter(~self._beyond(values, forward=True)).count()
+            else:
+                rank_from = 0
+            rows = self._fetch(queryset.filter(self._beyond(values, forward=True)), page_size, rank_from=rank_from)
+            has_previous, has_next = True, len(rows) > page_size
+            rows = rows[:page_size]
+        else:
+            values, rank = cursor
+            if rank is None and self.keyset_rank:
+                rank = queryset.filter(self._beyond(values, forward=False)).count() + 1
+            backwards = queryset.filter(self._beyond(values, forward=False)).order_by(*self._ordering(backwards=True))
+            rows = self._fetch(backwards, page_size, rank_from=rank, backwards=True)
+            has_previous, has_next = len(rows) > page_size, True
+            rows = rows[:page_size][::-1]
+
+        page = KeysetPage(
+            rows,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self._make_cursor(rows[-1], fields) if has_next and rows else None,
+            previous_cursor=self._make_cursor(rows[0], fields) if has_previous and rows else None,
+        )
+        return (None, page, page.object_list, page.has_other_pages())
+
+    def _fetch(self, queryset, page_size, rank_from, backwards=False):
+        if not self.keyset_rank:
+            return list(queryset[:page_size + 1])
+
+        # Number only the page's rows; a window over the whole filtered set
+        # would cost as much as every row after the cursor.
+        row_number = Window(RowNumber(), order_by=[
+            F(name[1:]).desc() if name.startswith('-') else F(name).asc() for name in self._ordering(backwards)
+        ])
+        return list(
+            queryset.filter(pk__in=queryset.values('pk')[:page_size + 1])
+            .annotate(rank=Value(rank_from) - row_number if backwards else Value(rank_from) + row_number)
+            .order_by('-rank' if backwards else 'rank')
+        )
+
+    def _ordering(self, backwards=False):
+        if not backwards:
+            return list(self.keyset_ordering)
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.keyset_ordering]
+
+    def _beyond(self, values, forward):
+        """Q for rows strictly after (forward) or before the row with ordering `values`."""
+        condition = Q()
+        for position in reversed(range(len(self.keyset_ordering))):
+            name = self.keyset_ordering[position]
+            field = name.lstrip('-')
+            greater = name.startswith('-') != forward
+            step = Q(**{f'{field}__{"gt" if greater else "lt"}': values[position]})
+            if position < len(self.keyset_ordering) - 1:
+                step |= Q(**{field: values[position]}) & condition
+            condition = step
+        # redundant bound on the leading column lets the database seek the index instead of scanning
+        first = self.keyset_ordering[0]
+        greater = first.startswith('-') != forward
+        return Q(**{f'{first.lstrip("-")}__{"gte" if greater else "lte"}': values[0]}) & condition
+
+    def _make_cursor(self, row, fields):
+        payload = {'k': [getattr(row, field) for field in fields]}
+        if self.keyset_rank:
+            payload['r'] = row.rank
+            payload['v'] = self.get_keyset_version()
+        return signing.dumps(payload, salt=self.cursor_salt, serializer=CursorSerializer, compress=True)
+
+    def _read_cursor(self, param, queryset):
+        """Return (values, rank) from the request's cursor, or None when absent or invalid."""
+        token = self.request.GET.get(param)
+        if not token:
+            return None
+        try:
+            payload = signing.loads(token, salt=self.cursor_salt)
+            opts = queryset.model._meta
+            values = [
+                opts.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.keyset_ordering, payload['k'], strict=True)
+            ]
+        except (signing.BadSignature, KeyError, TypeError, ValueError, ValidationError):
+            return None
+        rank = payload.get('r') if payload.get('v') == self.get_keyset_version() else None
+        return values, rank
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        encoded = params.urlencode()
+        context['cursor_query_string'] = f'&{encoded}' if encoded else ''
+        return context
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core import signing
+
+
+PASSCODE_COOKIE = 'passcode_grant'
+PASSCODE_SALT = 'ratings.passcode'
+
+
+def _max_age():
+    return getattr(settings, 'PASSCODE_MAX_AGE', 60 * 60)
+
+
+def grant_token():
+    """A signed, timestamped token proving the passcode was entered; valid for PASSCODE_MAX_AGE seconds.
+
+    Nothing is stored on the server, so a grant cannot be revoked there: a
+    copy of the cookie stays valid until it expires or SECRET_KEY changes.
+    """
+    return signing.TimestampSigner(salt=PASSCODE_SALT).sign('granted')
+
+
+def has_access(request):
+    """Whether the request carries an unexpired, untampered grant token. Checked in memory only."""
+    token = request.COOKIES.get(PASSCODE_COOKIE)
+    if not token:
+        return False
+    try:
+        signing.TimestampSigner(salt=PASSCODE_SALT).unsign(token, max_age=_max_age())
+    except signing.BadSignature:  # also raised once the token has expired
+        return False
+    return True
+
+
+def grant_access(response):
+    response.set_cookie(
+        PASSCODE_COOKIE, grant_token(), max_age=_max_age(), httponly=True, samesite='Lax',
+        secure=settings.SESSION_COOKIE_SECURE,
+    )
+
+
+def revoke_access(response):
+    """Delete the grant cookie from this browser; copies of it elsewhere stay valid until they expire."""
+    response.delete_cookie(PASSCODE_COOKIE, samesite='Lax')
@@ -0,0 +1,163 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from .models import Player
+
+
+class PlayerNameIndex:
+    """Process-local name index answering player search suggestions without a LIKE scan.
+
+    Names are kept lowercased in a sorted list, so prefix matches come
+    straight from a bisect, and in trigram postings for infix matches.
+    Prefix matches rank above infix ones; each group is ordered by name.
+    Queries shorter than a trigram only return prefix matches, so every
+    keystroke costs a bisect and `limit` steps however large the roster.
+
+    The index is built lazily from the Player table, updated in place by this
+    process when players are added, renamed, deleted or re-rated, and rebuilt
+    after PLAYER_INDEX_MAX_AGE seconds so changes made by other workers show
+    up within that window.
+    """
+
+    GRAM_SIZE = 3
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._reset()
+
+    def _reset(self):
+        self._entries = {}      # pk -> (lowered name, name, rating)
+        self._sorted = []       # (lowered name, pk), sorted
+        self._postings = {}     # gram -> set of pks
+        self._choices = None    # compact roster for dropdowns, rebuilt on demand
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+            self._reset()
+
+    def _ensure_built(self):
+        max_age = getattr(settings, 'PLAYER_INDEX_MAX_AGE', 300)
+        if self._built_at is not None and (not max_age or time.monotonic() - self._built_at < max_age):
+            return
+        with self._lock:
+            if self._built_at is not None and (not max_age or time.monotonic() - self._built_at < max_age):
+                return
+            self._reset()
+            for pk, name, rating in Player.objects.values_list('pk', 'name', 'rating').iterator(chunk_size=5000):
+                self._add(pk, name, rating, keep_sorted=False)
+            self._sorted.sort()
+            self._built_at = time.monotonic()
+
+    def _grams(self, lowered):
+        return {lowered[start:start + self.GRAM_SIZE] for start in range(len(lowered) - self.GRAM_SIZE + 1)}
+
+    def _add(self, pk, name, rating, keep_sorted=True):
+        self._choices = None
+        lowered = name.lower()
+        self._entries[pk] = (lowered, name, rating)
+        if keep_sorted:
+            insort(self._sorted, (lowered, pk))
+        else:
+            self._sorted.append((lowered, pk))
+        for gram in self._grams(lowered):
+            self._postings.setdefault(gram, set()).add(pk)
+
+    def _remove(self, pk):
+        entry = self._entries.pop(pk, None)
+        if entry is None:
+            return
+        self._choices = None
+        lowered = entry[0]
+        position = bisect_left(self._sorted, (lowered, pk))
+        if position < len(self._sorted) and self._sorted[position] == (lowered, pk):
+            del self._sorted[position]
+        for gram in self._grams(lowered):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(pk)
+                if not postings:
+                    del self._postings[gram]
+
+    def upsert(self, player):
+        """Add a new player or re-index a renamed one."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            entry = self._entries.get(player.pk)
+            if entry is not None and entry[1] == player.name:
+                self._entries[player.pk] = (entry[0], entry[1], player.rating)
+                self._choices = None
+                return
+            self._remove(player.pk)
+            self._add(player.pk, player.name, player.rating)
+
+    def remove(self, pk):
+        with self._lock:
+            if self._built_at is not None:
+                self._remove(pk)
+
+    def set_ratings(self, players):
+        """Refresh the displayed rating of players whose rating just changed."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            for player in players:
+                entry = self._entries.get(player.pk)
+                if entry is not None:
+                    self._entries[player.pk] = (entry[0], entry[1], player.rating)
+                    self._choices = None
+
+    def search(self, query, limit=8):
+        """Return up to `limit` {'id', 'name', 'rating'} dicts, prefix matches first.
+
+        Infix matches need at least GRAM_SIZE characters.
+        """
+        lowered = query.strip().lower()
+        if not lowered:
+            return []
+        self._ensure_built()
+
+        with self._lock:
+            found = []
+            position = bisect_left(self._sorted, (lowered,))
+            while len(found) < limit and position < len(self._sorted):
+                name, pk = self._sorted[position]
+                if not name.startswith(lowered):
+                    break
+                found.append(pk)
+                position += 1
+
+            needed = limit - len(found)
+            if needed > 0 and len(lowered) >= self.GRAM_SIZE:
+                postings = sorted((self._postings.get(gram, set()) for gram in self._grams(lowered)), key=len)
+                infix = (
+                    (self._entries[pk][0], pk)
+                    for pk in set.intersection(*postings)
+                    if lowered in self._entries[pk][0] and not self._entries[pk][0].startswith(lowered)
+                )
+                found.extend(pk for _, pk in heapq.nsmallest(needed, infix))
+
+            return [
+                {'id': pk, 'name': self._entries[pk][1], 'rating': self._entries[pk][2]}
+                for pk in found
+            ]
+
+    def choices(self):
+        """Every player as an {'id', 'name', 'rating'} dict, ordered by name, for filter dropdowns."""
+        self._ensure_built()
+        with self._lock:
+            if self._choices is None:
+                self._choices = [
+                    {'id': pk, 'name': self._entries[pk][1], 'rating': self._entries[pk][2]}
+                    for _, pk in self._sorted
+                ]
+            return self._choices
+
+
+player_index = PlayerNameIndex()
@@ -0,0 +1,117 @@
+from .bulk import bulk_update_fields
+from .models import PlayerMatch, PlayerStats
+
+
+STATS_FIELDS = [
+    'white_wins', 'white_draws', 'white_losses', 'black_wins', 'black_draws', 'black_losses',
+    'opponent_rating_total', 'streak',
+]
+
+RESULT_COUNTERS = {'W': 'wins', 'D': 'draws', 'L': 'losses'}
+
+# (pk, player_id, color, result, white_rating_before, black_rating_before) per timeline row
+TIMELINE_COLUMNS = ['pk', 'player_id', 'color', 'result', 'match__white_rating_before', 'match__black_rating_before']
+
+
+def next_streak(streak, result):
+    """The streak after a game with `result` ('W', 'D' or 'L' from the player's side)."""
+    if result == 'W':
+        return streak + 1 if streak > 0 else 1
+    if result == 'L':
+        return streak - 1 if streak < 0 else -1
+    return 0
+
+
+def _counter(color, result):
+    return f"{'white' if color == 'W' else 'black'}_{RESULT_COUNTERS[result]}"
+
+
+def _opponent_rating(color, white_rating_before, black_rating_before):
+    return black_rating_before if color == 'W' else white_rating_before
+
+
+def stats_from_timeline(rows):
+    """Replay timeline rows (TIMELINE_COLUMNS tuples, in play order) from scratch.
+
+    Returns ({player_id: {field: value}}, {timeline pk: streak before the game}).
+    """
+    totals = {}
+    streaks_before = {}
+    for pk, player_id, color, result, white_before, black_before in rows:
+        stats = totals.setdefault(player_id, dict.fromkeys(STATS_FIELDS, 0))
+        streaks_before[pk] = stats['streak']
+        stats[_counter(color, result)] += 1
+        stats['opponent_rating_total'] += _opponent_rating(color, white_before, black_before)
+        stats['streak'] = next_streak(stats['streak'], result)
+    return totals, streaks_before
+
+
+def _lock_stats(player_ids):
+    # players get their row with their first game; every row is then locked in id order
+    player_ids = sorted(player_ids)
+    PlayerStats.objects.bulk_create([PlayerStats(player_id=pk) for pk in player_ids], ignore_conflicts=True)
+    return {
+        stats.player_id: stats
+        for stats in PlayerStats.objects.select_for_update().filter(player_id__in=player_ids).order_by('player_id')
+    }
+
+
+def record_player_stats(matches, timeline):
+    """Count newly saved `matches` into their players' stats; call inside the recording transaction.
+
+    `timeline` holds the matches' unsaved PlayerMatch rows in play order; each
+    gets the player's `streak_before` so a revert can restore it exactly.
+    """
+    if not timeline:
+        return
+    matches = {match.pk: match for match in matches}
+    stats = _lock_stats({row.player_id for row in timeline})
+    for row in timeline:
+        match = matches[row.match_id]
+        player_stats = stats[row.player_id]
+        row.streak_before = player_stats.streak
+        counter = _counter(row.color, row.result)
+        setattr(player_stats, counter, getattr(player_stats, counter) + 1)
+        player_stats.opponent_rating_total += _opponent_rating(
+            row.color, match.white_rating_before, match.black_rating_before,
+        )
+        player_stats.streak = next_streak(player_stats.streak, row.result)
+    bulk_update_fields(stats.values(), STATS_FIELDS)
+
+
+def revert_player_stats(matches):
+    """Take reverted `matches` back out of their players' stats; call inside the reverting transaction.
+
+    Each player's streak goes back to what it was before their oldest reverted game.
+    """
+    if not matches:
+        return
+    matches = {match.pk: match for match in matches}
+    rows = list(
+        PlayerMatch.objects.filter(match__in=list(matches))
+        .values_list('player_id', 'match_id', 'color', 'result', 'streak_before')
+    )
+    # undo newest first, so the oldest game's streak_before is the one left standing
+    rows.sort(key=lambda row: (matches[row[1]].created_at, row[1]), reverse=True)
+    stats = _lock_stats({row[0] for row in rows})
+    for player_id, match_id, color, result, streak_before in rows:
+        match = matches[match_id]
+        player_stats = stats[player_id]
+        counter = _counter(color, result)
+        setattr(player_stats, counter, getattr(player_stats, counter) - 1)
+        player_stats.opponent_rating_total -= _opponent_rating(
+            color, match.white_rating_before, match.black_rating_before,
+        )
+        player_stats.streak = streak_before
+    bulk_update_fields(stats.values(), STATS_FIELDS)
+
+
+def adjust_opponent_ratings(deltas):
+    """Add {player_id: delta} to opponent rating totals, after re-rating rewrote "before" snapshots."""
+    deltas = {player_id: delta for player_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    stats = _lock_stats(deltas)
+    for player_id, delta in deltas.items():
+        stats[player_id].opponent_rating_total += delta
+    bulk_update_fields(stats.values(), ['opponent_rating_total'])
@@ -0,0 +1,36 @@
+import hashlib
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SiteState
+
+
+RANKING_VERSION_KEY = 'ranking_version'
+
+
+def bump_ranking_version():
+    """Invalidate every cached ranking page; call whenever a rating, name or player set changes."""
+    updated = SiteState.objects.filter(key=RANKING_VERSION_KEY).update(value=F('value') + 1, updated_at=timezone.now())
+    if not updated:
+        SiteState.objects.get_or_create(key=RANKING_VERSION_KEY, defaults={'value': 1})
+
+
+def get_ranking_version(request=None):
+    """Return (version, last_changed) for the ranking; memoized on `request` when given."""
+    state = getattr(request, '_ranking_version', None)
+    if state is None:
+        state = SiteState.objects.filter(key=RANKING_VERSION_KEY).values_list('value', 'updated_at').first() or (0, None)
+        if request is not None:
+            request._ranking_version = state
+    return state
+
+
+def ranking_etag(request, *args, **kwargs):
+    version, _ = get_ranking_version(request)
+    query = hashlib.md5(request.get_full_path().encode()).hexdigest()[:12]
+    return f'{version}-{query}'
+
+
+def ranking_last_modified(request, *args, **kwargs):
+    return get_ranking_version(request)[1]
@@ -0,0 +1,205 @@
+import io
+import threading
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer
+
+from .models import Player
+
+
+# Roughly one printed page of rows per table, so no table holds the whole roster.
+ROWS_PER_TABLE = 25
+BUILD_LOCK_TIMEOUT = 120
+
+HEADER_ROW = ['Rank', 'Player Name', 'Current Rating', 'Peak Rating']
+COLUMN_WIDTHS = [0.8*inch, 2.5*inch, 1.3*inch, 1.3*inch]
+
+# Styles are immutable once built, so they are shared by every build.
+_styles = getSampleStyleSheet()
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_styles['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#b58863'),
+    spaceAfter=30,
+    alignment=TA_CENTER,
+    fontName='Helvetica-Bold'
+)
+DATE_STYLE = ParagraphStyle(
+    'Date',
+    parent=_styles['Normal'],
+    fontSize=10,
+    textColor=colors.grey,
+    spaceAfter=20,
+    alignment=TA_CENTER
+)
+TABLE_STYLE = TableStyle([
+    # Header styling
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#262421')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#f0d9b5')),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('TOPPADDING', (0, 0), (-1, 0), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+
+    # Data rows styling
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 11),
+    ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+    ('ALIGN', (2, 1), (-1, -1), 'CENTER'),
+    ('ALIGN', (1, 1), (1, -1), 'LEFT'),
+    ('PADDING', (0, 1), (-1, -1), 10),
+
+    # Alternate row colors
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
+
+    # Rank column styling
+    ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
+    ('TEXTCOLOR', (0, 1), (0, -1), colors.HexColor('#b58863')),
+    ('FONTSIZE', (0, 1), (0, -1), 12),
+
+    # Rating columns styling
+    ('TEXTCOLOR', (2, 1), (2, -1), colors.HexColor('#4CAF50')),
+    ('FONTNAME', (2, 1), (2, -1), 'Helvetica-Bold'),
+    ('TEXTCOLOR', (3, 1), (3, -1), colors.black),
+    ('FONTNAME', (3, 1), (3, -1), 'Helvetica-Bold'),
+])
+
+_build_lock = threading.Lock()
+
+
+class _LazyFlowables:
+    """List-like view over a flowable iterator for `SimpleDocTemplate.build`.
+
+    build() only works at the front of its list (len, indexing, deleting and
+    re-inserting split parts at the head), so tables can be produced on demand
+    and dropped once drawn instead of materializing the whole document.
+    """
+
+    def __init__(self, iterable):
+        self._source = iter(iterable)
+        self._buffer = []
+
+    def _fill(self, count):
+        while len(self._buffer) < count:
+            try:
+                self._buffer.append(next(self._source))
+            except StopIteration:
+                break
+
+    def _fill_for(self, index):
+        if isinstance(index, slice):
+            self._fill(index.stop or 0)
+        else:
+            self._fill(index + 1)
+
+    def __len__(self):
+        self._fill(1)
+        return len(self._buffer)
+
+    def __getitem__(self, index):
+        self._fill_for(index)
+        return self._buffer[index]
+
+    def __setitem__(self, index, value):
+        self._fill_for(index)
+        self._buffer[index] = value
+
+    def __delitem__(self, index):
+        self._fill_for(index)
+        del self._buffer[index]
+
+    def insert(self, index, item):
+        self._buffer.insert(index, item)
+
+    def pop(self, index=0):
+        self._fill(index + 1)
+        return self._buffer.pop(index)
+
+
+def _ranking_flowables():
+    yield Paragraph("KNUST CHESS CLUB RANKINGS", TITLE_STYLE)
+    yield Paragraph(f"Generated on {timezone.now().strftime('%B %d, %Y')}", DATE_STYLE)
+    yield Spacer(1, 0.2*inch)
+
+    rows = (
+        Player.objects.order_by('-rating', 'name', 'pk')
+        .values_list('name', 'rating', 'peak_rating')
+        .iterator(chunk_size=ROWS_PER_TABLE * 20)
+    )
+    rank = 0
+    while True:
+        chunk = list(islice(rows, ROWS_PER_TABLE))
+        if not chunk:
+            break
+        table_data = [HEADER_ROW]
+        for name, rating, peak_rating in chunk:
+            rank += 1
+            table_data.append([str(rank), name, str(rating), str(peak_rating)])
+        table = LongTable(table_data, colWidths=COLUMN_WIDTHS, repeatRows=1)
+        table.setStyle(TABLE_STYLE)
+        yield table
+
+    if not rank:
+        table = LongTable([HEADER_ROW], colWidths=COLUMN_WIDTHS)
+        table.setStyle(TABLE_STYLE)
+        yield table
+
+
+def build_ranking_pdf():
+    """Render the full ranking PDF and return its bytes."""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    doc.build(_LazyFlowables(_ranking_flowables()))
+    return buffer.getvalue()
+
+
+def get_ranking_pdf(version):
+    """Return the ranking PDF for `version`, building it at most once per version.
+
+    Threads in this process share one lock; across processes a cache.add()
+    marker lets one worker build while the others poll briefly for its result.
+    """
+    key = f'ranking_pdf:{version}'
+    pdf = cache.get(key)
+    if pdf is not None:
+        return pdf
+
+    with _build_lock:
+        pdf = cache.get(key)
+        if pdf is not None:
+            return pdf
+
+        building_key = f'{key}:building'
+        if not cache.add(building_key, True, timeout=BUILD_LOCK_TIMEOUT):
+            pdf = _wait_for(key)
+            if pdf is not None:
+                return pdf
+
+        try:
+            pdf = build_ranking_pdf()
+            cache.set(key, pdf, timeout=getattr(settings, 'RANKING_CACHE_TIMEOUT', 24 * 60 * 60))
+        finally:
+            cache.delete(building_key)
+    return pdf
+
+
+def _wait_for(key, timeout=30, interval=0.2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(interval)
+        pdf = cache.get(key)
+        if pdf is not None:
+            return pdf
+    return None
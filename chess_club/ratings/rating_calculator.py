@@ -1,5 +1,19 @@
 from datetime import date
 
+import numpy as np
+
+
+RESULT_WHITE_SCORES = {'W': 1.0, 'D': 0.5, 'B': 0.0}
+
+# Rating differences are clamped to this many points when looking up expected
+# scores: past it, K * (score - expected) rounds to the same change for every
+# K tier (10, 20 and 40), so the clamp never changes a result.
+EXPECTED_SCORE_LIMIT = 800
+
+
+def _age(birth, today):
+    return today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
+
 
 class RatingCalculator:
     """Simplified FIDE-based rating calculator using provided rules.
@@ -12,7 +26,7 @@ class RatingCalculator:
     """
 
     @staticmethod
-    def get_k_factor(player):
+    def get_k_factor(player, today=None):
         # player is a Player instance (may have attributes: rating, games_played, birth_date)
         rating = getattr(player, 'rating', 0)
         games = getattr(player, 'games_played', 0)
@@ -21,9 +35,7 @@ class RatingCalculator:
         # Age rule: under 18 and rating < 2300 -> K=40
         if birth:
             try:
-                today = date.today()
-                age = today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
-                if age < 18 and rating < 2300:
+                if _age(birth, today or date.today()) < 18 and rating < 2300:
                     return 40
             except Exception:
                 pass
@@ -45,39 +57,297 @@ class RatingCalculator:
         rating_diff = opponent_rating - player_rating
         expected = 1 / (1 + 10 ** (rating_diff / 400))
         return expected
-    
+
     @staticmethod
-    def calculate_rating_change(player, opponent_rating, actual_score):
+    def expected_score(player_rating, opponent_rating):
+        """`calculate_expected_score` for integer ratings, read from `EXPECTED_SCORES`."""
+        diff = min(max(opponent_rating - player_rating, -EXPECTED_SCORE_LIMIT), EXPECTED_SCORE_LIMIT)
+        return EXPECTED_SCORE_LIST[diff + EXPECTED_SCORE_LIMIT]
+
+    @staticmethod
+    def calculate_rating_change(player, opponent_rating, actual_score, today=None):
         """
         Calculate rating change. `player` is a Player instance used to derive K.
         actual_score: 1 for win, 0.5 for draw, 0 for loss
         """
-        k_factor = RatingCalculator.get_k_factor(player)
-        expected_score = RatingCalculator.calculate_expected_score(
+        k_factor = RatingCalculator.get_k_factor(player, today)
+        expected_score = RatingCalculator.expected_score(
             player.rating,
             opponent_rating,
         )
         rating_change = k_factor * (actual_score - expected_score)
         return round(rating_change)
-    
+
     @staticmethod
-    def process_match(player_white, player_black, result):
+    def process_match(player_white, player_black, result, today=None):
         """Process a match between two Player instances, return (white_change, black_change).
 
         Note: this function does not persist player objects; caller should save updates.
         """
         white_score = 1.0 if result == 'W' else (0.5 if result == 'D' else 0.0)
         black_score = 1.0 if result == 'B' else (0.5 if result == 'D' else 0.0)
+        today = today or date.today()
 
         white_change = RatingCalculator.calculate_rating_change(
             player_white,
             player_black.rating,
             white_score,
+            today,
         )
         black_change = RatingCalculator.calculate_rating_change(
             player_black,
             player_white.rating,
             black_score,
+            today,
         )
 
-        return white_change, black_change
\ No newline at end of file
+        return white_change, black_change
+
+    @staticmethod
+    def junior_flags(birth_dates, today=None):
+        """Return a boolean array marking players under 18 on `today`.
+
+        `birth_dates` may contain None for players without a recorded birth date.
+        """
+        today = today or date.today()
+        flags = np.zeros(len(birth_dates), dtype=bool)
+        for idx, birth in enumerate(birth_dates):
+            if birth:
+                flags[idx] = _age(birth, today) < 18
+        return flags
+
+    @staticmethod
+    def batch_k_factors(ratings, games, juniors):
+        """Vectorized `get_k_factor` over parallel rating/games/junior arrays.
+
+        Age is resolved once per batch into `juniors` (see `junior_flags`);
+        only the rating and game-count thresholds move between games.
+        """
+        k_factors = np.where(ratings >= 2400, 10, 20)
+        k_factors[(games < 30) | (juniors & (ratings < 2300))] = 40
+        return k_factors
+
+    @staticmethod
+    def batch_expected_scores(player_ratings, opponent_ratings):
+        """Vectorized `calculate_expected_score` for integer rating arrays.
+
+        Rating differences are clamped to EXPECTED_SCORE_LIMIT and read from
+        `EXPECTED_SCORES`, which holds the scalar formula's floats, so the
+        rounded changes are bit-identical to the per-game path.
+        """
+        diffs = np.asarray(opponent_ratings, dtype=np.int64) - np.asarray(player_ratings, dtype=np.int64)
+        np.clip(diffs, -EXPECTED_SCORE_LIMIT, EXPECTED_SCORE_LIMIT, out=diffs)
+        diffs += EXPECTED_SCORE_LIMIT
+        return EXPECTED_SCORES[diffs]
+
+    @staticmethod
+    def batch_rating_changes(ratings, opponent_ratings, k_factors, scores):
+        """Vectorized `calculate_rating_change`; returns rounded int64 changes."""
+        expected = RatingCalculator.batch_expected_scores(ratings, opponent_ratings)
+        return np.round(k_factors * (scores - expected)).astype(np.int64)
+
+    @staticmethod
+    def process_batch(ratings, peaks, games, juniors, white_idx, black_idx, results, rating_period=False):
+        """Process many matches at once over player state arrays.
+
+        `ratings`, `peaks`, `games` and `juniors` are parallel arrays with one
+        entry per player; `white_idx`/`black_idx` index into them and `results`
+        holds 'W', 'B' or 'D' per match, in the order the games were played.
+
+        With `rating_period=False` the games are applied sequentially, exactly
+        as repeated `process_match` calls would: games are grouped into waves in
+        which no player appears twice, and each wave is computed in one
+        vectorized step. With `rating_period=True` every game is rated from the
+        ratings at the start of the period and the changes are summed per
+        player, so the order of the games does not matter.
+
+        The input arrays are not modified; see `BatchResult` for the output.
+        """
+        ratings = np.array(ratings, dtype=np.int64)
+        peaks = np.array(peaks, dtype=np.int64)
+        games = np.array(games, dtype=np.int64)
+        juniors = np.asarray(juniors, dtype=bool)
+        white_idx = np.asarray(white_idx, dtype=np.int64)
+        black_idx = np.asarray(black_idx, dtype=np.int64)
+        white_scores = np.array([RESULT_WHITE_SCORES[r] for r in results], dtype=np.float64)
+        black_scores = 1.0 - white_scores
+
+        batch = BatchResult(len(white_idx))
+
+        if rating_period:
+            white_ratings = ratings[white_idx]
+            black_ratings = ratings[black_idx]
+            white_k = RatingCalculator.batch_k_factors(white_ratings, games[white_idx], juniors[white_idx])
+            black_k = RatingCalculator.batch_k_factors(black_ratings, games[black_idx], juniors[black_idx])
+            batch.record(
+                slice(None), white_idx, black_idx, ratings, peaks, games,
+                RatingCalculator.batch_rating_changes(white_ratings, black_ratings, white_k, white_scores),
+                RatingCalculator.batch_rating_changes(black_ratings, white_ratings, black_k, black_scores),
+            )
+            deltas = np.zeros_like(ratings)
+            np.add.at(deltas, white_idx, batch.white_change)
+            np.add.at(deltas, black_idx, batch.black_change)
+            played = np.bincount(white_idx, minlength=len(ratings)) + np.bincount(black_idx, minlength=len(ratings))
+            ratings = ratings + deltas
+            games = games + played
+            peaks = np.maximum(peaks, ratings)
+        else:
+            for wave in RatingCalculator._waves(white_idx, black_idx):
+                w = white_idx[wave]
+                b = black_idx[wave]
+                white_ratings = ratings[w]
+                black_ratings = ratings[b]
+                white_k = RatingCalculator.batch_k_factors(white_ratings, games[w], juniors[w])
+                black_k = RatingCalculator.batch_k_factors(black_ratings, games[b], juniors[b])
+                white_change = RatingCalculator.batch_rating_changes(white_ratings, black_ratings, white_k, white_scores[wave])
+                black_change = RatingCalculator.batch_rating_changes(black_ratings, white_ratings, black_k, black_scores[wave])
+                batch.record(wave, w, b, ratings, peaks, games, white_change, black_change)
+
+                # players are unique within a wave, so plain fancy assignment is safe
+                ratings[w] += white_change
+                ratings[b] += black_change
+                games[w] += 1
+                games[b] += 1
+                peaks[w] = np.maximum(peaks[w], ratings[w])
+                peaks[b] = np.maximum(peaks[b], ratings[b])
+
+        batch.white_rating_after = batch.white_rating_before + batch.white_change
+        batch.black_rating_after = batch.black_rating_before + batch.black_change
+        batch.white_games_after = batch.white_games_before + 1
+        batch.black_games_after = batch.black_games_before + 1
+
+        batch.ratings = ratings
+        batch.peaks = peaks
+        batch.games = games
+        return batch
+
+    @staticmethod
+    def process_matches(players, matches, rating_period=False, today=None):
+        """Process (white_id, black_id, result) tuples for a collection of Player instances.
+
+        Convenience wrapper around `process_batch`: player state is read from
+        the instances and the returned `BatchResult` carries a `player_ids`
+        array aligned with its per-player `ratings`/`peaks`/`games` arrays.
+        Like `process_match`, nothing is saved or mutated.
+        """
+        players = list(players)
+        positions = {player.pk: idx for idx, player in enumerate(players)}
+        matches = list(matches)
+
+        batch = RatingCalculator.process_batch(
+            [player.rating for player in players],
+            [player.peak_rating for player in players],
+            [player.games_played or 0 for player in players],
+            RatingCalculator.junior_flags([player.birth_date for player in players], today),
+            [positions[white_id] for white_id, _, _ in matches],
+            [positions[black_id] for _, black_id, _ in matches],
+            [result for _, _, result in matches],
+            rating_period=rating_period,
+        )
+        batch.player_ids = np.array([player.pk for player in players], dtype=np.int64)
+        return batch
+
+    @staticmethod
+    def _waves(white_idx, black_idx):
+        """Split match positions into waves where each player appears at most once.
+
+        A game lands in the first wave after every earlier game of both of its
+        players, so applying the waves in order preserves sequential semantics.
+        """
+        if not len(white_idx):
+            return []
+
+        # plain lists and comparisons: this loop is the one per-game Python step of a batch
+        next_wave = [0] * (int(max(white_idx.max(), black_idx.max())) + 1)
+        wave_of = [0] * len(white_idx)
+        for pos, (white, black) in enumerate(zip(white_idx.tolist(), black_idx.tolist())):
+            wave = next_wave[white]
+            black_wave = next_wave[black]
+            if black_wave > wave:
+                wave = black_wave
+            wave_of[pos] = wave
+            next_wave[white] = next_wave[black] = wave + 1
+
+        wave_of = np.array(wave_of, dtype=np.int64)
+        order = np.argsort(wave_of, kind='stable')
+        boundaries = np.flatnonzero(np.diff(wave_of[order])) + 1
+        return np.split(order, boundaries)
+
+
+# calculate_expected_score for every clamped difference, opponent minus player, from -LIMIT up
+EXPECTED_SCORE_LIST = [
+    RatingCalculator.calculate_expected_score(0, diff)
+    for diff in range(-EXPECTED_SCORE_LIMIT, EXPECTED_SCORE_LIMIT + 1)
+]
+EXPECTED_SCORES = np.array(EXPECTED_SCORE_LIST, dtype=np.float64)
+
+
+class BatchResult:
+    """Per-match snapshots and final player state produced by `process_batch`.
+
+    Per-match arrays mirror the Match snapshot columns (`white_rating_before`,
+    `white_rating_change`, `white_peak_after`, `black_games_after`, ...,
+    `white_deviation_before`, ...). In rating-period mode the "before" values
+    are the ratings at the start of the period. `ratings`, `peaks`, `games`,
+    `deviations` and `volatilities` hold the final per-player state.
+    """
+
+    SNAPSHOT_FIELDS = [
+        f'{color}_{field}'
+        for color in ('white', 'black')
+        for field in (
+            'rating_before', 'rating_after', 'rating_change',
+            'peak_before', 'peak_after', 'games_before', 'games_after',
+        )
+    ]
+
+    # Glicko-2 state before each match; rating systems without it pass the players' values through
+    STATE_SNAPSHOT_FIELDS = [
+        f'{color}_{field}'
+        for color in ('white', 'black')
+        for field in ('deviation_before', 'volatility_before')
+    ]
+
+    def __init__(self, size):
+        for field in self.SNAPSHOT_FIELDS:
+            setattr(self, field, np.zeros(size, dtype=np.int64))
+        for field in self.STATE_SNAPSHOT_FIELDS:
+            setattr(self, field, np.zeros(size, dtype=np.float64))
+        self.ratings = self.peaks = self.games = None
+        self.deviations = self.volatilities = None
+        self.player_ids = None
+
+    def __len__(self):
+        return len(self.white_change)
+
+    def record(self, positions, white, black, ratings, peaks, games, white_change, black_change):
+        self.white_rating_before[positions] = ratings[white]
+        self.black_rating_before[positions] = ratings[black]
+        self.white_peak_before[positions] = peaks[white]
+        self.black_peak_before[positions] = peaks[black]
+        self.white_games_before[positions] = games[white]
+        self.black_games_before[positions] = games[black]
+        self.white_change[positions] = white_change
+        self.black_change[positions] = black_change
+        self.white_peak_after[positions] = np.maximum(peaks[white], ratings[white] + white_change)
+        self.black_peak_after[positions] = np.maximum(peaks[black], ratings[black] + black_change)
+
+    def record_state(self, positions, white, black, deviations, volatilities):
+        self.white_deviation_before[positions] = deviations[white]
+        self.black_deviation_before[positions] = deviations[black]
+        self.white_volatility_before[positions] = volatilities[white]
+        self.black_volatility_before[positions] = volatilities[black]
+
+    @property
+    def white_change(self):
+        return self.white_rating_change
+
+    @property
+    def black_change(self):
+        return self.black_rating_change
+
+    def snapshot(self, position):
+        """Return the Match snapshot column values for one match as plain ints and floats."""
+        values = {field: int(getattr(self, field)[position]) for field in self.SNAPSHOT_FIELDS}
+        values.update((field, float(getattr(self, field)[position])) for field in self.STATE_SNAPSHOT_FIELDS)
+        return values
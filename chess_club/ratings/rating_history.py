@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Pairing, PlayerMatch
+
+
+def _cache_key(player):
+    # Recording or reverting a game always moves games_played or latest_match, so
+    # the key changes with them and every worker drops its stale copy on its own.
+    return (
+        f'rating_history:{player.pk}:{player.games_played}:{player.rating}:'
+        f'{player.peak_rating}:{player.latest_match_id}'
+    )
+
+
+def build_rating_history(player):
+    """The player's rating after each surviving game, delta-encoded in columns.
+
+    Returns {'start': epoch seconds, 'rating': first rating, 'dt': [...],
+    'dr': [...]}: point i is at start + sum(dt[:i + 1]) seconds with rating
+    rating + sum(dr[:i + 1]). The first point is the rating before the
+    earliest game, so `dt` and `dr` start with that game. Recorded matches
+    come from their snapshot columns (one indexed range over the player's
+    timeline); rated tournament games are merged in by `recorded_at`. Matches
+    purged after the retention window are not in the series.
+    """
+    points = []
+    for created_at, color, white_before, black_before, white_after, black_after in (
+        PlayerMatch.objects.filter(player=player, is_reverted=False)
+        .order_by('created_at', 'match_id')
+        .values_list(
+            'created_at', 'color', 'match__white_rating_before', 'match__black_rating_before',
+            'match__white_rating_after', 'match__black_rating_after',
+        )
+    ):
+        if color == 'W':
+            points.append((created_at, white_before, white_after))
+        else:
+            points.append((created_at, black_before, black_after))
+
+    for recorded_at, white_id, white_before, black_before, white_after, black_after in (
+        Pairing.objects.filter(Q(player_white=player) | Q(player_black=player), recorded_at__isnull=False)
+        .exclude(result='P')
+        .values_list(
+            'recorded_at', 'player_white_id', 'white_rating_before', 'black_rating_before',
+            'white_rating_after', 'black_rating_after',
+        )
+    ):
+        if white_id == player.pk:
+            points.append((recorded_at, white_before, white_after))
+        else:
+            points.append((recorded_at, black_before, black_after))
+
+    if not points:
+        return {'start': int(player.created_at.timestamp()), 'rating': player.rating, 'dt': [], 'dr': []}
+
+    points.sort(key=lambda point: point[0])
+    start = int(points[0][0].timestamp())
+    previous_time, previous_rating = start, points[0][1]
+    history = {'start': start, 'rating': previous_rating, 'dt': [], 'dr': []}
+    for played_at, _, rating in points:
+        timestamp = int(played_at.timestamp())
+        history['dt'].append(timestamp - previous_time)
+        history['dr'].append(rating - previous_rating)
+        previous_time, previous_rating = timestamp, rating
+    return history
+
+
+def get_rating_history(player):
+    """`build_rating_history`, cached until the player's next recorded or reverted game."""
+    key = _cache_key(player)
+    history = cache.get(key)
+    if history is None:
+        history = build_rating_history(player)
+        cache.set(key, history, timeout=getattr(settings, 'RANKING_CACHE_TIMEOUT', 24 * 60 * 60))
+    return history
@@ -0,0 +1,263 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .rating_calculator import RESULT_WHITE_SCORES, BatchResult, RatingCalculator
+
+
+# Player columns a rating system reads and writes.
+RATING_STATE_FIELDS = ['rating', 'peak_rating', 'games_played', 'rating_deviation', 'volatility']
+
+DEFAULT_DEVIATION = 350.0
+DEFAULT_VOLATILITY = 0.06
+
+
+class RatingSystem:
+    """Interface the ledger, match imports, tournaments and rebuild_ratings rate games through.
+
+    Subclasses implement `process_batch` over parallel per-player arrays and
+    return a `BatchResult`. The active system is chosen with the
+    RATING_SYSTEM setting; see `get_rating_system`.
+    """
+
+    name = ''
+
+    def process_batch(self, ratings, peaks, games, juniors, white_idx, black_idx, results,
+                      rating_period=False, deviations=None, volatilities=None):
+        raise NotImplementedError
+
+    def process_matches(self, players, matches, rating_period=False, today=None):
+        """Rate (white_id, black_id, result) tuples for a collection of Player instances.
+
+        Player state is read from the instances and nothing is saved or
+        mutated; apply the result with `update_players`. The returned
+        `BatchResult` carries a `player_ids` array aligned with its per-player
+        arrays.
+        """
+        players = list(players)
+        positions = {player.pk: idx for idx, player in enumerate(players)}
+        matches = list(matches)
+
+        batch = self.process_batch(
+            [player.rating for player in players],
+            [player.peak_rating for player in players],
+            [player.games_played or 0 for player in players],
+            RatingCalculator.junior_flags([player.birth_date for player in players], today),
+            [positions[white_id] for white_id, _, _ in matches],
+            [positions[black_id] for _, black_id, _ in matches],
+            [result for _, _, result in matches],
+            rating_period=rating_period,
+            deviations=[player.rating_deviation for player in players],
+            volatilities=[player.volatility for player in players],
+        )
+        batch.player_ids = np.array([player.pk for player in players], dtype=np.int64)
+        return batch
+
+    @staticmethod
+    def update_players(players, batch):
+        """Copy the final per-player state of `batch` onto the instances it was computed for."""
+        for idx, player in enumerate(players):
+            player.rating = int(batch.ratings[idx])
+            player.peak_rating = int(batch.peaks[idx])
+            player.games_played = int(batch.games[idx])
+            player.rating_deviation = float(batch.deviations[idx])
+            player.volatility = float(batch.volatilities[idx])
+
+    @staticmethod
+    def _state_arrays(count, deviations, volatilities):
+        deviations = np.full(count, DEFAULT_DEVIATION) if deviations is None else np.array(deviations, dtype=np.float64)
+        volatilities = np.full(count, DEFAULT_VOLATILITY) if volatilities is None else np.array(volatilities, dtype=np.float64)
+        return deviations, volatilities
+
+
+class EloRatingSystem(RatingSystem):
+    """The club's FIDE-style Elo (`RatingCalculator`); deviation and volatility pass through unchanged."""
+
+    name = 'elo'
+
+    def process_batch(self, ratings, peaks, games, juniors, white_idx, black_idx, results,
+                      rating_period=False, deviations=None, volatilities=None):
+        batch = RatingCalculator.process_batch(
+            ratings, peaks, games, juniors, white_idx, black_idx, results, rating_period=rating_period,
+        )
+        deviations, volatilities = self._state_arrays(len(batch.ratings), deviations, volatilities)
+        batch.record_state(
+            slice(None), np.asarray(white_idx, dtype=np.int64), np.asarray(black_idx, dtype=np.int64),
+            deviations, volatilities,
+        )
+        batch.deviations = deviations
+        batch.volatilities = volatilities
+        return batch
+
+
+class Glicko2RatingSystem(RatingSystem):
+    """Glicko-2 (Glickman, 2012), one vectorized update per rating period.
+
+    With `rating_period=True` the whole batch is one rating period. Otherwise
+    the games are split into the same waves `RatingCalculator` uses, so each
+    wave is a period in which every player has at most one game. A recorded
+    match, each wave of an import and a tournament round (rated with
+    `rating_period=True`) are therefore each one period. Periods never hold
+    two games of the same player: every match stores the state its player
+    had before it and after it, which is what lets the ledger revert matches
+    one at a time and `rebuild_ratings` replay the same periods. Only
+    players with games in a period are updated; there is no inactivity
+    inflation of the deviation between submissions.
+
+    Ratings are stored as integers, so each game's rating change is rounded,
+    and a player's new rating is their old one plus the rounded changes of
+    their games in the period. The system constant tau comes from the
+    GLICKO2_TAU setting.
+    """
+
+    name = 'glicko2'
+
+    SCALE = 400 / math.log(10)  # 173.7178..., Glicko-2 to Glicko rating units
+    BASE_RATING = 1500
+    EPSILON = 0.000001
+    MAX_ITERATIONS = 100
+
+    def __init__(self, tau=None):
+        self.tau = tau if tau is not None else getattr(settings, 'GLICKO2_TAU', 0.5)
+
+    def process_batch(self, ratings, peaks, games, juniors, white_idx, black_idx, results,
+                      rating_period=False, deviations=None, volatilities=None):
+        ratings = np.array(ratings, dtype=np.int64)
+        peaks = np.array(peaks, dtype=np.int64)
+        games = np.array(games, dtype=np.int64)
+        deviations, volatilities = self._state_arrays(len(ratings), deviations, volatilities)
+        white_idx = np.asarray(white_idx, dtype=np.int64)
+        black_idx = np.asarray(black_idx, dtype=np.int64)
+        white_scores = np.array([RESULT_WHITE_SCORES[r] for r in results], dtype=np.float64)
+
+        batch = BatchResult(len(white_idx))
+        periods = [np.arange(len(white_idx))] if rating_period else RatingCalculator._waves(white_idx, black_idx)
+        for period in periods:
+            if not len(period):
+                continue
+            w = white_idx[period]
+            b = black_idx[period]
+            white_change, black_change, new_deviations, new_volatilities = self._rate_period(
+                ratings, deviations, volatilities, w, b, white_scores[period],
+            )
+            batch.record(period, w, b, ratings, peaks, games, white_change, black_change)
+            batch.record_state(period, w, b, deviations, volatilities)
+
+            deltas = np.zeros_like(ratings)
+            np.add.at(deltas, w, white_change)
+            np.add.at(deltas, b, black_change)
+            played = np.bincount(w, minlength=len(ratings)) + np.bincount(b, minlength=len(ratings))
+            ratings = ratings + deltas
+            games = games + played
+            peaks = np.where(played > 0, np.maximum(peaks, ratings), peaks)
+            deviations, volatilities = new_deviations, new_volatilities
+
+        batch.white_rating_after = batch.white_rating_before + batch.white_change
+        batch.black_rating_after = batch.black_rating_before + batch.black_change
+        batch.white_games_after = batch.white_games_before + 1
+        batch.black_games_after = batch.black_games_before + 1
+
+        batch.ratings = ratings
+        batch.peaks = peaks
+        batch.games = games
+        batch.deviations = deviations
+        batch.volatilities = volatilities
+        return batch
+
+    def _rate_period(self, ratings, deviations, volatilities, white, black, white_scores):
+        """One Glicko-2 update for the players of one period's games.
+
+        Returns each game's (white, black) rating change and the new
+        deviation and volatility arrays for every player.
+        """
+        mu = (ratings - self.BASE_RATING) / self.SCALE
+        phi = deviations / self.SCALE
+
+        # steps 3 and 4: estimated variance v and improvement delta, summed per player
+        white_g, white_expected = self._expectation(mu, phi, white, black)
+        black_g, black_expected = self._expectation(mu, phi, black, white)
+        white_gain = white_g * (white_scores - white_expected)
+        black_gain = black_g * ((1.0 - white_scores) - black_expected)
+
+        information = np.zeros(len(ratings))
+        np.add.at(information, white, white_g ** 2 * white_expected * (1 - white_expected))
+        np.add.at(information, black, black_g ** 2 * black_expected * (1 - black_expected))
+        gains = np.zeros(len(ratings))
+        np.add.at(gains, white, white_gain)
+        np.add.at(gains, black, black_gain)
+
+        rated = np.unique(np.concatenate([white, black]))
+        v = 1 / information[rated]
+        delta = v * gains[rated]
+
+        # steps 5 and 6: new volatility, then the pre-period deviation
+        sigma = self._volatility(phi[rated], volatilities[rated], v, delta)
+        phi_star = np.sqrt(phi[rated] ** 2 + sigma ** 2)
+
+        # step 7: new deviation; each game moves the rating by phi'^2 * g * (s - E)
+        new_phi = np.array(phi)
+        new_phi[rated] = np.minimum(1 / np.sqrt(1 / phi_star ** 2 + 1 / v), DEFAULT_DEVIATION / self.SCALE)
+        white_change = np.round(self.SCALE * new_phi[white] ** 2 * white_gain).astype(np.int64)
+        black_change = np.round(self.SCALE * new_phi[black] ** 2 * black_gain).astype(np.int64)
+
+        # players without games in the period keep their stored values untouched
+        new_deviations = np.array(deviations)
+        new_deviations[rated] = new_phi[rated] * self.SCALE
+        new_volatilities = np.array(volatilities)
+        new_volatilities[rated] = sigma
+        return white_change, black_change, new_deviations, new_volatilities
+
+    @staticmethod
+    def _expectation(mu, phi, player, opponent):
+        g = 1 / np.sqrt(1 + 3 * phi[opponent] ** 2 / math.pi ** 2)
+        expected = 1 / (1 + np.exp(-g * (mu[player] - mu[opponent])))
+        return g, expected
+
+    def _volatility(self, phi, sigma, v, delta):
+        """Step 5 of Glicko-2 (the Illinois algorithm), iterated for every player at once."""
+        tau = self.tau
+        a = np.log(sigma ** 2)
+
+        def f(x):
+            ex = np.exp(x)
+            return ex * (delta ** 2 - phi ** 2 - v - ex) / (2 * (phi ** 2 + v + ex) ** 2) - (x - a) / tau ** 2
+
+        A = a.copy()
+        large = delta ** 2 > phi ** 2 + v
+        B = np.where(large, np.log(np.where(large, delta ** 2 - phi ** 2 - v, 1.0)), a - tau)
+        k = 1
+        pending = ~large & (f(B) < 0)
+        while pending.any():
+            k += 1
+            B = np.where(pending, a - k * tau, B)
+            pending &= f(B) < 0
+
+        f_a, f_b = f(A), f(B)
+        active = np.abs(B - A) > self.EPSILON
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for _ in range(self.MAX_ITERATIONS):
+                if not active.any():
+                    break
+                C = A + (A - B) * f_a / (f_b - f_a)
+                f_c = f(C)
+                swap = active & (f_c * f_b <= 0)
+                halve = active & ~swap
+                A = np.where(swap, B, A)
+                f_a = np.where(swap, f_b, np.where(halve, f_a / 2, f_a))
+                B = np.where(active, C, B)
+                f_b = np.where(active, f_c, f_b)
+                active &= np.abs(B - A) > self.EPSILON
+        return np.exp(A / 2)
+
+
+def get_rating_system():
+    """The rating system named by the RATING_SYSTEM setting (a dotted path), Elo by default."""
+    return _load_rating_system(getattr(settings, 'RATING_SYSTEM', 'ratings.rating_systems.EloRatingSystem'))
+
+
+@lru_cache(maxsize=None)
+def _load_rating_system(path):
+    return import_string(path)()
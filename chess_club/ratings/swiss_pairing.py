@@ -1,267 +1,419 @@
-from .models import TournamentStanding, Pairing
-from .rating_calculator import RatingCalculator
+from django.db import transaction
+from django.utils import timezone
+
+from .bulk import bulk_update_fields
+from .matching import max_weight_matching
+from .models import Player, TournamentStanding, Pairing
+from .player_index import player_index
+from .rating_calculator import BatchResult
+from .rating_systems import RATING_STATE_FIELDS, get_rating_system
+from .ranking_cache import bump_ranking_version
+from .tiebreaks import TIEBREAK_FIELDS, refresh_tiebreaks
 import random
 
 
+RESULT_SCORES = {'W': (1.0, 0.0), 'B': (0.0, 1.0), 'D': (0.5, 0.5)}
+# the bye player gets no pairing, so nothing is added to their standing
+BYE_SCORE = 0.0
+
+
+class PairingError(ValueError):
+    """Raised when a round cannot be paired without a rematch."""
+
+
+class SwissPlayer:
+    """Pairing-time state of one participant, rebuilt from the tournament's earlier rounds."""
+
+    __slots__ = ('player', 'score', 'rating', 'opponents', 'colours', 'floats', 'byes')
+
+    def __init__(self, player, score=0.0, rating=None):
+        self.player = player
+        self.score = score
+        self.rating = player.rating if rating is None else rating
+        self.opponents = set()   # player ids already met
+        self.colours = []        # 'W'/'B' per game played, oldest first
+        self.floats = []         # 'U'/'D'/'' per game: paired up, down or within the score group
+        self.byes = 0
+
+    @property
+    def id(self):
+        return self.player.id
+
+    def colour_due(self):
+        """Return (colour, strength): 2 absolute, 1 strong, 0 mild; (None, 0) before the first game."""
+        balance = self.colours.count('W') - self.colours.count('B')
+        last_two = self.colours[-2:]
+        if balance <= -2 or last_two == ['B', 'B']:
+            return 'W', 2
+        if balance >= 2 or last_two == ['W', 'W']:
+            return 'B', 2
+        if balance:
+            return ('W' if balance < 0 else 'B'), 1
+        if self.colours:
+            return ('B' if self.colours[-1] == 'W' else 'W'), 0
+        return None, 0
+
+
 class SwissPairing:
-    """FIDE Swiss tournament pairing system"""
-    
+    """FIDE Swiss tournament pairing system.
+
+    The tournament state (standings, opponents, colour and float history) is
+    read once and every later round is paired as a maximum-weight matching:
+    each pair of players who have not met is an edge whose weight falls with
+    their score difference, a colour clash and a repeated float, so the
+    matching pairs as many players as possible and, among those pairings,
+    the one that best keeps score groups together. The round is written with
+    a single bulk_create.
+    """
+
+    # Edge weight terms; each term dominates the ones below it.
+    BASE_WEIGHT = 10 ** 9
+    SCORE_WEIGHT = 100_000      # times the squared score difference in half-points
+    COLOUR_CLASH = {2: 150_000, 1: 30_000, 0: 3_000}   # by the weaker of two equal preferences
+    FLOAT_WEIGHT = 10_000       # floating the same direction two rounds running
+
+    # Largest set of players handed to the matching solver at once.
+    BLOCK_SIZE = 32
+
     @staticmethod
     def generate_round_pairings(tournament, round_obj):
         """
         Generate pairings for a round using FIDE Swiss system
         """
-        standings = list(TournamentStanding.objects.filter(
-            tournament=tournament
-        ).order_by('-total_score', '-wins'))
-        
+        standings = list(
+            TournamentStanding.objects.filter(tournament=tournament)
+            .select_related('player')
+            .order_by('-total_score', '-wins', '-player__rating', 'player_id')
+        )
+
         if not standings:
             raise ValueError("No standings found. Add players to tournament first.")
-        
+
         if round_obj.round_number == 1:
-            pairings = SwissPairing._pair_first_round(standings, round_obj)
+            pairs = SwissPairing._pair_first_round(standings)
         else:
-            pairings = SwissPairing._pair_fide_swiss(standings, round_obj)
-        
-        return pairings
-    
+            players = SwissPairing._load_state(tournament, round_obj, standings)
+            pairs, _ = SwissPairing.pair_players(players)
+            pairs = [(white.player, black.player) for white, black in pairs]
+
+        pairings = [
+            Pairing(
+                round=round_obj,
+                player_white=white,
+                player_black=black,
+                white_rating_before=white.rating,
+                black_rating_before=black.rating,
+                board_number=board_number,
+            )
+            for board_number, (white, black) in enumerate(pairs, start=1)
+        ]
+        return Pairing.objects.bulk_create(pairings)
+
+    @staticmethod
+    def _load_state(tournament, round_obj, standings):
+        """Build a SwissPlayer per standing from one query over the earlier rounds' pairings."""
+        players = {standing.player_id: SwissPlayer(standing.player, standing.total_score) for standing in standings}
+        played = (
+            Pairing.objects.filter(round__tournament=tournament, round__round_number__lt=round_obj.round_number)
+            .order_by('round__round_number', 'board_number')
+            .values_list('round__round_number', 'player_white_id', 'player_black_id', 'result')
+        )
+
+        # replay the rounds to know each player's score when they were paired
+        scores = dict.fromkeys(players, 0.0)
+        rounds = {}
+        for round_number, white_id, black_id, result in played:
+            rounds.setdefault(round_number, []).append((white_id, black_id, result))
+        for round_number in range(1, round_obj.round_number):
+            seated = set()
+            for white_id, black_id, result in rounds.get(round_number, ()):
+                white, black = players.get(white_id), players.get(black_id)
+                if white is None or black is None:
+                    continue
+                seated.update((white_id, black_id))
+                white.opponents.add(black_id)
+                black.opponents.add(white_id)
+                white.colours.append('W')
+                black.colours.append('B')
+                difference = scores[white_id] - scores[black_id]
+                white.floats.append('D' if difference > 0 else 'U' if difference < 0 else '')
+                black.floats.append('U' if difference > 0 else 'D' if difference < 0 else '')
+                white_score, black_score = RESULT_SCORES.get(result, (0.0, 0.0))
+                scores[white_id] += white_score
+                scores[black_id] += black_score
+            for player_id, player in players.items():
+                if player_id not in seated:
+                    player.byes += 1
+        return list(players.values())
+
+    @staticmethod
+    def pair_players(players):
+        """Pair SwissPlayers for the next round; returns ([(white, black), ...], bye_player_or_None).
+
+        Score groups are paired from the top down. Each group, plus anyone
+        floated down from the group above, is solved as a maximum-weight
+        matching; a large group is cut into blocks that each take a slice of
+        its top half and the matching slice of its bottom half, so the solver
+        never sees more than BLOCK_SIZE players. Whoever is left unpaired floats
+        into the next block. If the bottom of the field cannot be paired without
+        rematches, the last boards are dissolved and re-solved together, growing
+        the pool until everyone is paired or the whole field has been tried;
+        PairingError is raised if someone is still left over.
+        Boards are ordered by the higher score, then the higher rating, on each board.
+        """
+        ranked = sorted(players, key=lambda p: (-p.score, -p.rating, p.id))
+        bye = None
+        if len(ranked) % 2:
+            # the lowest-ranked player with the fewest byes sits out
+            bye = min(reversed(ranked), key=lambda p: (p.byes, p.score))
+            ranked.remove(bye)
+
+        groups = []
+        for player in ranked:
+            if groups and groups[-1][0].score == player.score:
+                groups[-1].append(player)
+            else:
+                groups.append([player])
+
+        pairs, floaters = [], []
+        for group in groups:
+            for block in SwissPairing._blocks(group):
+                paired, floaters = SwissPairing._match(floaters + block)
+                pairs.extend(paired)
+
+        pool = len(floaters)
+        while floaters and pool < len(ranked):
+            # re-solve the lowest boards together with the players left over
+            pool = min(len(ranked), pool * 2)
+            position = {player.id: index for index, player in enumerate(ranked)}
+            pairs.sort(key=lambda pair: min(position[pair[0].id], position[pair[1].id]))
+            keep = max(0, len(pairs) - (pool - len(floaters)) // 2)
+            retry = floaters + [player for pair in pairs[keep:] for player in pair]
+            retry.sort(key=lambda p: position[p.id])
+            paired, floaters = SwissPairing._match(retry)
+            pairs = pairs[:keep] + paired
+        if floaters:
+            names = ', '.join(player.player.name for player in floaters)
+            raise PairingError(f'Cannot pair this round without a rematch: {names} have no opponent left.')
+
+        pairs = [SwissPairing._assign_colours(a, b) for a, b in pairs]
+        pairs.sort(key=lambda pair: max(
+            (pair[0].score, pair[0].rating), (pair[1].score, pair[1].rating)), reverse=True)
+        return pairs, bye
+
     @staticmethod
-    def _pair_first_round(standings, round_obj):
+    def _blocks(group):
+        """Split a score group into blocks pairing slices of its top half with slices of its bottom half."""
+        count = -(-len(group) // SwissPairing.BLOCK_SIZE)
+        if count <= 1:
+            return [group]
+        half = len(group) // 2
+        top, bottom = group[:half], group[half:]
+        return [
+            top[len(top) * k // count:len(top) * (k + 1) // count]
+            + bottom[len(bottom) * k // count:len(bottom) * (k + 1) // count]
+            for k in range(count)
+        ]
+
+    @staticmethod
+    def _match(ranked):
+        """Pair `ranked` (best first) as a maximum-weight matching; returns ([(higher, lower), ...], unpaired)."""
+        groups = {}
+        for index, player in enumerate(ranked):
+            groups.setdefault(player.score, []).append(index)
+        group_position = {}
+        for members in groups.values():
+            for position, index in enumerate(members):
+                group_position[index] = (position, len(members))
+
+        edges = [
+            (i, j, SwissPairing._pairing_weight(a, ranked[j], group_position[i], group_position[j]))
+            for i, a in enumerate(ranked)
+            for j in range(i + 1, len(ranked))
+            if ranked[j].id not in a.opponents
+        ]
+        mate = max_weight_matching(edges, max_cardinality=True) if edges else []
+
+        pairs, unpaired = [], []
+        for index, player in enumerate(ranked):
+            partner = mate[index] if index < len(mate) else -1
+            if partner == -1:
+                unpaired.append(player)
+            elif partner > index:
+                pairs.append((player, ranked[partner]))
+        return pairs, unpaired
+
+    @staticmethod
+    def _pairing_weight(a, b, a_position, b_position):
+        """Edge weight for pairing `a` with lower-ranked `b`; higher is better."""
+        halfpoints = round((a.score - b.score) * 2)
+        weight = SwissPairing.BASE_WEIGHT - SwissPairing.SCORE_WEIGHT * halfpoints * halfpoints
+
+        a_due, a_strength = a.colour_due()
+        b_due, b_strength = b.colour_due()
+        if a_due is not None and a_due == b_due:
+            weight -= SwissPairing.COLOUR_CLASH[min(a_strength, b_strength)]
+
+        if halfpoints:
+            # a floats down and b floats up; avoid repeating last round's float
+            if a.floats and a.floats[-1] == 'D':
+                weight -= SwissPairing.FLOAT_WEIGHT
+            if b.floats and b.floats[-1] == 'U':
+                weight -= SwissPairing.FLOAT_WEIGHT
+        else:
+            # within a score group the top half meets the bottom half
+            (a_index, size), (b_index, _) = a_position, b_position
+            weight -= abs((b_index - a_index) - size // 2)
+        return weight
+
+    @staticmethod
+    def _assign_colours(a, b):
+        """Return (white, black) for higher-ranked `a` and `b`, honouring the stronger colour preference."""
+        a_due, a_strength = a.colour_due()
+        b_due, b_strength = b.colour_due()
+        if a_due is None and b_due is None:
+            return a, b
+        if b_due is None or (a_due is not None and (a_due != b_due or a_strength >= b_strength)):
+            return (a, b) if a_due == 'W' else (b, a)
+        return (b, a) if b_due == 'W' else (a, b)
+
+    @staticmethod
+    def _pair_first_round(standings):
         """Pair first round randomly"""
         players = [s.player for s in standings]
-        players = list(players)
         random.shuffle(players)
-        pairings = []
-        board_number = 1
-        
+
         # Handle odd number of players (bye)
         if len(players) % 2 == 1:
             players.pop()  # Skip bye for now
-        
-        # Pair remaining players
-        for i in range(0, len(players) - 1, 2):
-            player_white = players[i]
-            player_black = players[i + 1]
-            
-            pairing = Pairing.objects.create(
-                round=round_obj,
-                player_white=player_white,
-                player_black=player_black,
-                white_rating_before=player_white.rating,
-                black_rating_before=player_black.rating,
-                board_number=board_number,
-            )
-            pairings.append(pairing)
-            board_number += 1
-        
-        return pairings
-    
-    @staticmethod
-    def _pair_fide_swiss(standings, round_obj):
-        """
-        FIDE Swiss pairing:
-        1. Group by score
-        2. Pair within same score group (if they haven't played)
-        3. If must pair with different score, use next lower group
-        4. Never pair same opponents twice
-        """
-        pairings = []
-        board_number = 1
-        tournament = round_obj.tournament
-        
-        # Group by score
-        score_groups = {}
-        for standing in standings:
-            score = standing.total_score
-            if score not in score_groups:
-                score_groups[score] = []
-            score_groups[score].append(standing)
-        
-        # Sort scores descending
-        sorted_scores = sorted(score_groups.keys(), reverse=True)
-        
-        paired_players = set()
-        unpaired_standings = []
-        
-        # Process each score group
-        for score in sorted_scores:
-            group = [s for s in score_groups[score] if s.player.id not in paired_players]
-            
-            if len(group) == 0:
-                continue
-            
-            # Try to pair within this score group
-            group_unpaired = []
-            i = 0
-            while i < len(group):
-                if i >= len(group) - 1:
-                    # Odd one out from this group
-                    group_unpaired.append(group[i])
-                    i += 1
-                    continue
-                
-                standing1 = group[i]
-                standing2 = group[i + 1]
-                
-                # Check if they've played before
-                if not SwissPairing._have_played(standing1.player, standing2.player, tournament):
-                    # Valid pairing
-                    pairing = Pairing.objects.create(
-                        round=round_obj,
-                        player_white=standing1.player,
-                        player_black=standing2.player,
-                        white_rating_before=standing1.player.rating,
-                        black_rating_before=standing2.player.rating,
-                        board_number=board_number,
-                    )
-                    pairings.append(pairing)
-                    paired_players.add(standing1.player.id)
-                    paired_players.add(standing2.player.id)
-                    board_number += 1
-                    i += 2
-                else:
-                    # They've played before - add to unpaired
-                    group_unpaired.append(standing1)
-                    i += 1
-                    
-                    # Also add standing2 if we're moving standing1
-                    if i < len(group) and group[i] == standing2:
-                        group_unpaired.append(standing2)
-                        i += 1
-            
-            unpaired_standings.extend(group_unpaired)
-        
-        # Now handle unpaired standings - pair with next score group
-        # Sort unpaired by original score (descending)
-        unpaired_standings.sort(key=lambda s: s.total_score, reverse=True)
-        
-        i = 0
-        while i < len(unpaired_standings):
-            standing1 = unpaired_standings[i]
-            
-            if standing1.player.id in paired_players:
-                i += 1
-                continue
-            
-            # Find someone from lower score group they haven't played
-            found = False
-            for j in range(i + 1, len(unpaired_standings)):
-                standing2 = unpaired_standings[j]
-                
-                if (standing2.player.id not in paired_players and
-                    not SwissPairing._have_played(standing1.player, standing2.player, tournament)):
-                    
-                    pairing = Pairing.objects.create(
-                        round=round_obj,
-                        player_white=standing1.player,
-                        player_black=standing2.player,
-                        white_rating_before=standing1.player.rating,
-                        black_rating_before=standing2.player.rating,
-                        board_number=board_number,
-                    )
-                    pairings.append(pairing)
-                    paired_players.add(standing1.player.id)
-                    paired_players.add(standing2.player.id)
-                    board_number += 1
-                    found = True
-                    break
-            
-            i += 1
-        
-        return pairings
-    
-    @staticmethod
-    def _have_played(player1, player2, tournament):
-        """Check if two players have already played in this tournament"""
-        return Pairing.objects.filter(
-            round__tournament=tournament,
-            player_white__in=[player1, player2],
-            player_black__in=[player1, player2],
-        ).exclude(result='P').exists()
+
+        return [(players[i], players[i + 1]) for i in range(0, len(players) - 1, 2)]
+
+
+class RoundResultsError(ValueError):
+    """Raised when a batch of round results cannot be applied; `errors` lists every problem found."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('; '.join(self.errors))
 
 
 class TournamentResultsProcessor:
     """Process results and update ratings"""
-    
+
+    STANDING_FIELDS = ['total_score', 'wins', 'draws', 'losses', 'rating_change', 'final_rating']
+
     @staticmethod
     def process_pairing_result(pairing, result):
         """
         Process a pairing result and update ratings
         result: 'W', 'B', or 'D'
         """
-        player_white = pairing.player_white
-        player_black = pairing.player_black
-        
-        # Calculate rating changes
-        white_change, black_change = RatingCalculator.process_match(
-            player_white, player_black, result
-        )
-        
-        # Get actual scores
-        if result == 'W':
-            white_score = 1.0
-            black_score = 0.0
-        elif result == 'B':
-            white_score = 0.0
-            black_score = 1.0
-        else:  # Draw
-            white_score = 0.5
-            black_score = 0.5
-        
-        # Update pairing with results
-        pairing.result = result
-        pairing.white_rating_after = player_white.rating + white_change
-        pairing.black_rating_after = player_black.rating + black_change
-        pairing.white_rating_change = white_change
-        pairing.black_rating_change = black_change
-        pairing.save()
-        
-        # Update player ratings
-        player_white.rating = pairing.white_rating_after
-        player_black.rating = pairing.black_rating_after
-        player_white.games_played += 1
-        player_black.games_played += 1
-        
-        # Update peak ratings
-        if player_white.rating > player_white.peak_rating:
-            player_white.peak_rating = player_white.rating
-        if player_black.rating > player_black.peak_rating:
-            player_black.peak_rating = player_black.rating
-        
-        player_white.save()
-        player_black.save()
-        
-        # Update tournament standings
-        TournamentResultsProcessor._update_standing(
-            pairing.round.tournament, player_white, white_score, white_change
-        )
-        TournamentResultsProcessor._update_standing(
-            pairing.round.tournament, player_black, black_score, black_change
-        )
-        
+        TournamentResultsProcessor.apply_results(pairing.round.tournament, [(pairing, result)])
         return pairing
-    
+
     @staticmethod
-    def _update_standing(tournament, player, score, rating_change):
-        """Update a player's standing in the tournament"""
-        standing = TournamentStanding.objects.get(
-            tournament=tournament,
-            player=player
-        )
-        
-        standing.total_score += score
-        standing.rating_change += rating_change
-        standing.final_rating = player.rating
-        
-        if score == 1.0:
-            standing.wins += 1
-        elif score == 0.5:
-            standing.draws += 1
-        else:
-            standing.losses += 1
-        
-        standing.save()
-    
+    def process_round_results(round_obj, results):
+        """Enter many boards of a round at once; `results` maps pairing id -> 'W', 'B' or 'D'.
+
+        Every board is validated before anything is written: unknown pairings,
+        boards that already have a result and invalid results are collected
+        into a RoundResultsError. Returns the updated pairings in board order.
+        """
+        with transaction.atomic():
+            pairings = list(
+                Pairing.objects.select_for_update()
+                .filter(round=round_obj, pk__in=list(results))
+                .order_by('board_number', 'pk')
+            )
+            found = {pairing.pk for pairing in pairings}
+            errors = [f'Pairing {pk} is not part of this round.' for pk in results if pk not in found]
+            for pairing in pairings:
+                if pairing.result != 'P':
+                    errors.append(f'Board {pairing.board_number} already has a result.')
+                elif results[pairing.pk] not in RESULT_SCORES:
+                    errors.append(f'Board {pairing.board_number}: choose 1-0, ½-½ or 0-1.')
+            if errors:
+                raise RoundResultsError(errors)
+            TournamentResultsProcessor.apply_results(
+                round_obj.tournament, [(pairing, results[pairing.pk]) for pairing in pairings]
+            )
+        return pairings
+
+    @staticmethod
+    def apply_results(tournament, boards):
+        """Rate (pairing, result) boards of `tournament` and write everything in one transaction.
+
+        Players are locked in primary-key order so concurrent submissions
+        cannot deadlock, rating changes are computed in memory by the
+        configured rating system, and pairings, players and standings are
+        each written with one bulk update (`bulk_update_fields`). The
+        standings write also carries the tiebreaks of the boards' players and
+        their past opponents, refreshed by `refresh_tiebreaks`. The boards are
+        rated as one rating period; a player is on at most one board of a
+        round, so Elo changes still equal per-board `process_match` calls.
+        """
+        if not boards:
+            return
+        player_ids = sorted({pk for pairing, _ in boards for pk in (pairing.player_white_id, pairing.player_black_id)})
+        with transaction.atomic():
+            players = list(Player.objects.select_for_update().filter(pk__in=player_ids).order_by('pk'))
+            rating_system = get_rating_system()
+            batch = rating_system.process_matches(
+                players,
+                [(pairing.player_white_id, pairing.player_black_id, result) for pairing, result in boards],
+                rating_period=True,
+            )
+            by_id = {player.pk: player for player in players}
+            standings = {
+                standing.player_id: standing
+                for standing in TournamentStanding.objects.select_for_update()
+                .filter(tournament=tournament, player_id__in=player_ids)
+                .order_by('player_id')
+            }
+
+            recorded_at = timezone.now()
+            for pos, (pairing, result) in enumerate(boards):
+                pairing.result = result
+                pairing.recorded_at = recorded_at
+                pairing.white_rating_change = int(batch.white_change[pos])
+                pairing.black_rating_change = int(batch.black_change[pos])
+                pairing.white_rating_after = int(batch.white_rating_after[pos])
+                pairing.black_rating_after = int(batch.black_rating_after[pos])
+                for field in BatchResult.STATE_SNAPSHOT_FIELDS:
+                    setattr(pairing, field, float(getattr(batch, field)[pos]))
+                pairing.player_white = by_id[pairing.player_white_id]
+                pairing.player_black = by_id[pairing.player_black_id]
+
+                white_score, black_score = RESULT_SCORES[result]
+                for player_id, score, change, rating in (
+                    (pairing.player_white_id, white_score, pairing.white_rating_change, pairing.white_rating_after),
+                    (pairing.player_black_id, black_score, pairing.black_rating_change, pairing.black_rating_after),
+                ):
+                    standing = standings[player_id]
+                    standing.total_score += score
+                    standing.rating_change += change
+                    standing.final_rating = rating
+                    if score == 1.0:
+                        standing.wins += 1
+                    elif score == 0.5:
+                        standing.draws += 1
+                    else:
+                        standing.losses += 1
+
+            rating_system.update_players(players, batch)
+
+            bulk_update_fields(
+                [pairing for pairing, _ in boards],
+                ['result', 'white_rating_after', 'black_rating_after', 'white_rating_change', 'black_rating_change', 'recorded_at']
+                + BatchResult.STATE_SNAPSHOT_FIELDS,
+            )
+            bulk_update_fields(players, RATING_STATE_FIELDS)
+            refresh_tiebreaks(tournament, standings, player_ids)
+            bulk_update_fields(standings.values(), TournamentResultsProcessor.STANDING_FIELDS + TIEBREAK_FIELDS)
+            bump_ranking_version()
+        player_index.set_ratings(players)
+
     @staticmethod
     def finalize_tournament(tournament):
         """Mark tournament as finished and finalize all ratings"""
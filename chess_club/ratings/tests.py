@@ -1,3 +1,986 @@
-from django.test import TestCase
+import random
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F, Q
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .checkpoints import create_checkpoint, ranking_as_of
+from .head_to_head import get_head_to_head
+from .ledger import MatchRevertError, record_match, revert_match, revert_matches_back_to
+from . import maintenance
+from .match_import import MatchImportError, import_matches, parse_csv, parse_pgn
+from .models import HeadToHead, Match, Pairing, Player, PlayerMatch, PlayerStats, SiteState, Round, Tournament, TournamentStanding
+from .passcode import PASSCODE_COOKIE, grant_token
+from .player_index import PlayerNameIndex
+from .player_stats import STATS_FIELDS
+from .ranking_cache import bump_ranking_version
+from .rating_calculator import EXPECTED_SCORE_LIMIT, BatchResult, RatingCalculator
+from .rating_systems import Glicko2RatingSystem
+from .swiss_pairing import PairingError, SwissPairing, SwissPlayer, TournamentResultsProcessor
+from .tiebreaks import TIEBREAK_ORDER, compute_tiebreaks, sort_key
+
+
+def record(white, black, result):
+    return record_match(Match(player_white_id=white.pk, player_black_id=black.pk, result=result))
+
+
+def play_board(white, black, result, name='Club Open'):
+    """Pair `white` and `black` in a fresh one-round tournament and enter `result`."""
+    tournament = Tournament.objects.create(name=name, num_rounds=1)
+    for player in (white, black):
+        player.refresh_from_db()
+        TournamentStanding.objects.create(
+            tournament=tournament, player=player, initial_rating=player.rating, final_rating=player.rating,
+        )
+    round_obj = Round.objects.create(tournament=tournament, round_number=1)
+    pairing = Pairing.objects.create(
+        round=round_obj, player_white=white, player_black=black,
+        white_rating_before=white.rating, black_rating_before=black.rating,
+    )
+    TournamentResultsProcessor.process_pairing_result(pairing, result)
+    return pairing
+
+
+def state(player):
+    player.refresh_from_db()
+    return player.rating, player.peak_rating, player.games_played, player.latest_match_id
+
+
+def swiss_player(pk, score, rating, opponents=()):
+    player = SwissPlayer(SimpleNamespace(id=pk, name=f'P{pk}', rating=rating), score)
+    player.opponents.update(opponents)
+    return player
+
+
+class SwissPairingTests(SimpleTestCase):
+    def assertComplete(self, players, pairs, bye):
+        seated = [player.id for pair in pairs for player in pair]
+        self.assertEqual(len(seated), len(set(seated)))
+        self.assertEqual(set(seated) | ({bye.id} if bye else set()), {player.id for player in players})
+        for white, black in pairs:
+            self.assertNotIn(black.id, white.opponents)
+
+    def test_score_groups_pair_within_themselves(self):
+        players = [swiss_player(1, 2, 1900), swiss_player(2, 2, 1800), swiss_player(3, 1, 1700), swiss_player(4, 1, 1600)]
+        pairs, bye = SwissPairing.pair_players(players)
+        self.assertIsNone(bye)
+        self.assertComplete(players, pairs, bye)
+        self.assertEqual({frozenset((white.id, black.id)) for white, black in pairs}, {frozenset((1, 2)), frozenset((3, 4))})
+
+    def test_leftover_bottom_group_repairs_the_whole_field(self):
+        # C and D have met, so the top boards must be dissolved: A-C and B-D (or A-D and B-C)
+        players = [
+            swiss_player(1, 2, 1900), swiss_player(2, 2, 1800),
+            swiss_player(3, 1, 1700, opponents=[4]), swiss_player(4, 1, 1600, opponents=[3]),
+        ]
+        pairs, bye = SwissPairing.pair_players(players)
+        self.assertEqual(len(pairs), 2)
+        self.assertComplete(players, pairs, bye)
+
+    def test_odd_field_gives_one_bye(self):
+        players = [swiss_player(pk, 0, 2000 - pk) for pk in range(1, 8)]
+        pairs, bye = SwissPairing.pair_players(players)
+        self.assertEqual(bye.id, 7)
+        self.assertComplete(players, pairs, bye)
+
+    def test_every_round_is_complete_without_rematches(self):
+        players = [swiss_player(pk, 0, 1000 + 37 * pk % 1500) for pk in range(1, 41)]
+        for round_number in range(7):
+            pairs, bye = SwissPairing.pair_players(players)
+            self.assertComplete(players, pairs, bye)
+            for board, (white, black) in enumerate(pairs):
+                white.opponents.add(black.id)
+                black.opponents.add(white.id)
+                white.colours.append('W')
+                black.colours.append('B')
+                winner = white if (board + round_number) % 3 else black
+                winner.score += 1
+            if bye is not None:
+                bye.byes += 1
+                bye.score += 1
+
+    def test_unpairable_field_raises(self):
+        players = [swiss_player(1, 1, 1800, opponents=[2]), swiss_player(2, 0, 1700, opponents=[1])]
+        with self.assertRaises(PairingError):
+            SwissPairing.pair_players(players)
+
+
+class RevertAcrossTournamentGamesTests(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c = Player.objects.bulk_create(
+            [Player(name='A', rating=1500), Player(name='B', rating=1500), Player(name='C', rating=1500)]
+        )
+
+    def test_revert_refused_after_newer_tournament_game(self):
+        match = record(self.a, self.b, 'W')
+        play_board(self.a, self.c, 'W')
+        before = state(self.a)
+
+        match = Match.objects.select_related('player_white', 'player_black').get(pk=match.pk)
+        with self.assertRaises(MatchRevertError):
+            revert_match(match)
+        with self.assertRaises(MatchRevertError):
+            revert_matches_back_to(match)
+
+        self.assertEqual(state(self.a), before)
+        self.assertFalse(Match.objects.get(pk=match.pk).is_reverted)
+
+    def test_revert_keeps_older_tournament_game(self):
+        play_board(self.a, self.c, 'W')
+        after_tournament = state(self.a)
+        match = record(self.a, self.b, 'W')
+
+        revert_match(Match.objects.select_related('player_white', 'player_black').get(pk=match.pk))
+
+        self.assertEqual(state(self.a)[:3], after_tournament[:3])
+
+
+class RevertChainTests(TestCase):
+    def setUp(self):
+        self.players = Player.objects.bulk_create(
+            [Player(name=name, rating=1400 + 50 * index) for index, name in enumerate('ABCDEF')]
+        )
+        self.a, self.b, self.c, self.d, self.e, self.f = self.players
+        self.initial = {player.pk: state(player) for player in self.players}
+
+    def fetch(self, match):
+        return Match.objects.select_related('player_white', 'player_black').get(pk=match.pk)
+
+    def test_revert_match_restores_snapshot_and_pointer(self):
+        first = record(self.a, self.b, 'W')
+        after_first = state(self.a), state(self.b)
+        second = record(self.a, self.b, 'B')
+
+        self.assertEqual(revert_match(self.fetch(second)), [second])
+        self.assertEqual((state(self.a), state(self.b)), after_first)
+        self.assertEqual(state(self.a)[3], first.pk)
+
+    def test_revert_match_refuses_older_match(self):
+        first = record(self.a, self.b, 'W')
+        record(self.b, self.c, 'D')
+        with self.assertRaises(MatchRevertError):
+            revert_match(self.fetch(first))
+
+    def test_chain_reverts_every_dependent_match(self):
+        target = record(self.a, self.b, 'W')
+        dependents = [record(self.b, self.c, 'B'), record(self.c, self.a, 'D'), record(self.c, self.d, 'W')]
+        unrelated = record(self.e, self.f, 'W')
+        after_unrelated = state(self.e)
+
+        reverted = revert_matches_back_to(self.fetch(target))
+
+        self.assertEqual([match.pk for match in reverted], [match.pk for match in reversed([target] + dependents)])
+        for player in (self.a, self.b, self.c, self.d):
+            self.assertEqual(state(player), self.initial[player.pk])
+            self.assertEqual(PlayerStats.objects.get(player=player).games, 0)
+        self.assertFalse([record for record in HeadToHead.objects.all() if record.games and record.player_low_id != self.e.pk])
+        self.assertEqual(state(self.e), after_unrelated)
+        self.assertFalse(Match.objects.get(pk=unrelated.pk).is_reverted)
+
+    def test_chain_stops_at_each_players_floor(self):
+        older = record(self.c, self.d, 'W')
+        after_older = state(self.c)
+        target = record(self.a, self.b, 'W')
+        newer = record(self.b, self.c, 'D')
+
+        reverted = revert_matches_back_to(self.fetch(target))
+
+        self.assertEqual([match.pk for match in reverted], [newer.pk, target.pk])
+        self.assertEqual(state(self.c), after_older)
+        self.assertFalse(Match.objects.get(pk=older.pk).is_reverted)
+        self.assertEqual(state(self.a), self.initial[self.a.pk])
+
+    def test_chain_refuses_reverted_match(self):
+        match = record(self.a, self.b, 'W')
+        revert_match(self.fetch(match))
+        with self.assertRaises(MatchRevertError):
+            revert_matches_back_to(self.fetch(match))
+
+
+class RatingKernelTests(SimpleTestCase):
+    def test_expected_score_table_matches_formula(self):
+        for diff in range(-EXPECTED_SCORE_LIMIT - 200, EXPECTED_SCORE_LIMIT + 201):
+            for k_factor in (10, 20, 40):
+                for score in (0.0, 0.5, 1.0):
+                    formula = round(k_factor * (score - RatingCalculator.calculate_expected_score(1500, 1500 + diff)))
+                    table = round(k_factor * (score - RatingCalculator.expected_score(1500, 1500 + diff)))
+                    self.assertEqual(table, formula, (diff, k_factor, score))
+
+    def test_batch_kernel_matches_sequential_games(self):
+        rng = random.Random(7)
+        today = date(2026, 1, 1)
+        players = [
+            SimpleNamespace(
+                rating=rng.randint(1000, 2600), peak_rating=2600, games_played=rng.choice([0, 25, 29, 30, 200]),
+                birth_date=today - timedelta(days=rng.randint(10 * 365, 40 * 365)) if rng.random() < 0.5 else None,
+            )
+            for _ in range(40)
+        ]
+        games = [(*rng.sample(range(len(players)), 2), rng.choice('WBD')) for _ in range(2000)]
+
+        batch = RatingCalculator.process_batch(
+            [player.rating for player in players],
+            [player.peak_rating for player in players],
+            [player.games_played for player in players],
+            RatingCalculator.junior_flags([player.birth_date for player in players], today),
+            [white for white, _, _ in games],
+            [black for _, black, _ in games],
+            [result for _, _, result in games],
+        )
+
+        for pos, (white_idx, black_idx, result) in enumerate(games):
+            white, black = players[white_idx], players[black_idx]
+            white_change, black_change = RatingCalculator.process_match(white, black, result, today)
+            self.assertEqual((batch.white_rating_before[pos], batch.black_rating_before[pos]), (white.rating, black.rating))
+            self.assertEqual((batch.white_change[pos], batch.black_change[pos]), (white_change, black_change))
+            white.rating += white_change
+            black.rating += black_change
+            white.games_played += 1
+            black.games_played += 1
+        self.assertTrue(np.array_equal(batch.ratings, [player.rating for player in players]))
+        self.assertTrue(np.array_equal(batch.games, [player.games_played for player in players]))
+
+
+class TiebreakTests(SimpleTestCase):
+    def test_compute_tiebreaks(self):
+        # round 1: 1 beats 2, 3 draws 4; round 2: 1 draws 3, 2 beats 4
+        games = {
+            1: [(1, 2, 1.0), (2, 3, 0.5)],
+            2: [(1, 1, 0.0), (2, 4, 1.0)],
+            3: [(1, 4, 0.5), (2, 1, 0.5)],
+        }
+        scores = {1: 1.5, 2: 1.0, 3: 1.0, 4: 0.5}
+        tiebreaks = compute_tiebreaks(games, scores)
+        self.assertEqual(tiebreaks[1], {
+            'buchholz': 2.0, 'median_buchholz': 2.0, 'sonneborn_berger': 1.5,
+            'progressive_score': 2.5, 'direct_encounter': 0.0,
+        })
+        self.assertEqual(tiebreaks[2]['sonneborn_berger'], 0.5)
+        self.assertEqual(tiebreaks[2]['progressive_score'], 1.0)
+        self.assertEqual(tiebreaks[3]['sonneborn_berger'], 1.0)
+
+    def test_median_buchholz_drops_best_and_worst_from_three_games(self):
+        tiebreaks = compute_tiebreaks({1: [(1, 2, 1.0), (2, 3, 0.0), (3, 4, 0.5)]}, {1: 1.5, 2: 0.0, 3: 2.0, 4: 1.0})
+        self.assertEqual(tiebreaks[1]['buchholz'], 3.0)
+        self.assertEqual(tiebreaks[1]['median_buchholz'], 1.0)
+
+    def test_direct_encounter_counts_opponents_on_the_same_score(self):
+        tiebreaks = compute_tiebreaks({1: [(1, 2, 1.0)], 2: [(1, 1, 0.0), (2, 3, 1.0)]}, {1: 1.0, 2: 1.0, 3: 0.0})
+        self.assertEqual(tiebreaks[1]['direct_encounter'], 1.0)
+        self.assertEqual(tiebreaks[2]['direct_encounter'], 0.0)
+
+    def test_sort_key_orders_by_score_then_tiebreaks_then_wins(self):
+        zero = dict.fromkeys(TIEBREAK_ORDER, 0.0)
+        better_buchholz = dict(zero, buchholz=4.5)
+        better_encounter = dict(zero, direct_encounter=0.5)
+        keys = [
+            sort_key(2.0, 0, zero),
+            sort_key(1.5, 1, better_buchholz),
+            sort_key(1.5, 1, better_encounter),
+            sort_key(1.5, 2, zero),
+        ]
+        self.assertEqual(sorted(keys, reverse=True), [keys[0], keys[2], keys[1], keys[3]])
+
+
+class IncrementalTiebreakTests(TestCase):
+    def test_stored_tiebreaks_match_a_full_recompute(self):
+        players = Player.objects.bulk_create([Player(name=f'T{pk}', rating=1500 + 40 * pk) for pk in range(6)])
+        tournament = Tournament.objects.create(name='Tiebreak Open', num_rounds=3)
+        tournament.players.set(players)
+        TournamentStanding.objects.bulk_create(
+            TournamentStanding(tournament=tournament, player=player, initial_rating=player.rating, final_rating=player.rating)
+            for player in players
+        )
+        rng = random.Random(3)
+        for round_number in range(1, 4):
+            round_obj = Round.objects.create(tournament=tournament, round_number=round_number)
+            pairings = SwissPairing.generate_round_pairings(tournament, round_obj)
+            # enter the boards one at a time and the rest together, like the round and board views do
+            first, rest = pairings[0], pairings[1:]
+            TournamentResultsProcessor.process_pairing_result(Pairing.objects.get(pk=first.pk), rng.choice('WBD'))
+            TournamentResultsProcessor.process_round_results(round_obj, {pairing.pk: rng.choice('WBD') for pairing in rest})
+
+        games = {player.pk: [] for player in players}
+        for round_number, white_id, black_id, result in Pairing.objects.filter(round__tournament=tournament).values_list(
+            'round__round_number', 'player_white_id', 'player_black_id', 'result',
+        ):
+            white_points = {'W': 1.0, 'D': 0.5, 'B': 0.0}[result]
+            games[white_id].append((round_number, black_id, white_points))
+            games[black_id].append((round_number, white_id, 1.0 - white_points))
+        standings = {standing.player_id: standing for standing in TournamentStanding.objects.filter(tournament=tournament)}
+        expected = compute_tiebreaks(games, {pk: standing.total_score for pk, standing in standings.items()})
+        for player_id, standing in standings.items():
+            self.assertEqual({name: getattr(standing, name) for name in TIEBREAK_ORDER}, expected[player_id])
+            self.assertEqual(standing.sort_key, sort_key(standing.total_score, standing.wins, expected[player_id]))
+
+
+class RebuildRatingsTests(TestCase):
+    def rebuild(self, *args):
+        out = StringIO()
+        call_command('rebuild_ratings', *args, stdout=out)
+        return out.getvalue()
+
+    def setUp(self):
+        self.players = Player.objects.bulk_create([Player(name=f'R{pk}', rating=1300 + 60 * pk) for pk in range(5)])
+        rng = random.Random(11)
+        for _ in range(30):
+            white, black = rng.sample(self.players, 2)
+            record(white, black, rng.choice('WBD'))
+
+    def test_untouched_history_reports_no_changes(self):
+        self.assertIn('; 0 match snapshots, 0 tournament games and 0 players would change', self.rebuild('--dry-run'))
+
+    def test_missing_glicko_state_reads_as_the_defaults(self):
+        Match.objects.update(
+            white_deviation_before=None, black_deviation_before=None,
+            white_volatility_before=None, black_volatility_before=None,
+        )
+        self.assertIn('; 0 match snapshots, 0 tournament games and 0 players would change', self.rebuild('--dry-run'))
+
+    def test_legacy_snapshots_keep_games_and_peaks(self):
+        # matches recorded before peak and games snapshots were kept hold the column defaults
+        before = [state(player) for player in self.players]
+        Match.objects.update(
+            white_peak_before=1500, white_peak_after=1500, black_peak_before=1500, black_peak_after=1500,
+            white_games_before=0, white_games_after=0, black_games_before=0, black_games_after=0,
+        )
+        Match.objects.filter(pk__in=Match.objects.order_by('pk').values('pk')[:3]).delete()
+
+        self.assertIn('; 0 match snapshots, 0 tournament games and 0 players would change', self.rebuild('--dry-run'))
+        self.rebuild()
+        self.assertEqual([state(player) for player in self.players], before)
+
+    def test_juniors_keep_the_k_factor_of_their_game_days(self):
+        today = date.today()
+        junior = Player.objects.create(
+            name='Junior', rating=1700, games_played=40, birth_date=today.replace(year=today.year - 18) + timedelta(days=5),
+        )
+        adult = Player.objects.create(name='Adult', rating=1700, games_played=40)
+        for result in 'WDW':
+            record(junior, adult, result)
+
+        class Later(date):
+            @classmethod
+            def today(cls):
+                return today + timedelta(days=30)
+
+        # by the time of the rebuild the junior has turned 18
+        with mock.patch('ratings.rating_calculator.date', Later):
+            self.assertIn('; 0 match snapshots, 0 tournament games and 0 players would change', self.rebuild('--dry-run'))
+
+    def test_tournament_games_are_replayed_in_order(self):
+        white, black = self.players[:2]
+        pairing = play_board(white, black, 'W')
+        for _ in range(4):
+            record(black, white, 'D')
+        before = [state(player) for player in self.players]
+        self.assertIn(
+            'and 1 tournament games; 0 match snapshots, 0 tournament games and 0 players would change',
+            self.rebuild('--dry-run'),
+        )
+
+        Pairing.objects.filter(pk=pairing.pk).update(white_rating_after=1, white_rating_change=-999)
+        TournamentStanding.objects.filter(player=white).update(final_rating=1, rating_change=-999)
+        self.assertIn('; 0 match snapshots, 1 tournament games and 0 players updated', self.rebuild())
+
+        pairing.refresh_from_db()
+        standing = TournamentStanding.objects.get(player=white)
+        self.assertEqual((standing.final_rating, standing.rating_change),
+                         (pairing.white_rating_after, pairing.white_rating_change))
+        self.assertEqual(pairing.white_rating_after - pairing.white_rating_change, pairing.white_rating_before)
+        self.assertEqual([state(player) for player in self.players], before)
+
+
+class MetricsAccessTests(TestCase):
+    def test_without_a_token_the_passcode_is_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 302)
+        self.client.cookies[PASSCODE_COOKIE] = grant_token()
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='scrape')
+    def test_a_token_replaces_the_passcode(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='scrape')
+    def test_only_the_metrics_path_skips_the_passcode(self):
+        response = self.client.get('/metrics-export', HTTP_AUTHORIZATION='Bearer scrape')
+        self.assertRedirects(response, '/passcode/', fetch_redirect_response=False)
+
+
+class RankingPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Player.objects.bulk_create([Player(name=f'C{pk}', rating=1400 + pk) for pk in range(60)])
+        self.client.cookies[PASSCODE_COOKIE] = grant_token()
+
+    def player_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries if 'FROM "ratings_player"' in query['sql']]
+
+    def test_repeat_visits_reuse_the_page_rows(self):
+        for path in ('/players/', '/players/ranking/'):
+            self.assertTrue(self.player_queries(path))
+            self.assertEqual(self.player_queries(path), [])
+
+    def test_rating_changes_refetch_the_page_rows(self):
+        self.player_queries('/players/ranking/')
+        white, black = Player.objects.order_by('pk')[:2]
+        record(white, black, 'W')
+        self.assertTrue(self.player_queries('/players/ranking/'))
+
+
+@override_settings(RATING_SYSTEM='ratings.rating_systems.Glicko2RatingSystem')
+class GlickoRatingPeriodTests(TestCase):
+    def setUp(self):
+        self.players = Player.objects.bulk_create([Player(name=f'G{pk}', rating=1450 + 40 * pk) for pk in range(4)])
+
+    def glicko_state(self, players):
+        return [(player.rating, round(player.rating_deviation, 9), round(player.volatility, 9))
+                for player in Player.objects.filter(pk__in=[player.pk for player in players]).order_by('pk')]
+
+    def test_a_round_is_one_period(self):
+        tournament = Tournament.objects.create(name='Club Open', num_rounds=1)
+        round_obj = Round.objects.create(tournament=tournament, round_number=1)
+        boards = [(self.players[0], self.players[3], 'W'), (self.players[2], self.players[1], 'D')]
+        pairings = []
+        for number, (white, black, _) in enumerate(boards, start=1):
+            TournamentStanding.objects.create(tournament=tournament, player=white, initial_rating=white.rating,
+                                              final_rating=white.rating)
+            TournamentStanding.objects.create(tournament=tournament, player=black, initial_rating=black.rating,
+                                              final_rating=black.rating)
+            pairings.append(Pairing.objects.create(
+                round=round_obj, player_white=white, player_black=black, board_number=number,
+                white_rating_before=white.rating, black_rating_before=black.rating,
+            ))
+        expected = Glicko2RatingSystem().process_matches(
+            self.players, [(white.pk, black.pk, result) for white, black, result in boards], rating_period=True,
+        )
+
+        TournamentResultsProcessor.process_round_results(
+            round_obj, {pairing.pk: result for pairing, (_, _, result) in zip(pairings, boards)},
+        )
+        self.assertEqual(self.glicko_state(self.players), [
+            (int(rating), round(float(deviation), 9), round(float(volatility), 9))
+            for rating, deviation, volatility in zip(expected.ratings, expected.deviations, expected.volatilities)
+        ])
+
+    def test_each_game_of_a_player_is_its_own_period(self):
+        white, first, second = self.players[:3]
+        games = [(white.pk, first.pk, 'W'), (white.pk, second.pk, 'W')]
+        one_period = Glicko2RatingSystem().process_matches([white, first, second], games, rating_period=True)
+        record(white, first, 'W')
+        record(white, second, 'W')
+
+        white.refresh_from_db()
+        self.assertEqual(white.games_played, 2)
+        self.assertNotAlmostEqual(white.rating_deviation, float(one_period.deviations[0]))
+        latest = Match.objects.get(pk=white.latest_match_id)
+        self.assertEqual(latest.white_rating_before, Match.objects.get(pk=latest.white_previous_match_id).white_rating_after)
+
+    def test_rebuild_starts_tournament_players_from_their_first_boards_state(self):
+        # move everyone's Glicko-2 state off the defaults before the surviving history starts
+        Player.objects.update(peak_rating=F('rating'), rating_deviation=120.0, volatility=0.059)
+        play_board(self.players[2], self.players[3], 'W')
+        play_board(self.players[3], self.players[2], 'D', name='Rapid')
+        record(self.players[2], self.players[0], 'B')
+        record(self.players[1], self.players[3], 'W')
+
+        out = StringIO()
+        call_command('rebuild_ratings', '--dry-run', stdout=out)
+        self.assertIn('; 0 match snapshots, 0 tournament games and 0 players would change', out.getvalue())
+
+    def test_rebuild_replays_the_same_periods(self):
+        record(self.players[0], self.players[1], 'D')
+        record(self.players[2], self.players[3], 'B')
+        import_matches([('G0', 'G2', 'W'), ('G1', 'G3', 'D'), ('G0', 'G3', 'B'), ('G2', 'G1', 'W')])
+        play_board(self.players[3], self.players[0], 'W')
+        record(self.players[1], self.players[0], 'W')
+
+        out = StringIO()
+        call_command('rebuild_ratings', '--dry-run', stdout=out)
+        self.assertIn('; 0 match snapshots, 0 tournament games and 0 players would change', out.getvalue())
+
+
+class RankingAsOfTests(TestCase):
+    def setUp(self):
+        self.players = Player.objects.bulk_create([Player(name=f'H{pk}', rating=1500 + 30 * pk) for pk in range(4)])
+        record(self.players[0], self.players[1], 'W')
+        create_checkpoint(force=True)
+
+    def live_ranking(self):
+        """The ranking now, and the moment it was read."""
+        rows = Player.objects.order_by('-rating', 'name', 'id').values_list('pk', 'rating', 'peak_rating', 'games_played')
+        return [(rank, *row) for rank, row in enumerate(rows, start=1)], timezone.now()
+
+    def assertRankingAsOf(self, expected, when):
+        self.assertEqual(
+            [(row.rank, row.pk, row.rating, row.peak_rating, row.games_played) for row in ranking_as_of(when)],
+            expected,
+        )
+
+    def test_reverts_after_the_checkpoint(self):
+        record(self.players[2], self.players[0], 'W')
+        match = record(self.players[1], self.players[2], 'D')
+        revert_match(match)
+        expected, when = self.live_ranking()
+        record(self.players[3], self.players[0], 'B')
+        self.assertRankingAsOf(expected, when)
+
+    def test_rated_tournament_round(self):
+        play_board(self.players[3], self.players[1], 'W')
+        expected, when = self.live_ranking()
+        play_board(self.players[0], self.players[3], 'D', name='Rapid')
+        self.assertRankingAsOf(expected, when)
+
+    def test_players_created_after_the_checkpoint(self):
+        newcomer = Player.objects.create(name='Newcomer', rating=1650)
+        quiet = Player.objects.create(name='Quiet', rating=1450)
+        record(newcomer, self.players[0], 'W')
+        expected, when = self.live_ranking()
+        # the quiet player's first game comes later; a player created later is not ranked yet
+        record(quiet, newcomer, 'W')
+        record(Player.objects.create(name='Later', rating=1900), self.players[1], 'W')
+        self.assertRankingAsOf(expected, when)
+
+
+class RankingPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # ties on rating are broken by name, then id
+        Player.objects.bulk_create([Player(name=f'K{pk:03}', rating=1200 + 5 * (pk // 2)) for pk in range(110)])
+        self.client.cookies[PASSCODE_COOKIE] = grant_token()
+
+    def page(self, **params):
+        response = self.client.get('/players/ranking/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def expected(self):
+        return [
+            (rank, pk) for rank, pk in enumerate(
+                Player.objects.order_by('-rating', 'name', 'id').values_list('pk', flat=True), start=1,
+            )
+        ]
+
+    def rows(self, page):
+        return [(player.rank, player.pk) for player in page]
+
+    def test_next_and_previous_pages(self):
+        first = self.page()
+        self.assertFalse(first.has_previous)
+        second = self.page(after=first.next_cursor)
+        third = self.page(after=second.next_cursor)
+        self.assertFalse(third.has_next)
+        self.assertEqual(self.rows(first) + self.rows(second) + self.rows(third), self.expected())
+
+        back = self.page(before=third.previous_cursor)
+        self.assertEqual(self.rows(back), self.rows(second))
+        self.assertEqual(self.rows(self.page(before=back.previous_cursor)), self.rows(first))
+
+    def test_stale_cursor_recounts_ranks(self):
+        cursor = self.page().next_cursor
+        # a player from further down jumps to the top, pushing page 2 down by one
+        Player.objects.filter(name='K000').update(rating=3000)
+        bump_ranking_version()
+        self.assertEqual(self.rows(self.page(after=cursor)), self.expected()[51:101])
+
+    def test_tampered_cursor_falls_back_to_the_first_page(self):
+        cursor = self.page().next_cursor
+        for bad in (cursor[:-2] + 'xx', 'not-a-cursor'):
+            self.assertEqual(self.rows(self.page(after=bad)), self.expected()[:50])
+
+
+class MatchHistoryTests(TestCase):
+    def setUp(self):
+        self.players = Player.objects.bulk_create([Player(name=f'M{pk}', rating=1500) for pk in range(3)])
+        self.client.cookies[PASSCODE_COOKIE] = grant_token()
+        self.day = timezone.localdate() - timedelta(days=3)
+
+    def played_at(self, match, when):
+        Match.objects.filter(pk=match.pk).update(created_at=when)
+
+    def history(self, **params):
+        pks = []
+        page = None
+        while page is None or page.has_next:
+            if page is not None:
+                params['after'] = page.next_cursor
+            response = self.client.get('/matches/history/', params)
+            self.assertEqual(response.status_code, 200)
+            page = response.context['page_obj']
+            pks += [match.pk for match in page]
+        return pks
+
+    def test_pages_through_one_players_matches(self):
+        rng = random.Random(5)
+        start = timezone.make_aware(datetime.combine(self.day, time(9)))
+        for minute in range(60):
+            white, black = rng.sample(self.players, 2)
+            # several games share a timestamp, so the id breaks the tie
+            self.played_at(record(white, black, 'D'), start + timedelta(minutes=minute // 3))
+        player = self.players[0]
+        expected = list(
+            Match.objects.filter(Q(player_white=player) | Q(player_black=player))
+            .order_by('-created_at', '-id').values_list('pk', flat=True)
+        )
+        self.assertGreater(len(expected), 25)
+        self.assertEqual(self.history(player=player.pk), expected)
+
+    def test_date_to_includes_the_whole_day(self):
+        white, black = self.players[:2]
+        late = record(white, black, 'W')
+        self.played_at(late, timezone.make_aware(datetime.combine(self.day, time(23, 59, 30))))
+        next_day = record(white, black, 'B')
+        self.played_at(next_day, timezone.make_aware(datetime.combine(self.day + timedelta(days=1), time(0, 0, 10))))
+        early = record(white, black, 'D')
+        self.played_at(early, timezone.make_aware(datetime.combine(self.day, time(0, 0))))
+
+        self.assertEqual(self.history(date_to=self.day.isoformat()), [late.pk, early.pk])
+        self.assertEqual(self.history(date_from=self.day.isoformat(), date_to=self.day.isoformat()), [late.pk, early.pk])
+        self.assertEqual(self.history(date_from=(self.day + timedelta(days=1)).isoformat()), [next_day.pk])
+
+
+class PlayerNameIndexTests(TestCase):
+    def setUp(self):
+        self.players = {
+            name: Player.objects.create(name=name, rating=rating)
+            for name, rating in (('Ama Mensah', 1500), ('Kofi Adamah', 1600), ('Yaw Asante', 1550), ('Esi Ama', 1400))
+        }
+        self.index = PlayerNameIndex()
+
+    def names(self, query, limit=8):
+        return [row['name'] for row in self.index.search(query, limit=limit)]
+
+    def test_prefix_matches_come_before_infix_matches(self):
+        self.assertEqual(self.names('ama'), ['Ama Mensah', 'Esi Ama', 'Kofi Adamah'])
+        self.assertEqual(self.names('AMA', limit=2), ['Ama Mensah', 'Esi Ama'])
+
+    def test_short_queries_only_match_prefixes(self):
+        self.assertEqual(self.names('a'), ['Ama Mensah'])
+        self.assertEqual(self.names('am'), ['Ama Mensah'])
+        self.assertEqual(self.names('q'), [])
+
+    def test_in_place_updates(self):
+        self.names('a')  # builds the index
+        kofi = self.players['Kofi Adamah']
+        kofi.name, kofi.rating = 'Kofi Boateng', 1700
+        Player.objects.filter(pk=kofi.pk).update(name=kofi.name, rating=kofi.rating)
+        self.index.upsert(kofi)
+        newcomer = Player.objects.create(name='Abena Osei', rating=1450)
+        self.index.upsert(newcomer)
+        self.index.remove(self.players['Esi Ama'].pk)
+        yaw = self.players['Yaw Asante']
+        yaw.rating = 1575
+        self.index.set_ratings([yaw])
+
+        self.assertEqual(self.names('ama'), ['Ama Mensah'])
+        self.assertEqual(self.index.search('boat'), [{'id': kofi.pk, 'name': 'Kofi Boateng', 'rating': 1700}])
+        self.assertEqual(self.names('a'), ['Abena Osei', 'Ama Mensah'])
+        self.assertEqual(self.index.search('yaw'), [{'id': yaw.pk, 'name': 'Yaw Asante', 'rating': 1575}])
+        self.assertEqual(
+            [row['name'] for row in self.index.choices()], ['Abena Osei', 'Ama Mensah', 'Kofi Boateng', 'Yaw Asante'],
+        )
+
+    @override_settings(PLAYER_INDEX_MAX_AGE=60)
+    def test_rebuilt_after_max_age(self):
+        with mock.patch('ratings.player_index.time.monotonic', return_value=1000.0) as monotonic:
+            self.names('a')
+            # added by another worker, so this process's index doesn't know yet
+            Player.objects.create(name='Akosua Darko', rating=1500)
+            monotonic.return_value = 1059.0
+            self.assertEqual(self.names('ak'), [])
+            monotonic.return_value = 1061.0
+            self.assertEqual(self.names('ak'), ['Akosua Darko'])
+
+
+class MatchImportParsingTests(SimpleTestCase):
+    def test_csv_headers_are_matched_loosely(self):
+        text = ' White ,BLACK,Event,result\nAma,Kofi,Club,1-0\n,,,\nYaw,Esi,Club,½-½\nKofi,Yaw,Club,b\n'
+        self.assertEqual(parse_csv(text), [('Ama', 'Kofi', 'W'), ('Yaw', 'Esi', 'D'), ('Kofi', 'Yaw', 'B')])
+
+    def test_csv_missing_columns(self):
+        with self.assertRaises(MatchImportError) as caught:
+            parse_csv('white,outcome\nAma,1-0\n')
+        self.assertEqual(caught.exception.errors, ['CSV is missing column(s): black, result'])
+
+    def test_csv_collects_every_bad_row(self):
+        with self.assertRaises(MatchImportError) as caught:
+            parse_csv('white,black,result\nAma,Kofi,1-0\nAma,,1-0\nYaw,Esi,2-0\n')
+        self.assertEqual([error.split(':')[0] for error in caught.exception.errors], ['Line 3', 'Line 4'])
+
+    def test_pgn_games(self):
+        text = (
+            '[Event "Club"]\n[White "Esi"]\n[Black "Kofi \\"KK\\" Mensah"]\n[Result "1-0"]\n\n1. e4 e5 1-0\n\n'
+            # no movetext: the repeated White tag starts the next game
+            '[White "Kofi"]\n[Black "Ama"]\n[Result "1/2-1/2"]\n'
+            '[White "Ama"]\n[Black "Yaw"]\n[Result "0-1"]\n'
+        )
+        self.assertEqual(parse_pgn(text), [('Esi', 'Kofi "KK" Mensah', 'W'), ('Kofi', 'Ama', 'D'), ('Ama', 'Yaw', 'B')])
+
+    def test_pgn_unfinished_games(self):
+        text = '[White "Esi"]\n[Black "Kofi"]\n[Result "*"]\n\n1. e4 *\n\n[White "Ama"]\n[Result "1-0"]\n'
+        with self.assertRaises(MatchImportError) as caught:
+            parse_pgn(text)
+        self.assertEqual([error.split(':')[0] for error in caught.exception.errors], ['Game 1', 'Game 2'])
+
+
+class MatchImportTests(TestCase):
+    def setUp(self):
+        for name, rating in (('Ama', 1500), ('Kofi', 1620), ('Yaw', 1480), ('Esi', 1710)):
+            Player.objects.create(name=name, rating=rating)
+
+    def snapshot(self):
+        return (
+            list(Player.objects.order_by('pk').values_list('rating', 'peak_rating', 'games_played', 'latest_match_id')),
+            Match.objects.count(), PlayerStats.objects.count(), HeadToHead.objects.count(),
+        )
+
+    def test_every_name_problem_is_reported_and_nothing_is_written(self):
+        Player.objects.create(name='Yaw', rating=1400)
+        before = self.snapshot()
+        with self.assertRaises(MatchImportError) as caught:
+            import_matches([('Ama', 'Kofi', 'W'), ('Ama', 'Nobody', 'D'), ('Esi', 'Esi', 'W'), ('Yaw', 'Ama', 'B')])
+        self.assertEqual(caught.exception.errors, [
+            'Unknown player: Nobody',
+            'Ambiguous player name (more than one player is called "Yaw")',
+            'Row 3: a player cannot play themselves (Esi)',
+        ])
+        self.assertEqual(self.snapshot(), before)
+
+    def test_a_failed_write_rolls_back_the_whole_import(self):
+        before = self.snapshot()
+        with mock.patch('ratings.match_import.record_head_to_head', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                import_matches([('Ama', 'Kofi', 'W'), ('Yaw', 'Esi', 'D')])
+        self.assertEqual(self.snapshot(), before)
+
+    def test_ratings_equal_entering_the_games_one_at_a_time(self):
+        rows = [('Ama', 'Kofi', 'W'), ('Yaw', 'Esi', 'D'), ('Kofi', 'Yaw', 'B'), ('Esi', 'Ama', 'W'), ('Ama', 'Yaw', 'D')]
+        twins = {
+            player.name: Player.objects.create(name=f'{player.name} (twin)', rating=player.rating)
+            for player in Player.objects.order_by('pk')
+        }
+        imported = import_matches(rows)
+        recorded = [record(twins[white], twins[black], result) for white, black, result in rows]
+
+        fields = BatchResult.SNAPSHOT_FIELDS
+        self.assertEqual(
+            [[getattr(match, field) for field in fields] for match in imported],
+            [[getattr(match, field) for field in fields] for match in recorded],
+        )
+        for name, twin in twins.items():
+            self.assertEqual(state(Player.objects.get(name=name))[:3], state(twin)[:3])
+
+
+class PurgeExpiredMatchesTests(TestCase):
+    def setUp(self):
+        self.players = Player.objects.bulk_create([Player(name=f'P{pk}', rating=1500 + 20 * pk) for pk in range(4)])
+        rng = random.Random(9)
+        matches = [record(*rng.sample(self.players, 2), rng.choice('WBD')) for _ in range(12)]
+        revert_match(matches[-1])
+        # the first seven games, one of them later reverted, fall out of the retention window
+        old = [match.pk for match in matches[:7]]
+        long_ago = timezone.now() - timedelta(days=40)
+        Match.objects.filter(pk__in=old).update(created_at=long_ago)
+        PlayerMatch.objects.filter(match_id__in=old).update(created_at=long_ago)
+        revert_matches_back_to(matches[6])
+        self.expired = {}
+        for player_id in PlayerMatch.objects.filter(match_id__in=old, is_reverted=False).values_list('player_id', flat=True):
+            self.expired[player_id] = self.expired.get(player_id, 0) + 1
+
+    def totals(self):
+        stats = {stats.player_id: stats.games for stats in PlayerStats.objects.all()}
+        return stats, list(HeadToHead.objects.order_by('pk').values_list(
+            'player_low_id', 'player_high_id', 'low_wins', 'draws', 'high_wins', 'low_rating_change', 'high_rating_change',
+        ))
+
+    def test_batched_purge_keeps_lifetime_totals(self):
+        before = self.totals()
+        self.assertEqual(maintenance.purge_expired_matches(batch_size=2), 7)
+
+        self.assertFalse(Match.objects.filter(created_at__lt=Match.retention_cutoff()).exists())
+        self.assertEqual(self.totals(), before)
+        for stats in PlayerStats.objects.all():
+            self.assertEqual(stats.purged_games, self.expired.get(stats.player_id, 0))
+            surviving = PlayerMatch.objects.filter(player_id=stats.player_id, is_reverted=False).count()
+            self.assertEqual(stats.games - stats.purged_games, surviving)
+        out = StringIO()
+        call_command('rebuild_player_stats', '--verify', stdout=out)
+        self.assertIn('0 players and 0 timeline streaks differ', out.getvalue())
+
+    @override_settings(MATCH_PURGE_INTERVAL=60 * 60)
+    def test_one_purge_per_interval_across_workers(self):
+        with mock.patch.object(maintenance, '_last_purge_check', None):
+            self.assertEqual(maintenance.purge_expired_matches_if_due(), 7)
+        # another worker, which hasn't looked at the claim yet, finds it already taken
+        with mock.patch.object(maintenance, '_last_purge_check', None):
+            self.assertIsNone(maintenance.purge_expired_matches_if_due())
+
+        SiteState.objects.filter(key=maintenance.PURGE_STATE_KEY).update(updated_at=timezone.now() - timedelta(hours=2))
+        with mock.patch.object(maintenance, '_last_purge_check', None):
+            self.assertEqual(maintenance.purge_expired_matches_if_due(), 0)
+
+
+class TournamentDeleteTests(TestCase):
+    def setUp(self):
+        self.client.cookies[PASSCODE_COOKIE] = grant_token()
+        self.white, self.black = Player.objects.bulk_create([Player(name='D1', rating=1500), Player(name='D2', rating=1600)])
+
+    def test_tournaments_with_rated_games_are_kept(self):
+        pairing = play_board(self.white, self.black, 'W')
+        response = self.client.post(f'/tournaments/{pairing.round.tournament_id}/delete/')
+        self.assertRedirects(response, '/tournaments/', fetch_redirect_response=False)
+        self.assertTrue(Tournament.objects.filter(pk=pairing.round.tournament_id).exists())
+        self.assertNotContains(self.client.get('/tournaments/'), f'/tournaments/{pairing.round.tournament_id}/delete/')
+
+    def test_unplayed_tournaments_can_be_deleted(self):
+        tournament = Tournament.objects.create(name='Blitz', num_rounds=3)
+        Pairing.objects.create(
+            round=Round.objects.create(tournament=tournament, round_number=1), player_white=self.white,
+            player_black=self.black, white_rating_before=1500, black_rating_before=1600,
+        )
+        self.assertContains(self.client.get('/tournaments/'), f'/tournaments/{tournament.pk}/delete/')
+        self.client.post(f'/tournaments/{tournament.pk}/delete/')
+        self.assertFalse(Tournament.objects.filter(pk=tournament.pk).exists())
+
+
+class HeadToHeadTests(TestCase):
+    def setUp(self):
+        self.low, self.high, self.third = Player.objects.bulk_create(
+            [Player(name=f'T{pk}', rating=1500 + 50 * pk) for pk in range(3)],
+        )
+
+    def row(self, a, b):
+        """The pair's stored totals, or None when it has no row."""
+        return HeadToHead.objects.filter(player_low=min(a.pk, b.pk), player_high=max(a.pk, b.pk)).values_list(
+            'low_wins', 'draws', 'high_wins', 'low_rating_change', 'high_rating_change',
+        ).first()
+
+    def test_the_pair_is_oriented_by_id_whoever_has_white(self):
+        first = record(self.low, self.high, 'W')
+        second = record(self.high, self.low, 'W')
+        third = record(self.high, self.low, 'D')
+        self.assertEqual(self.row(self.high, self.low), (
+            1, 1, 1,
+            first.white_rating_change + second.black_rating_change + third.black_rating_change,
+            first.black_rating_change + second.white_rating_change + third.white_rating_change,
+        ))
+        self.assertEqual(HeadToHead.objects.count(), 1)
+
+        record_for_high, _ = get_head_to_head(self.high, self.low)
+        self.assertEqual(
+            (record_for_high['wins'], record_for_high['draws'], record_for_high['losses'], record_for_high['games']),
+            (1, 1, 1, 3),
+        )
+
+    def test_a_revert_takes_the_game_back_out(self):
+        first = record(self.high, self.low, 'B')
+        after_first = self.row(self.low, self.high)
+        self.assertEqual(after_first, (1, 0, 0, first.black_rating_change, first.white_rating_change))
+        revert_match(record(self.low, self.high, 'D'))
+        self.assertEqual(self.row(self.low, self.high), after_first)
+
+    def test_a_chain_revert_takes_every_game_back_out(self):
+        start = record(self.low, self.third, 'W')
+        record(self.high, self.low, 'W')
+        record(self.third, self.high, 'B')
+        record(self.low, self.high, 'D')
+        revert_matches_back_to(start)
+        for a, b in ((self.low, self.high), (self.low, self.third), (self.high, self.third)):
+            self.assertIn(self.row(a, b), (None, (0, 0, 0, 0, 0)))
+
+
+class PlayerStatsRevertTests(TestCase):
+    def setUp(self):
+        self.hero, self.rival, self.other = Player.objects.bulk_create(
+            [Player(name=f'S{pk}', rating=1500 + 40 * pk) for pk in range(3)],
+        )
+
+    def stats(self):
+        return list(PlayerStats.objects.order_by('player_id').values_list(*['player_id'] + STATS_FIELDS))
+
+    def verify(self):
+        out = StringIO()
+        call_command('rebuild_player_stats', '--verify', stdout=out)
+        return out.getvalue()
+
+    def test_a_revert_restores_the_stats_exactly(self):
+        record(self.hero, self.rival, 'W')
+        record(self.other, self.hero, 'B')
+        before = self.stats()
+        self.assertEqual(PlayerStats.objects.get(player=self.hero).streak, 2)
+
+        revert_match(record(self.rival, self.hero, 'W'))
+        self.assertEqual(self.stats(), before)
+
+        record(self.hero, self.other, 'D')
+        self.assertEqual(PlayerStats.objects.get(player=self.hero).streak, 0)
+        self.assertIn('0 players and 0 timeline streaks differ', self.verify())
+
+    def test_a_chain_revert_restores_the_streak_before_its_oldest_game(self):
+        record(self.rival, self.hero, 'W')
+        record(self.other, self.hero, 'W')
+        before = self.stats()
+        self.assertEqual(PlayerStats.objects.get(player=self.hero).streak, -2)
+
+        start = record(self.hero, self.rival, 'W')
+        record(self.hero, self.other, 'W')
+        record(self.rival, self.hero, 'B')
+        revert_matches_back_to(start)
+        self.assertEqual(self.stats(), before)
+
+        record(self.hero, self.other, 'B')
+        self.assertEqual(PlayerStats.objects.get(player=self.hero).streak, -3)
+        self.assertIn('0 players and 0 timeline streaks differ', self.verify())
+
+
+class PasscodeTests(TestCase):
+    def test_entering_the_passcode_grants_access(self):
+        self.assertRedirects(self.client.get('/players/'), '/passcode/', fetch_redirect_response=False)
+        self.assertContains(self.client.post('/passcode/', {'passcode': 'wrong'}), 'Incorrect passcode')
+        with override_settings(PASSCODE='open sesame'):
+            response = self.client.post('/passcode/', {'passcode': 'open sesame'})
+        self.assertTrue(response.cookies[PASSCODE_COOKIE]['httponly'])
+        self.assertEqual(self.client.get('/players/').status_code, 200)
+
+    @override_settings(PASSCODE_MAX_AGE=60)
+    def test_expired_grants_are_dropped(self):
+        with mock.patch('django.core.signing.time.time', return_value=1_000_000.0):
+            self.client.cookies[PASSCODE_COOKIE] = grant_token()
+        with mock.patch('django.core.signing.time.time', return_value=1_000_059.0):
+            self.assertEqual(self.client.get('/players/').status_code, 200)
+        with mock.patch('django.core.signing.time.time', return_value=1_000_061.0):
+            response = self.client.get('/players/')
+        self.assertRedirects(response, '/passcode/', fetch_redirect_response=False)
+        self.assertEqual(response.cookies[PASSCODE_COOKIE].value, '')
+
+    def test_tampered_grants_are_dropped(self):
+        token = grant_token()
+        for tampered in (token[:-1] + ('A' if token[-1] != 'A' else 'B'), 'granted', 'x:y:z'):
+            self.client.cookies[PASSCODE_COOKIE] = tampered
+            response = self.client.get('/players/')
+            self.assertRedirects(response, '/passcode/', fetch_redirect_response=False)
+            self.assertEqual(response.cookies[PASSCODE_COOKIE].value, '')
+
+    def test_logout_deletes_the_cookie_but_copies_stay_valid(self):
+        token = grant_token()
+        self.client.cookies[PASSCODE_COOKIE] = token
+        response = self.client.get('/logout/')
+        self.assertRedirects(response, '/passcode/', fetch_redirect_response=False)
+        self.assertEqual(response.cookies[PASSCODE_COOKIE].value, '')
+        self.assertRedirects(self.client.get('/players/'), '/passcode/', fetch_redirect_response=False)
+        # the grant is not tracked on the server, so a copy still works until it expires
+        self.client.cookies[PASSCODE_COOKIE] = token
+        self.assertEqual(self.client.get('/players/').status_code, 200)
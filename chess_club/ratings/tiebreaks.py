@@ -0,0 +1,105 @@
+from django.db.models import Q
+
+from .models import Pairing, TournamentStanding
+from .rating_calculator import RESULT_WHITE_SCORES
+
+
+# Standings sort on these, best first, after the total score; wins settle anything left.
+TIEBREAK_ORDER = ['direct_encounter', 'buchholz', 'median_buchholz', 'sonneborn_berger', 'progressive_score']
+TIEBREAK_FIELDS = TIEBREAK_ORDER + ['sort_key']
+
+# every tiebreak is a multiple of a quarter point, so scaled by 4 each one is a whole number
+SORT_KEY_SCALE = 4
+SORT_KEY_WIDTH = 7
+
+
+def sort_key(total_score, wins, tiebreaks):
+    """Fixed-width string that sorts like (total_score, *tiebreaks in TIEBREAK_ORDER, wins)."""
+    values = [total_score] + [tiebreaks[name] for name in TIEBREAK_ORDER] + [wins]
+    return ''.join(f'{round(value * SORT_KEY_SCALE):0{SORT_KEY_WIDTH}d}' for value in values)
+
+
+def compute_tiebreaks(games, scores):
+    """Tiebreaks for every player in `games`.
+
+    `games` maps a player id to their finished games as (round_number,
+    opponent_id, points) tuples and `scores` gives the current total score of
+    each of those players and of all their opponents. Byes score nothing and
+    do not count as games.
+
+    - Buchholz: sum of the opponents' scores.
+    - Median-Buchholz: Buchholz without the best and worst opponent, from three games on.
+    - Sonneborn-Berger: each opponent's score times the points taken from them.
+    - Progressive score: sum of the running score after each round up to the last one played.
+    - Direct encounter: points taken from opponents now on the same score.
+    """
+    tiebreaks = {}
+    for player_id, played in games.items():
+        opponent_scores = sorted(scores[opponent_id] for _, opponent_id, _ in played)
+        median = opponent_scores[1:-1] if len(opponent_scores) >= 3 else opponent_scores
+
+        by_round = {}
+        for round_number, _, points in played:
+            by_round[round_number] = by_round.get(round_number, 0.0) + points
+        running = progressive = 0.0
+        for round_number in range(1, max(by_round, default=0) + 1):
+            running += by_round.get(round_number, 0.0)
+            progressive += running
+
+        tiebreaks[player_id] = {
+            'buchholz': sum(opponent_scores),
+            'median_buchholz': sum(median),
+            'sonneborn_berger': sum(points * scores[opponent_id] for _, opponent_id, points in played),
+            'progressive_score': progressive,
+            'direct_encounter': sum(
+                points for _, opponent_id, points in played if scores[opponent_id] == scores[player_id]
+            ),
+        }
+    return tiebreaks
+
+
+def refresh_tiebreaks(tournament, standings, changed_ids):
+    """Recompute the tiebreaks touched by new results for `changed_ids`.
+
+    `standings` maps player id to the (locked, already updated) standings of
+    the changed players. Only the changed players and their past opponents
+    can see a tiebreak move, so just their standings are loaded (locked)
+    and recomputed; they are added to `standings`, ready for one bulk write.
+    """
+    changed_ids = list(changed_ids)
+    finished = Pairing.objects.filter(round__tournament=tournament).exclude(result='P')
+    affected = set(changed_ids)
+    for white_id, black_id in finished.filter(
+        Q(player_white_id__in=changed_ids) | Q(player_black_id__in=changed_ids)
+    ).values_list('player_white_id', 'player_black_id'):
+        affected.update((white_id, black_id))
+
+    games = {player_id: [] for player_id in affected}
+    for round_number, white_id, black_id, result in finished.filter(
+        Q(player_white_id__in=affected) | Q(player_black_id__in=affected)
+    ).values_list('round__round_number', 'player_white_id', 'player_black_id', 'result'):
+        white_points = RESULT_WHITE_SCORES[result]
+        if white_id in games:
+            games[white_id].append((round_number, black_id, white_points))
+        if black_id in games:
+            games[black_id].append((round_number, white_id, 1.0 - white_points))
+
+    standings.update(
+        (standing.player_id, standing)
+        for standing in TournamentStanding.objects.select_for_update()
+        .filter(tournament=tournament, player_id__in=sorted(affected - standings.keys()))
+        .order_by('player_id')
+    )
+    scores = {player_id: standing.total_score for player_id, standing in standings.items()}
+    opponents = {opponent_id for played in games.values() for _, opponent_id, _ in played} - scores.keys()
+    scores.update(
+        TournamentStanding.objects.filter(tournament=tournament, player_id__in=opponents)
+        .values_list('player_id', 'total_score')
+    )
+
+    for player_id, values in compute_tiebreaks(games, scores).items():
+        standing = standings[player_id]
+        for name, value in values.items():
+            setattr(standing, name, value)
+        standing.sort_key = sort_key(standing.total_score, standing.wins, values)
+    return standings
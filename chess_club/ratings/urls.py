@@ -6,16 +6,33 @@ urlpatterns = [
     # Players
     path('players/', views.PlayerListView.as_view(), name='player_list'),
     path('players/suggestions/', views.PlayerSearchSuggestionsView.as_view(), name='player_search_suggestions'),
+    path('players/lookup/', views.PlayerLookupView.as_view(), name='player_lookup'),
     path('players/add/', views.PlayerCreateView.as_view(), name='player_create'),
     path('players/<int:pk>/', views.PlayerDetailView.as_view(), name='player_detail'),
+    path('players/<int:pk>/rating-history/', views.PlayerRatingHistoryView.as_view(), name='player_rating_history'),
+    path('players/<int:pk>/vs/<int:opponent_pk>/', views.HeadToHeadView.as_view(), name='head_to_head'),
     path('players/<int:pk>/edit/', views.PlayerUpdateView.as_view(), name='player_update'),
     path('players/<int:pk>/delete/', views.PlayerDeleteView.as_view(), name='player_delete'),
     # Matches and ranking
     path('matches/add/', views.MatchCreateView.as_view(), name='match_create'),
+    path('matches/import/', views.MatchImportView.as_view(), name='match_import'),
     path('matches/history/', views.MatchHistoryView.as_view(), name='match_history'),
     path('matches/<int:pk>/revert/', views.MatchRevertView.as_view(), name='match_revert'),
+    path('matches/<int:pk>/revert-to/', views.MatchRevertChainView.as_view(), name='match_revert_chain'),
     path('players/ranking/', views.PlayerRankingView.as_view(), name='player_ranking'),
     path('players/ranking/pdf/', views.PlayerRankingPDFView.as_view(), name='player_ranking_pdf'),
+    # Tournaments
+    path('tournaments/', views.TournamentListView.as_view(), name='tournament_list'),
+    path('tournaments/add/', views.TournamentCreateView.as_view(), name='tournament_create'),
+    path('tournaments/<int:pk>/', views.TournamentDetailView.as_view(), name='tournament_detail'),
+    path('tournaments/<int:pk>/standings/', views.TournamentStandingsView.as_view(), name='tournament_standings'),
+    path('tournaments/<int:pk>/delete/', views.TournamentDeleteView.as_view(), name='delete_tournament'),
+    path('tournaments/<int:pk>/rounds/generate/', views.GenerateRoundView.as_view(), name='generate_round'),
+    path('tournaments/<int:tournament_pk>/rounds/<int:pk>/', views.RoundDetailView.as_view(), name='round_detail'),
+    path('rounds/<int:pk>/results/', views.SubmitRoundResultsView.as_view(), name='submit_round_results'),
+    path('rounds/<int:pk>/complete/', views.CompleteRoundView.as_view(), name='complete_round'),
+    path('pairings/<int:pk>/result/', views.SubmitPairingResultView.as_view(), name='submit_pairing_result'),
     path('passcode/', views.PasscodeView.as_view(), name='passcode'),
     path('logout/', views.logout_view, name='logout'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
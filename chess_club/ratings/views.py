@@ -1,35 +1,92 @@
+from datetime import date, datetime, time as datetime_time, timedelta
+
 from django.shortcuts import redirect, get_object_or_404
-from django.views.generic import ListView, CreateView, DetailView, UpdateView, DeleteView, View
+from django.views.generic import ListView, CreateView, DetailView, UpdateView, DeleteView, View, FormView
+from django.views.generic.list import MultipleObjectMixin
 from django.urls import reverse_lazy
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Prefetch
 from django.contrib import messages
+from django.utils.crypto import constant_time_compare
 from django.utils.http import urlencode
 from django.contrib.auth import logout
-from .models import Player, Match
-from .forms import PlayerForm, MatchForm
-from .rating_calculator import RatingCalculator
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from django.core.cache import cache
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .models import Player, Match, PlayerMatch, Tournament, Round, Pairing, TournamentStanding
+from .forms import PlayerForm, MatchForm, MatchImportForm, TournamentForm
+from .match_import import MatchImportError, import_matches, parse_matches
+from .maintenance import purge_expired_matches_if_due
+from .metrics import registry as metrics_registry
+from .checkpoints import create_checkpoint_if_due, ranking_as_of
+from .head_to_head import get_head_to_head
+from .ledger import MatchRevertError, record_match, revert_match, revert_matches_back_to
+from .pagination import KeysetPaginationMixin
+from .passcode import grant_access, revoke_access
+from .player_index import player_index
+from .ranking_pdf import get_ranking_pdf
+from .rating_history import get_rating_history
+from .swiss_pairing import RoundResultsError, SwissPairing, TournamentResultsProcessor
+from .ranking_cache import bump_ranking_version, get_ranking_version, ranking_etag, ranking_last_modified
 from django.shortcuts import render
 from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse
 
 
-class PlayerListView(ListView):
+# Ranking pages answer repeat visits with 304s until a rating changes; browsers must revalidate.
+ranking_conditional_get = [
+    cache_control(private=True, no_cache=True),
+    condition(etag_func=ranking_etag, last_modified_func=ranking_last_modified),
+]
+
+
+class RankingVersionMixin:
+    """Expose the ranking version so templates can cache rendered rows under it."""
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['ranking_version'] = get_ranking_version(self.request)[0]
+        context['ranking_cache_timeout'] = getattr(settings, 'RANKING_CACHE_TIMEOUT', 24 * 60 * 60)
+        return context
+
+
+class RankedPlayerPaginationMixin(KeysetPaginationMixin):
+    """Page players by (-rating, name, id) with each row's rank computed by the database."""
+
+    keyset_ordering = ('-rating', 'name', 'id')
+    keyset_rank = True
+    paginate_by = 50
+
+    def get_keyset_version(self):
+        return get_ranking_version(self.request)[0]
+
+    def paginate_queryset(self, queryset, page_size):
+        # a page's rows only change with the ranking version, so they are cached under it with the query string
+        key = f'ranked_page:{type(self).__name__}:{ranking_etag(self.request)}'
+        page = cache.get(key)
+        if page is None:
+            _, page, _, _ = super().paginate_queryset(queryset, page_size)
+            cache.set(key, page, getattr(settings, 'RANKING_CACHE_TIMEOUT', 24 * 60 * 60))
+        return (None, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page_cursor'] = self.request.GET.get('after') or self.request.GET.get('before', '')
+        return context
+
+
+@method_decorator(ranking_conditional_get, name='dispatch')
+class PlayerListView(RankedPlayerPaginationMixin, RankingVersionMixin, ListView):
     model = Player
     template_name = 'ratings/player_list.html'
     context_object_name = 'players'
 
     def get_queryset(self):
-        queryset = Player.objects.all().order_by('-rating', 'name')
+        queryset = Player.objects.select_related('stats')
         self.search_query = self.request.GET.get('q', '').strip()
 
         if self.search_query:
@@ -49,12 +106,18 @@ class PlayerSearchSuggestionsView(View):
         if not query:
             return JsonResponse({'results': []})
 
-        suggestions = list(
-            Player.objects.filter(name__icontains=query)
-            .order_by('name')
-            .values('id', 'name', 'rating')[:8]
-        )
-        return JsonResponse({'results': suggestions})
+        return JsonResponse({'results': player_index.search(query, limit=8)})
+
+
+class PlayerLookupView(View):
+    """Resolve `?ids=1,2` to {'id', 'name', 'rating'} dicts, for pickers showing a preselected player."""
+
+    max_ids = 20
+
+    def get(self, request):
+        ids = [value for value in request.GET.get('ids', '').split(',') if value.strip().isdigit()]
+        players = Player.objects.filter(pk__in=ids[:self.max_ids]).order_by().values('id', 'name', 'rating')
+        return JsonResponse({'results': list(players)})
 
 
 class PlayerCreateView(CreateView):
@@ -69,13 +132,51 @@ class PlayerCreateView(CreateView):
         context['submit_text'] = 'Add Player'
         return context
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        bump_ranking_version()
+        player_index.upsert(self.object)
+        return response
+
 
 class PlayerDetailView(DetailView):
     model = Player
+    queryset = Player.objects.select_related('stats')
     template_name = 'ratings/player_detail.html'
     context_object_name = 'player'
 
 
+class PlayerRatingHistoryView(View):
+    """The player's rating series for the chart on their page; see `build_rating_history`."""
+
+    def get(self, request, pk):
+        player = get_object_or_404(
+            Player.objects.only('pk', 'rating', 'peak_rating', 'games_played', 'latest_match', 'created_at'), pk=pk,
+        )
+        return JsonResponse(get_rating_history(player))
+
+
+class HeadToHeadView(View):
+    """Two players' lifetime record against each other and their latest games, from the first player's side."""
+
+    template_name = 'ratings/head_to_head.html'
+
+    def get(self, request, pk, opponent_pk):
+        if pk == opponent_pk:
+            raise Http404('A player has no head-to-head record with themselves.')
+        players = Player.objects.in_bulk([pk, opponent_pk])
+        if len(players) < 2:
+            raise Http404('No such player.')
+        player, opponent = players[pk], players[opponent_pk]
+        record, recent_matches = get_head_to_head(player, opponent)
+        return render(request, self.template_name, {
+            'player': player,
+            'opponent': opponent,
+            'record': record,
+            'recent_matches': recent_matches,
+        })
+
+
 class PlayerUpdateView(UpdateView):
     model = Player
     form_class = PlayerForm
@@ -88,6 +189,12 @@ class PlayerUpdateView(UpdateView):
         context['submit_text'] = 'Save Changes'
         return context
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        bump_ranking_version()
+        player_index.upsert(self.object)
+        return response
+
 
 class PlayerDeleteView(DeleteView):
     model = Player
@@ -95,6 +202,13 @@ class PlayerDeleteView(DeleteView):
     success_url = reverse_lazy('player_list')
     context_object_name = 'player'
 
+    def form_valid(self, form):
+        pk = self.object.pk
+        response = super().form_valid(form)
+        bump_ranking_version()
+        player_index.remove(pk)
+        return response
+
 
 class MatchCreateView(CreateView):
     model = Match
@@ -102,19 +216,18 @@ class MatchCreateView(CreateView):
     template_name = 'ratings/match_form.html'
     success_url = reverse_lazy('match_create')
 
-    def dispatch(self, request, *args, **kwargs):
-        Match.cleanup_expired_records()
-        return super().dispatch(request, *args, **kwargs)
-
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         history_player_query = self.request.GET.get('history_player', '').strip()
-        recent_matches = Match.objects.select_related('player_white', 'player_black')
+        recent_matches = Match.objects.select_related('player_white', 'player_black').filter(
+            created_at__gte=Match.retention_cutoff(),
+        )
 
         if history_player_query:
             recent_matches = recent_matches.filter(
-                Q(player_white__name__icontains=history_player_query)
-                | Q(player_black__name__icontains=history_player_query)
+                pk__in=PlayerMatch.objects.filter(
+                    player__name__icontains=history_player_query,
+                ).values('match_id')
             )
         else:
             recent_matches = recent_matches[:12]
@@ -124,59 +237,30 @@ class MatchCreateView(CreateView):
         return context
 
     def form_valid(self, form):
-        match = form.save(commit=False)
-
-        with transaction.atomic():
-            white = Player.objects.select_for_update().get(pk=match.player_white.pk)
-            black = Player.objects.select_for_update().get(pk=match.player_black.pk)
-
-            match.player_white = white
-            match.player_black = black
-
-            # snapshot stats before this match
-            match.white_rating_before = white.rating
-            match.black_rating_before = black.rating
-            match.white_peak_before = white.peak_rating
-            match.black_peak_before = black.peak_rating
-            match.white_games_before = white.games_played or 0
-            match.black_games_before = black.games_played or 0
-
-            # calculate rating changes
-            w_change, b_change = RatingCalculator.process_match(white, black, match.result)
-            match.white_rating_change = w_change
-            match.black_rating_change = b_change
-
-            # apply player updates
-            white.rating = white.rating + w_change
-            black.rating = black.rating + b_change
-            white.games_played = (white.games_played or 0) + 1
-            black.games_played = (black.games_played or 0) + 1
-
-            if white.rating > white.peak_rating:
-                white.peak_rating = white.rating
-            if black.rating > black.peak_rating:
-                black.peak_rating = black.rating
-
-            # snapshot stats after this match
-            match.white_rating_after = white.rating
-            match.black_rating_after = black.rating
-            match.white_peak_after = white.peak_rating
-            match.black_peak_after = black.peak_rating
-            match.white_games_after = white.games_played
-            match.black_games_after = black.games_played
-
-            white.save(update_fields=['rating', 'peak_rating', 'games_played'])
-            black.save(update_fields=['rating', 'peak_rating', 'games_played'])
-            match.save()
+        match = record_match(form.save(commit=False))
 
+        purge_expired_matches_if_due()
+        create_checkpoint_if_due()
         messages.success(self.request, 'Match recorded. You can revert this result within 30 days if needed.')
         self.object = match
         return redirect(self.get_success_url())
 
 
+def _match_create_redirect(history_player_query):
+    url = reverse('match_create')
+    if history_player_query:
+        url = f"{url}?{urlencode({'history_player': history_player_query})}"
+    return redirect(url)
+
+
 class MatchRevertView(View):
+    """Revert one match; it must be the newest active match of both players."""
+
+    success_message = 'Match reverted successfully. Player ratings, peak ratings, and games played were restored.'
+
     def post(self, request, pk):
-        Match.cleanup_expired_records()
+        purge_expired_matches_if_due()
+        create_checkpoint_if_due()
         history_player_query = request.POST.get('history_player', '').strip()
 
         with transaction.atomic():
@@ -187,218 +271,362 @@ class MatchRevertView(View):
 
             if match.is_reverted:
                 messages.info(request, 'This match has already been reverted.')
-                url = reverse('match_create')
-                if history_player_query:
-                    url = f"{url}?{urlencode({'history_player': history_player_query})}"
-                return redirect(url)
+                return _match_create_redirect(history_player_query)
 
             if match.is_expired:
                 messages.error(request, 'This match is older than 30 days and can no longer be reverted.')
-                url = reverse('match_create')
-                if history_player_query:
-                    url = f"{url}?{urlencode({'history_player': history_player_query})}"
-                return redirect(url)
-
-            white_has_later_matches = Match.objects.filter(
-                Q(player_white=match.player_white) | Q(player_black=match.player_white),
-                is_reverted=False,
-                created_at__gt=match.created_at,
-            ).exists()
-
-            black_has_later_matches = Match.objects.filter(
-                Q(player_white=match.player_black) | Q(player_black=match.player_black),
-                is_reverted=False,
-                created_at__gt=match.created_at,
-            ).exists()
-
-            if white_has_later_matches or black_has_later_matches:
-                messages.error(
-                    request,
-                    'Cannot revert this match because one of the players has newer recorded matches. Revert the newest matches first.',
-                )
-                url = reverse('match_create')
-                if history_player_query:
-                    url = f"{url}?{urlencode({'history_player': history_player_query})}"
-                return redirect(url)
+                return _match_create_redirect(history_player_query)
 
-            white = match.player_white
-            black = match.player_black
+            try:
+                self.revert(match)
+            except MatchRevertError as exc:
+                messages.error(request, str(exc))
+                return _match_create_redirect(history_player_query)
 
-            # Restore the exact snapshots from before this match.
-            white.rating = match.white_rating_before
-            white.peak_rating = match.white_peak_before
-            white.games_played = max(match.white_games_before, 0)
+        messages.success(request, self.success_message)
+        return _match_create_redirect(history_player_query)
 
-            black.rating = match.black_rating_before
-            black.peak_rating = match.black_peak_before
-            black.games_played = max(match.black_games_before, 0)
+    def revert(self, match):
+        self.reverted = revert_match(match)
 
-            white.save(update_fields=['rating', 'peak_rating', 'games_played'])
-            black.save(update_fields=['rating', 'peak_rating', 'games_played'])
 
-            match.is_reverted = True
-            match.reverted_at = timezone.now()
-            match.save(update_fields=['is_reverted', 'reverted_at'])
+class MatchRevertChainView(MatchRevertView):
+    """Revert a match together with every newer match that blocks it, in one transaction."""
 
-        messages.success(request, 'Match reverted successfully. Player ratings, peak ratings, and games played were restored.')
-        url = reverse('match_create')
-        if history_player_query:
-            url = f"{url}?{urlencode({'history_player': history_player_query})}"
-        return redirect(url)
+    def revert(self, match):
+        self.reverted = revert_matches_back_to(match)
+        self.success_message = (
+            f'Reverted {len(self.reverted)} match{"es" if len(self.reverted) != 1 else ""} back to the selected game. '
+            'Player ratings, peak ratings, and games played were restored.'
+        )
+
+
+class MatchImportView(FormView):
+    form_class = MatchImportForm
+    template_name = 'ratings/match_import.html'
+    success_url = reverse_lazy('match_create')
 
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        try:
+            text = upload.read().decode('utf-8-sig')
+            matches = import_matches(parse_matches(text, form.cleaned_data['format']))
+        except UnicodeDecodeError:
+            form.add_error('file', 'The file must be UTF-8 encoded text.')
+            return self.form_invalid(form)
+        except MatchImportError as exc:
+            for error in exc.errors:
+                form.add_error(None, error)
+            return self.form_invalid(form)
+
+        purge_expired_matches_if_due()
+        create_checkpoint_if_due()
+        messages.success(self.request, f'Imported {len(matches)} matches. Ratings were updated in file order.')
+        return redirect(self.get_success_url())
 
-class MatchHistoryView(ListView):
+
+class MatchHistoryView(KeysetPaginationMixin, ListView):
     model = Match
     template_name = 'ratings/match_history.html'
     context_object_name = 'matches'
     paginate_by = 25
-
-    def dispatch(self, request, *args, **kwargs):
-        Match.cleanup_expired_records()
-        return super().dispatch(request, *args, **kwargs)
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
-        queryset = Match.objects.select_related('player_white', 'player_black')
+        queryset = Match.objects.select_related('player_white', 'player_black').filter(
+            created_at__gte=Match.retention_cutoff(),
+        )
 
         self.player_id = self.request.GET.get('player', '').strip()
         self.date_from = self.request.GET.get('date_from', '').strip()
         self.date_to = self.request.GET.get('date_to', '').strip()
 
         if self.player_id:
-            queryset = queryset.filter(
-                Q(player_white_id=self.player_id) | Q(player_black_id=self.player_id)
-            )
+            queryset = queryset.filter(timeline__player_id=self.player_id)
 
-        if self.date_from:
-            queryset = queryset.filter(created_at__date__gte=self.date_from)
+        # half-open [start of date_from, start of the day after date_to) in the
+        # current time zone, so the created_at index can be used
+        start = _start_of_day(self.date_from)
+        if start is not None:
+            queryset = queryset.filter(created_at__gte=start)
 
-        if self.date_to:
-            queryset = queryset.filter(created_at__date__lte=self.date_to)
+        end = _start_of_day(self.date_to, days_after=1)
+        if end is not None:
+            queryset = queryset.filter(created_at__lt=end)
 
         return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['players'] = Player.objects.order_by('name')
+        context['players'] = player_index.choices()
         context['selected_player'] = self.player_id
         context['date_from'] = self.date_from
         context['date_to'] = self.date_to
-        context['query_string'] = self._query_string_without_page()
         return context
 
-    def _query_string_without_page(self):
-        params = self.request.GET.copy()
-        params.pop('page', None)
-        encoded = params.urlencode()
-        return f'&{encoded}' if encoded else ''
 
+def _start_of_day(value, days_after=0):
+    """Aware datetime for midnight of an ISO date string (plus `days_after` days), or None if invalid."""
+    try:
+        day = date.fromisoformat(value) + timedelta(days=days_after)
+    except ValueError:
+        return None
+    return timezone.make_aware(datetime.combine(day, datetime_time.min))
+
+
+@method_decorator(ranking_conditional_get, name='dispatch')
+class PlayerRankingView(RankedPlayerPaginationMixin, RankingVersionMixin, ListView):
+    """The current ranking, or with `?as_of=YYYY-MM-DD` the ranking at the end of that day."""
 
-class PlayerRankingView(ListView):
     model = Player
     template_name = 'ratings/player_ranking.html'
     context_object_name = 'players'
-    
+
+    def get(self, request, *args, **kwargs):
+        self.as_of = request.GET.get('as_of', '').strip()
+        self.as_of_until = _start_of_day(self.as_of, days_after=1) if self.as_of else None
+        self.as_of_rows = ranking_as_of(self.as_of_until) if self.as_of_until is not None else None
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
-        return Player.objects.all().order_by('-rating')
+        if self.as_of_rows is not None:
+            return self.as_of_rows
+        return super().get_queryset()
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.as_of_rows is not None:
+            # a past ranking is rebuilt in memory, so plain page numbers are enough
+            return MultipleObjectMixin.paginate_queryset(self, queryset, page_size)
+        return super().paginate_queryset(queryset, page_size)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['as_of'] = self.as_of if self.as_of_rows is not None else ''
+        if self.as_of and self.as_of_rows is None:
+            context['as_of_error'] = (
+                'Enter a date as YYYY-MM-DD.' if self.as_of_until is None
+                else 'No rating history is kept from before that date.'
+            )
+        return context
 
     
+@method_decorator(ranking_conditional_get, name='dispatch')
 class PlayerRankingPDFView(View):
     def get(self, request):
-        # Get all players ordered by rating
-        players = Player.objects.all().order_by('-rating')
-        
-        # Create PDF response
-        response = HttpResponse(content_type='application/pdf')
+        # Cached per ranking version; only rebuilt after ratings change
+        pdf = get_ranking_pdf(get_ranking_version(request)[0])
+
+        response = HttpResponse(pdf, content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="KNUST_Rankings_{timezone.now().strftime("%Y%m%d")}.pdf"'
-        
-        # Create PDF document
-        doc = SimpleDocTemplate(response, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        elements = []
-        
-        # Title
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#b58863'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        title = Paragraph("KNUST CHESS CLUB RANKINGS", title_style)
-        elements.append(title)
-        
-        # Date
-        date_style = ParagraphStyle(
-            'Date',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.grey,
-            spaceAfter=20,
-            alignment=TA_CENTER
+        return response
+
+
+class TournamentListView(ListView):
+    model = Tournament
+    template_name = 'ratings/tournament_list.html'
+    context_object_name = 'tournaments'
+
+    def get_queryset(self):
+        return Tournament.objects.prefetch_related('players', 'rounds').annotate(
+            has_rated_games=Exists(Pairing.objects.filter(round__tournament=OuterRef('pk')).exclude(result='P')),
         )
-        date_text = Paragraph(f"Generated on {timezone.now().strftime('%B %d, %Y')}", date_style)
-        elements.append(date_text)
-        
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Create table data
-        table_data = [['Rank', 'Player Name', 'Current Rating', 'Peak Rating']]
-        
-        for idx, player in enumerate(players, 1):
-            table_data.append([
-                str(idx),
-                player.name,
-                str(player.rating),
-                str(player.peak_rating)
+
+
+class TournamentCreateView(CreateView):
+    model = Tournament
+    form_class = TournamentForm
+    template_name = 'ratings/tournament_form.html'
+
+    def form_valid(self, form):
+        with transaction.atomic():
+            response = super().form_valid(form)
+            TournamentStanding.objects.bulk_create([
+                TournamentStanding(
+                    tournament=self.object,
+                    player=player,
+                    initial_rating=player.rating,
+                    final_rating=player.rating,
+                )
+                for player in form.cleaned_data['players']
             ])
-        
-        # Create table
-        table = Table(table_data, colWidths=[0.8*inch, 2.5*inch, 1.3*inch, 1.3*inch])
-        
-        # Style the table
-        table.setStyle(TableStyle([
-            # Header styling
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#262421')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#f0d9b5')),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('TOPPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            
-            # Data rows styling
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 11),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-            ('ALIGN', (2, 1), (-1, -1), 'CENTER'),
-            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-            ('PADDING', (0, 1), (-1, -1), 10),
-            
-            # Alternate row colors
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
-            
-            # Rank column styling
-            ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
-            ('TEXTCOLOR', (0, 1), (0, -1), colors.HexColor('#b58863')),
-            ('FONTSIZE', (0, 1), (0, -1), 12),
-            
-            # Rating columns styling
-            ('TEXTCOLOR', (2, 1), (2, -1), colors.HexColor('#4CAF50')),
-            ('FONTNAME', (2, 1), (2, -1), 'Helvetica-Bold'),
-            ('TEXTCOLOR', (3, 1), (3, -1), colors.black),
-            ('FONTNAME', (3, 1), (3, -1), 'Helvetica-Bold'),
-        ]))
-        
-        elements.append(table)
-        
-        # Build PDF
-        doc.build(elements)
+        messages.success(self.request, f'Tournament "{self.object.name}" created.')
         return response
 
+    def get_success_url(self):
+        return reverse('tournament_detail', args=[self.object.pk])
+
+
+class TournamentDetailView(DetailView):
+    model = Tournament
+    template_name = 'ratings/tournament_detail.html'
+    context_object_name = 'tournament'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['rounds'] = self.object.rounds.prefetch_related(
+            Prefetch('pairings', queryset=Pairing.objects.select_related('player_white', 'player_black')),
+        )
+        return context
+
+
+class TournamentStandingsView(DetailView):
+    model = Tournament
+    template_name = 'ratings/tournament_standings.html'
+    context_object_name = 'tournament'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['standings'] = self.object.standings.select_related('player').order_by('-sort_key', 'id')
+        return context
+
+
+class TournamentDeleteView(View):
+    """Delete a tournament that has no results yet.
+
+    Rated boards have already moved the players' ratings, and deleting them
+    would leave changes that no match or pairing explains, so such
+    tournaments are kept.
+    """
+
+    def post(self, request, pk):
+        tournament = get_object_or_404(Tournament, pk=pk)
+        if Pairing.objects.filter(round__tournament=tournament).exclude(result='P').exists():
+            messages.error(request, f'Tournament "{tournament.name}" has rated games and cannot be deleted.')
+            return redirect('tournament_list')
+        tournament.delete()
+        messages.success(request, f'Tournament "{tournament.name}" deleted.')
+        return redirect('tournament_list')
+
+
+def _generate_next_round(request, tournament):
+    """Create and pair the tournament's next round; returns the Round or None if it could not be paired."""
+    if tournament.is_finished or tournament.current_round >= tournament.num_rounds:
+        messages.info(request, 'All rounds of this tournament have already been played.')
+        return None
+    if tournament.rounds.filter(is_completed=False).exists():
+        messages.error(request, 'Finish entering the current round before generating the next one.')
+        return None
+
+    with transaction.atomic():
+        round_obj = Round.objects.create(tournament=tournament, round_number=tournament.current_round + 1)
+        try:
+            pairings = SwissPairing.generate_round_pairings(tournament, round_obj)
+        except ValueError as exc:
+            transaction.set_rollback(True)
+            messages.error(request, str(exc))
+            return None
+        tournament.current_round = round_obj.round_number
+        tournament.save(update_fields=['current_round'])
+
+    messages.success(request, f'Round {round_obj.round_number} paired: {len(pairings)} boards.')
+    return round_obj
+
+
+class GenerateRoundView(View):
+    def post(self, request, pk):
+        tournament = get_object_or_404(Tournament, pk=pk)
+        round_obj = _generate_next_round(request, tournament)
+        if round_obj is None:
+            return redirect('tournament_detail', pk=tournament.pk)
+        return redirect('round_detail', tournament_pk=tournament.pk, pk=round_obj.pk)
+
+
+class RoundDetailView(DetailView):
+    model = Round
+    template_name = 'ratings/round_detail.html'
+    context_object_name = 'round'
+
+    def get_queryset(self):
+        return Round.objects.filter(tournament_id=self.kwargs['tournament_pk']).select_related('tournament').prefetch_related(
+            Prefetch('pairings', queryset=Pairing.objects.select_related('player_white', 'player_black')),
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['tournament'] = self.object.tournament
+        context['pending_count'] = sum(1 for pairing in self.object.pairings.all() if pairing.result == 'P')
+        return context
+
+
+class SubmitPairingResultView(View):
+    def post(self, request, pk):
+        result = request.POST.get('result')
+        with transaction.atomic():
+            pairing = get_object_or_404(
+                Pairing.objects.select_related('round__tournament', 'player_white', 'player_black').select_for_update(),
+                pk=pk,
+            )
+            round_obj = pairing.round
+            if result not in ('W', 'B', 'D'):
+                messages.error(request, 'Choose a result: 1-0, ½-½ or 0-1.')
+            elif pairing.result != 'P':
+                messages.info(request, 'A result was already entered for this board.')
+            else:
+                TournamentResultsProcessor.process_pairing_result(pairing, result)
+                messages.success(request, f'Result saved for board {pairing.board_number}.')
+                create_checkpoint_if_due()
+        return redirect('round_detail', tournament_pk=round_obj.tournament_id, pk=round_obj.pk)
+
+
+class SubmitRoundResultsView(View):
+    """Enter every board filled in on the round page at once (`result_<pairing id>` fields)."""
+
+    def post(self, request, pk):
+        round_obj = get_object_or_404(Round.objects.select_related('tournament'), pk=pk)
+        results = {}
+        for key, value in request.POST.items():
+            if key.startswith('result_') and value:
+                try:
+                    results[int(key[len('result_'):])] = value
+                except ValueError:
+                    continue
+
+        if not results:
+            messages.info(request, 'No results were selected.')
+        else:
+            try:
+                pairings = TournamentResultsProcessor.process_round_results(round_obj, results)
+            except RoundResultsError as exc:
+                for error in exc.errors:
+                    messages.error(request, error)
+            else:
+                messages.success(request, f'Results saved for {len(pairings)} board(s).')
+                create_checkpoint_if_due()
+        return redirect('round_detail', tournament_pk=round_obj.tournament_id, pk=round_obj.pk)
+
+
+class CompleteRoundView(View):
+    def post(self, request, pk):
+        round_obj = get_object_or_404(Round.objects.select_related('tournament'), pk=pk)
+        tournament = round_obj.tournament
+
+        if round_obj.pairings.filter(result='P').exists():
+            messages.error(request, 'Some boards still have no result.')
+            return redirect('round_detail', tournament_pk=tournament.pk, pk=round_obj.pk)
+
+        round_obj.is_completed = True
+        round_obj.save(update_fields=['is_completed'])
+
+        if round_obj.round_number >= tournament.num_rounds:
+            TournamentResultsProcessor.finalize_tournament(tournament)
+            messages.success(request, 'Final round completed. The tournament is finished.')
+            return redirect('tournament_standings', pk=tournament.pk)
+
+        next_round = _generate_next_round(request, tournament)
+        if next_round is None:
+            return redirect('tournament_detail', pk=tournament.pk)
+        return redirect('round_detail', tournament_pk=tournament.pk, pk=next_round.pk)
+
+
+class MetricsView(View):
+    """This worker's request and SQL totals in the Prometheus text format (see `ratings/metrics.py`)."""
+
+    def get(self, request):
+        token = getattr(settings, 'METRICS_TOKEN', None)
+        if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+        return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
 class PasscodeView(View):
     template_name = 'ratings/passcode.html'
@@ -409,20 +637,19 @@ class PasscodeView(View):
     def post(self, request):
         code = request.POST.get('passcode', '')
         if code and code == getattr(settings, 'PASSCODE', ''):
-            request.session['access_granted'] = True
-            # store grant time (epoch seconds) so middleware can enforce expiry
-            request.session['access_granted_at'] = timezone.now().timestamp()
-            # redirect to home
-            return redirect(reverse('home'))
+            # redirect to home with a signed grant cookie; the middleware enforces its expiry
+            response = redirect(reverse('home'))
+            grant_access(response)
+            return response
         # fall back with an error
         return render(request, self.template_name, {'error': 'Incorrect passcode'})
 
 
 def logout_view(request):
-    """Clear passcode session keys, log out any authenticated user, and redirect to passcode."""
-    # remove the passcode session flags so the user must re-enter the passcode
-    request.session.pop('access_granted', None)
-    request.session.pop('access_granted_at', None)
+    """Drop the passcode grant, log out any authenticated user, and redirect to passcode."""
     # also log out any django-authenticated user if present
     logout(request)
-    return redirect(reverse('passcode'))
\ No newline at end of file
+    response = redirect(reverse('passcode'))
+    # remove the grant cookie so the user must re-enter the passcode
+    revoke_access(response)
+    return response
\ No newline at end of file